@@ -1,31 +1,50 @@
-from .main.common.datatype.filter_wheel import *
-from .main.common.datatype.observation_ticket import *
-from .main.common.datatype.object_reader import *
-from .main.common.IO.config_reader import *
-from .main.common.IO.json_reader import *
-from .main.common.util import time_utils as omtime
-from .main.common.util import filereader_utils as omfile
-from .main.common.util import conversion_utils as omconversion
-from .main.controller.camera import *
-from .main.controller.dome import *
-from .main.controller.flatfield_lamp import *
-from .main.controller.focuser_control import *
-from .main.controller.hardware import *
-from .main.controller.telescope import *
-from .main.controller.thread_monitor import *
-from .main.drivers.driver import *
-from .main.observing.calibration import *
-from .main.observing.condition_checker import *
-from .main.observing.guider import *
-from .main.observing.observation_run import *
+import importlib
 
-import os
-__file = os.path.abspath(os.path.dirname(__file__))
-__filereader = Reader(os.path.join(__file, r'config', r'parameters_config.json'))
-__objreader = ObjectReader(__filereader)
+# Everything is imported lazily (PEP 562), the first time it is used, so that importing the package (and so the CLI or
+# a ticket check) does not have to wait for astropy, photutils, matplotlib, numba, etc.
+_submodules = {
+    'omtime': '.main.common.util.time_utils',
+    'omfile': '.main.common.util.filereader_utils',
+    'omconversion': '.main.common.util.conversion_utils',
+    'omplot': '.main.common.util.plot_utils',
+}
+_exports = {
+    '.main.common.datatype.filter_wheel': ('FilterWheel', 'get_filter'),
+    '.main.common.datatype.observation_ticket': ('ObservationTicket',),
+    '.main.common.datatype.object_reader': ('ObjectReader',),
+    '.main.common.IO.config_reader': ('Config', 'get_config'),
+    '.main.common.IO.json_reader': ('Reader',),
+    '.main.controller.camera': ('Camera',),
+    '.main.controller.dome': ('Dome',),
+    '.main.controller.flatfield_lamp': ('FlatLamp',),
+    '.main.controller.focuser_control': ('Focuser',),
+    '.main.controller.hardware': ('CommandFuture', 'Hardware'),
+    '.main.controller.telescope': ('Telescope',),
+    '.main.controller.thread_monitor': ('Monitor',),
+    '.main.drivers.driver': ('run', 'read_ticket', 'start_time', 'alphanumeric_sort'),
+    '.main.observing.calibration': ('Calibration',),
+    '.main.observing.condition_checker': ('Conditions',),
+    '.main.observing.guider': ('Guider',),
+    '.main.observing.observation_run': ('ObservationRun',),
+}
+_attributes = {name: module for (module, names) in _exports.items() for name in names}
+
+
+def __getattr__(name):
+    if name in _submodules:
+        value = importlib.import_module(_submodules[name], __name__)
+    elif name in _attributes:
+        value = getattr(importlib.import_module(_attributes[name], __name__), name)
+    else:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_submodules) | set(_attributes))
 
-del os, __file, __filereader, __objreader
 
 __version__ = "1.2.3"
 __author__ = ['Michael Reefe', 'Owen Alfaro', 'Shawn Foster']
-__credits__ = ['GMU Observatory', 'Peter Plavchan', 'GMU Exoplaneteers Research Group']
\ No newline at end of file
+__credits__ = ['GMU Observatory', 'Peter Plavchan', 'GMU Exoplaneteers Research Group']
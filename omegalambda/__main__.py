@@ -1,8 +1,7 @@
 import argparse
+import logging
 import sys
 
-from .main.drivers.driver import run
-
 
 def cli_run(args):
     """
@@ -20,15 +19,62 @@ def cli_run(args):
     None.
 
     """
+    # Imported here, so that the other commands (and --help) do not have to load the whole package
+    from .main.drivers.driver import run
     run(args.obs_tickets, data=args.data, config=args.config, _filter=args.filter, logger=args.logger,
-        shutdown=args.shutdown, calibration=args.calibration, focus=args.focus)
+        shutdown=args.shutdown, calibration=args.calibration, focus=args.focus, simulate=args.simulate,
+        speed=args.speed)
+
+
+def cli_warmup(args):
+    """
+    Description
+    -----------
+    Compiles every numba kernel into numba's on-disk cache, so that the first run does not have to.
+
+    Parameters
+    ----------
+    args : ANY TYPE
+        Arguments passed in from the command line.
+
+    Returns
+    -------
+    None.
+
+    """
+    from .main.drivers.warmup import warm_up
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    warm_up()
+
+
+def cli_importtime(args):
+    """
+    Description
+    -----------
+    Checks that the package and the ticket reader still import within their time budgets.  Exits with status 1 if
+    any of them is over budget.
+
+    Parameters
+    ----------
+    args : ANY TYPE
+        Arguments passed in from the command line.
+
+    Returns
+    -------
+    None.
+
+    """
+    from .main.drivers.import_budget import check_import_budget
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if not check_import_budget():
+        sys.exit(1)
 
 
 def main():
     """
     Description
     -----------
-    Defines the 'run' CLI command and arguments.
+    Defines the 'run', 'warmup' and 'importtime' CLI commands and arguments.
 
     Returns
     -------
@@ -57,7 +103,18 @@ def main():
     run_driver.add_argument('--nofocus', '-nf', action='store_false', dest='focus',
                             help='Use this option if you do not want to perform the automatic focus procedure at the'
                                  'beginning of the night.  Continuous focusing will still be enabled.')
+    run_driver.add_argument('--simulate', '-sim', action='store_true', dest='simulate',
+                            help='Use this option to run on the simulated camera, telescope, dome, focuser and flat '
+                                 'lamp instead of the real hardware.')
+    run_driver.add_argument('--speed', '-s', type=float, default=1, dest='speed',
+                            help='How many times faster than real time the simulated hardware should run.  Only used '
+                                 'with --simulate.')
     run_driver.set_defaults(func=cli_run)
+    warmup_driver = subparsers.add_parser('warmup', help='Compile the numba kernels into the on-disk cache')
+    warmup_driver.set_defaults(func=cli_warmup)
+    importtime_driver = subparsers.add_parser('importtime', help='Check that the package imports within its time '
+                                                                 'budget')
+    importtime_driver.set_defaults(func=cli_importtime)
     
     args = parser.parse_args()
     args.func(args)
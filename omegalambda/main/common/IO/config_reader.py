@@ -1,9 +1,12 @@
+import os
 import json
 import logging
 from numpy import pi
 from typing import Dict, Optional, Union, Any, List
 import re
 
+from .json_reader import Reader
+
 _config = None
 
 
@@ -20,6 +23,8 @@ class Config:
                  cloud_cover_limit: Optional[float] = None, cloud_saturation_limit: Optional[float] = None,
                  rain_percent_limit: Optional[float] = None, user_agent: Optional[str] = None,
                  cloud_satellite: Optional[str] = None, weather_api_key: Optional[str] = None,
+                 weather_timeout: Optional[Union[int, float]] = None, rain_colors: Optional[List[List[int]]] = None,
+                 rain_color_tolerance: Optional[int] = None, save_weather_images: Optional[bool] = None,
                  min_reopen_time: Optional[Union[int, float]] = None,
                  plate_scale: Optional[float] = None, saturation: Optional[int] = None,
                  focus_exposure_multiplier: Optional[float] = None, initial_focus_delta: Optional[int] = None,
@@ -27,7 +32,9 @@ class Config:
                  focus_iterations: Optional[int] = None, focus_adjust_frequency: Optional[Union[float, int]] = None,
                  guiding_threshold: Optional[float] = None, guider_ra_dampening: Optional[float] = None,
                  guider_dec_dampening: Optional[float] = None, guider_max_move: Optional[float] = None,
-                 guider_angle: Optional[float] = None, guider_flip_y: Optional[bool] = None, data_directory: Optional[str] = None,
+                 guider_angle: Optional[float] = None, guider_flip_y: Optional[bool] = None,
+                 guider_mode: Optional[str] = None, guider_fft_size: Optional[int] = None,
+                 data_directory: Optional[str] = None,
                  calibration_time: Optional[str] = None, calibration_num: Optional[int] = None):
         """
 
@@ -74,6 +81,18 @@ class Config:
         weather_api_key : STR, optional
             The api key to search for in weather.com's api.  Sometimes changes and needs an update.  Should be a regex
             search string.
+        weather_timeout : INT or FLOAT, optional
+            Deadline in seconds for each weather source (weather API, radar, satellite) to report during a weather
+            check, including any retries.  A source that misses it is treated as unavailable for that check.  Our
+            default is 60 seconds.
+        rain_colors : LIST, optional
+            Colours of the radar image pixels that count as rain, as a list of [R, G, B] or [R, G, B, A] values (0 to
+            255).  If null, every pixel that is not fully transparent counts as rain.  Our default is null.
+        rain_color_tolerance : INT, optional
+            Largest difference in any colour channel for a radar pixel to match one of rain_colors.  Our default is 0.
+        save_weather_images : BOOL, optional
+            If True, the downloaded radar tiles and satellite image are saved to resources/weather_status on every
+            weather check, for debugging.  Our default is False.
         min_reopen_time : INT or FLOAT, optional
             Minimum wait time to reopen (in minutes) after a weather check has gone off.  Our default is 30 minutes.
         plate_scale : FLOAT, optional
@@ -116,6 +135,13 @@ class Config:
             This would correspond to configurations that, at a 0 degree guider angle, would have +x aligned with +RA
             while +y is aligned with -Dec.  Or similarly if the guider angle is 180 degrees, +x aligns with -RA while
             +y aligns with +Dec.  Our default is False.
+        guider_mode : STR, optional
+            How the guider measures drift between images.  Can be "star" or "phase."  If "star", it follows the
+            centroid of a single guide star.  If "phase", it registers each whole image against the first one with
+            FFT phase correlation, which does not need any star to be detected.  Our default is "star".
+        guider_fft_size : INT, optional
+            Size in pixels of the (square) FFT used by the "phase" guider mode.  Images are binned down to fit, so this
+            bounds the time spent on each image.  Should be a power of 2.  Our default is 512.
         data_directory : STR, optional
             Where images and other data are saved on the computer.  Our default is
             H:/Observatory Files/Observing Sessions/2020_Data.
@@ -191,6 +217,10 @@ class Config:
         self.user_agent = user_agent
         self.cloud_satellite = cloud_satellite
         self.weather_api_key = weather_api_key
+        self.weather_timeout = weather_timeout
+        self.rain_colors = rain_colors
+        self.rain_color_tolerance = rain_color_tolerance
+        self.save_weather_images = save_weather_images
         self.min_reopen_time = min_reopen_time
         self.plate_scale = plate_scale
         self.saturation = saturation
@@ -207,6 +237,8 @@ class Config:
         self.guider_max_move = guider_max_move                                  # Input in arcsec, output in arcsec
         self.guider_angle = guider_angle*pi/180
         self.guider_flip_y = guider_flip_y
+        self.guider_mode = guider_mode
+        self.guider_fft_size = guider_fft_size
         self.data_directory = data_directory                     
         self.calibration_time = calibration_time
         self.calibration_num: int = calibration_num
@@ -232,6 +264,10 @@ class Config:
         assert type(self.user_agent) is str
         assert type(self.cloud_satellite) is str
         assert type(self.weather_api_key) is str
+        assert self.weather_timeout > 0
+        assert self.rain_colors is None or all(len(color) in (3, 4) for color in self.rain_colors)
+        assert type(self.rain_color_tolerance) is int and self.rain_color_tolerance >= 0
+        assert type(self.save_weather_images) is bool
         assert self.min_reopen_time >= 0
         assert self.plate_scale > 0
         assert self.saturation > 0
@@ -247,6 +283,8 @@ class Config:
         assert self.guider_max_move >= 0
         assert type(self.guider_angle) in (int, float)
         assert type(self.guider_flip_y) is bool
+        assert self.guider_mode in ("star", "phase")
+        assert type(self.guider_fft_size) is int and self.guider_fft_size >= 16
         assert type(self.data_directory) is str
         assert self.calibration_time in ("start", "end")
         assert self.calibration_num >= 0
@@ -309,6 +347,8 @@ def _dict_to_config_object(dic: Dict) -> Config:
                      weather_freq=dic['weather_freq'], cloud_cover_limit=dic['cloud_cover_limit'],
                      cloud_saturation_limit=dic['cloud_saturation_limit'], rain_percent_limit=dic['rain_percent_limit'],
                      user_agent=dic['user_agent'], cloud_satellite=dic['cloud_satellite'], weather_api_key=dic['weather_api_key'],
+                     weather_timeout=dic['weather_timeout'], rain_colors=dic['rain_colors'],
+                     rain_color_tolerance=dic['rain_color_tolerance'], save_weather_images=dic['save_weather_images'],
                      min_reopen_time=dic['min_reopen_time'], plate_scale=dic['plate_scale'],
                      saturation=dic['saturation'], focus_exposure_multiplier=dic['focus_exposure_multiplier'],
                      initial_focus_delta=dic['initial_focus_delta'],
@@ -317,6 +357,7 @@ def _dict_to_config_object(dic: Dict) -> Config:
                      focus_max_distance=dic['focus_max_distance'], guiding_threshold=dic['guiding_threshold'],
                      guider_ra_dampening=dic['guider_ra_dampening'], guider_dec_dampening=dic['guider_dec_dampening'],
                      guider_max_move=dic['guider_max_move'], guider_angle=dic['guider_angle'], guider_flip_y=dic['guider_flip_y'],
+                     guider_mode=dic['guider_mode'], guider_fft_size=dic['guider_fft_size'],
                      data_directory=dic['data_directory'], calibration_time=dic['calibration_time'],
                      calibration_num=dic['calibration_num'])
     logging.info('Global config object has been created')
@@ -325,12 +366,15 @@ def _dict_to_config_object(dic: Dict) -> Config:
 
 def get_config() -> Optional[Config]:
     """
+    Description
+    -----------
+    Returns the global config object.  If no config file has been read yet, the default one
+    (omegalambda/config/parameters_config.json) is read first.
 
     Raises
     ------
     NameError
-        Meant only as a way to retrieve an already initialized global config object, so if that object has not
-        been created yet, we raise a name error.
+        If no config file has been read and the default one cannot be read either.
 
     Returns
     -------
@@ -341,8 +385,14 @@ def get_config() -> Optional[Config]:
     """
     global _config
     if _config is None:
-        logging.error('Global config object was called before being initialized')
-        raise NameError('Global config object has not been initialized')
+        path = os.path.abspath(os.path.join(os.path.dirname(__file__), r'..', r'..', r'..', r'config',
+                                            r'parameters_config.json'))
+        try:
+            Config.deserialized(Reader(path).str)
+        except (OSError, ValueError, KeyError):
+            logging.error('Global config object was called before being initialized')
+            raise NameError('Global config object has not been initialized')
+        logging.debug('Global config object was initialized from the default config file')
     else:
         logging.debug('Global config object was called')
-        return _config
+    return _config
@@ -0,0 +1,203 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import List, NamedTuple, Optional
+
+
+class JournalEntry(NamedTuple):
+    index: int
+    exp_time: float
+    path: str
+
+
+class RunJournal:
+
+    def __init__(self, path: str):
+        """
+        Description
+        -----------
+        Journal of every exposure (light, flat or dark) planned and taken for the images in one directory, kept in an
+        SQLite database in that directory.  Each exposure is one row, keyed by the path of its image, that goes from
+        "planned" to "exposing" to "done" (or "failed"), with the time of each step.  After a crash or restart, what
+        has already been taken is looked up here instead of listing the image directories.
+
+        Parameters
+        ----------
+        path : STR
+            Path to the database file.  Created if it does not exist.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS exposures (path TEXT PRIMARY KEY, ticket TEXT NOT NULL, '
+                                    'kind TEXT NOT NULL, filter TEXT NOT NULL, exp_time REAL NOT NULL, '
+                                    'idx INTEGER NOT NULL, status TEXT NOT NULL, planned REAL, started REAL, '
+                                    'finished REAL)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS exposures_set ON exposures '
+                                    '(ticket, kind, filter, exp_time, status, idx)')
+
+    def plan(self, ticket: str, kind: str, _filter: Optional[str], exp_time: float, index: int, path: str,
+             status: str = 'planned') -> None:
+        """
+        Parameters
+        ----------
+        ticket : STR
+            Name of the target.
+        kind : STR
+            "light", "flat" or "dark".
+        _filter : STR
+            Filter of the exposure, or None for darks.
+        exp_time : FLOAT
+            Exposure time in seconds.
+        index : INT
+            Number of the image within its set, as in its file name.
+        path : STR
+            Where the image will be saved.
+        status : STR, optional
+            Status to record.  The default is "planned"; "done" records an image that was already taken.
+
+        Returns
+        -------
+        None.
+
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT INTO exposures (path, ticket, kind, filter, exp_time, idx, status, planned, finished) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (path) DO UPDATE SET ticket = excluded.ticket, '
+                'kind = excluded.kind, filter = excluded.filter, exp_time = excluded.exp_time, idx = excluded.idx, '
+                'status = excluded.status, planned = excluded.planned, started = NULL, finished = excluded.finished',
+                (path, ticket, kind, str(_filter or ''), round(exp_time, 3), index, status, now,
+                 now if status == 'done' else None))
+
+    def start(self, path: str) -> None:
+        """
+        Description
+        -----------
+        Records that the exposure for a planned image has started.
+
+        Parameters
+        ----------
+        path : STR
+            Where the image will be saved.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.lock, self.connection:
+            self.connection.execute("UPDATE exposures SET status = 'exposing', started = ? WHERE path = ?",
+                                    (time.time(), path))
+
+    def finish(self, path: str, success: bool = True) -> None:
+        """
+        Description
+        -----------
+        Records that an exposure has finished, and whether its image was saved.
+
+        Parameters
+        ----------
+        path : STR
+            Where the image was saved.
+        success : BOOL, optional
+            Whether the image was taken and saved.  The default is True.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.lock, self.connection:
+            self.connection.execute('UPDATE exposures SET status = ?, finished = ? WHERE path = ?',
+                                    ('done' if success else 'failed', time.time(), path))
+
+    def completed(self, ticket: str, kind: str, _filter: Optional[str] = None,
+                  exp_time: Optional[float] = None) -> List[JournalEntry]:
+        """
+        Parameters
+        ----------
+        ticket : STR
+            Name of the target.
+        kind : STR
+            "light", "flat" or "dark".
+        _filter : STR, optional
+            Only return images in this filter.  The default is None, for any filter.
+        exp_time : FLOAT, optional
+            Only return images with this exposure time.  The default is None, for any exposure time.
+
+        Returns
+        -------
+        LIST
+            A JournalEntry (index, exp_time, path) for each image that was taken, in the order they were finished.
+
+        """
+        query = "SELECT idx, exp_time, path FROM exposures WHERE ticket = ? AND kind = ? AND status = 'done'"
+        arguments = [ticket, kind]
+        if _filter is not None:
+            query += ' AND filter = ?'
+            arguments.append(str(_filter))
+        if exp_time is not None:
+            query += ' AND exp_time = ?'
+            arguments.append(round(exp_time, 3))
+        with self.lock:
+            rows = self.connection.execute(query + ' ORDER BY finished', arguments).fetchall()
+        return [JournalEntry(*row) for row in rows]
+
+    def next_index(self, ticket: str, kind: str, _filter: Optional[str], exp_time: float) -> int:
+        """
+        Returns
+        -------
+        INT
+            Number for the next image of a set (one more than the highest number whose exposure was ever started),
+            or 1 if none have been.  Exposures left "exposing" by a crash, or "failed" after timing out, may still
+            have saved their image, so their numbers are never handed out again.  Takes the same arguments as
+            completed.
+
+        """
+        with self.lock:
+            (last,) = self.connection.execute(
+                "SELECT MAX(idx) FROM exposures WHERE ticket = ? AND kind = ? AND filter = ? AND exp_time = ? "
+                "AND status IN ('exposing', 'done', 'failed')",
+                (ticket, kind, str(_filter or ''), round(exp_time, 3))).fetchone()
+        return (last or 0) + 1
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def get_run_journal(directory: str) -> RunJournal:
+    """
+    Parameters
+    ----------
+    directory : STR
+        Image directory of a ticket.
+
+    Returns
+    -------
+    RunJournal
+        Journal for the images in that directory, shared by every thread.  Opened the first time it is needed.
+
+    """
+    directory = os.path.abspath(directory)
+    with _journals_lock:
+        if directory not in _journals:
+            os.makedirs(directory, exist_ok=True)
+            _journals[directory] = RunJournal(os.path.join(directory, 'run_journal.sqlite'))
+            logging.debug('Opened run journal for {}'.format(directory))
+        return _journals[directory]
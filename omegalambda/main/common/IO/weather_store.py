@@ -0,0 +1,121 @@
+import os
+import sqlite3
+import logging
+import threading
+import numpy as np
+from typing import Dict, Optional, Sequence
+
+
+class WeatherStore:
+
+    columns = ('humidity', 'wind', 'temperature', 'rain', 'rain_percent', 'cloud_percent', 'sun_elevation')
+
+    def __init__(self, path: str):
+        """
+        Description
+        -----------
+        Append-only time series of the weather readings taken at every weather check, kept in an SQLite database so
+        that it survives restarts and can be queried by time.  Missing readings are stored as NULL.
+
+        Parameters
+        ----------
+        path : STR
+            Path to the database file.  Created if it does not exist.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS readings (time REAL NOT NULL, {}, '
+                                    'alert INTEGER NOT NULL DEFAULT 0)'.format(
+                                        ', '.join('{} REAL'.format(column) for column in self.columns)))
+            self.connection.execute('CREATE INDEX IF NOT EXISTS readings_time ON readings (time)')
+
+    def append(self, time: float, alert: bool = False, **readings: Optional[float]) -> None:
+        """
+        Parameters
+        ----------
+        time : FLOAT
+            Time of the readings, in seconds since the epoch (UTC).
+        alert : BOOL, optional
+            Whether the weather alert was raised at this check.  The default is False.
+        **readings : FLOAT
+            Any of the values in WeatherStore.columns.  Missing or None values are stored as NULL.
+
+        Returns
+        -------
+        None.
+
+        """
+        unknown = set(readings) - set(self.columns)
+        if unknown:
+            raise ValueError('Unknown weather readings: {}'.format(', '.join(sorted(unknown))))
+        values = [time, int(bool(alert))] + [readings.get(column) for column in self.columns]
+        with self.lock, self.connection:
+            self.connection.execute('INSERT INTO readings (time, alert, {}) VALUES ({})'.format(
+                ', '.join(self.columns), ', '.join('?' * len(values))), values)
+
+    def query(self, start: float, end: float, columns: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Parameters
+        ----------
+        start : FLOAT
+            Earliest time to return, in seconds since the epoch.
+        end : FLOAT
+            Latest time to return, in seconds since the epoch.
+        columns : LIST, optional
+            Which readings to return.  The default is None, for all of them.
+
+        Returns
+        -------
+        DICT
+            A float array for "time", "alert" and each reading, in time order.  Missing readings are NaN.
+
+        """
+        columns = ('time', 'alert') + tuple(columns or self.columns)
+        with self.lock:
+            rows = self.connection.execute('SELECT {} FROM readings WHERE time BETWEEN ? AND ? ORDER BY time'.format(
+                ', '.join(columns)), (start, end)).fetchall()
+        data = np.array(rows, dtype=float).reshape(len(rows), len(columns))
+        return {column: data[:, i] for (i, column) in enumerate(columns)}
+
+    def summary(self, start: float, end: float) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        Description
+        -----------
+        Summarizes the readings between two times, like over one night, with the database doing the aggregation.
+
+        Parameters
+        ----------
+        start : FLOAT
+            Start time, in seconds since the epoch.
+        end : FLOAT
+            End time, in seconds since the epoch.
+
+        Returns
+        -------
+        DICT
+            "checks" : number of checks and "alerts" : number of those that raised the weather alert, and for each
+            reading, a dictionary of its "min", "max" and "mean".
+
+        """
+        aggregates = ', '.join('MIN({0}), MAX({0}), AVG({0})'.format(column) for column in self.columns)
+        with self.lock:
+            row = self.connection.execute('SELECT COUNT(*), COALESCE(SUM(alert), 0), {} FROM readings '
+                                          'WHERE time BETWEEN ? AND ?'.format(aggregates), (start, end)).fetchone()
+        result = {'checks': row[0], 'alerts': row[1]}
+        for (i, column) in enumerate(self.columns):
+            result[column] = dict(zip(('min', 'max', 'mean'), row[2 + 3 * i: 5 + 3 * i]))
+        return result
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+        logging.debug('Weather store {} closed'.format(self.path))
@@ -12,7 +12,8 @@ class ObservationTicket:
                  dec: Optional[Union[str, float, int]] = None, start_time: Optional[str] = None,
                  end_time: Optional[str] = None, _filter: Optional[Union[str, List[str]]] = None,
                  num: Optional[int] = None, exp_time: Optional[Union[float, int, List[Union[float, int]]]] = None,
-                 self_guide: Optional[bool] = None, guide: Optional[bool] = None, cycle_filter: Optional[bool] = None):
+                 self_guide: Optional[bool] = None, guide: Optional[bool] = None, cycle_filter: Optional[bool] = None,
+                 priority: Optional[int] = None):
         """
 
         Parameters
@@ -43,6 +44,9 @@ class ObservationTicket:
         cycle_filter : BOOL, optional
             If true, filter will cycle after each exposure, if False filter will
             cycle after number specified in num parameter. The default is None.
+        priority : INT, optional
+            Scheduling priority; when targets compete for the same time, the one with the higher priority is
+            observed.  The default is None, which is priority 1.
 
         Returns
         -------
@@ -86,6 +90,7 @@ class ObservationTicket:
         self.self_guide: bool = self_guide
         self.guide: bool = guide
         self.cycle_filter: bool = cycle_filter
+        self.priority: int = priority if priority is not None else 1
 
         if not self.check_ticket():
             raise AttributeError
@@ -148,6 +153,9 @@ class ObservationTicket:
         if self.num <= 0:
             logging.error('Error reading ticket: num must be > 0.')
             check = False
+        if type(self.priority) is not int or self.priority < 0:
+            logging.error('Error reading ticket: priority must be an int >= 0.')
+            check = False
         if self.exp_time:
             e_times = [self.exp_time] if type(self.exp_time) in (int, float) else self.exp_time
             filts = [self.filter] if type(self.filter) is str else self.filter
@@ -176,4 +184,5 @@ def _dict_to_obs_object(dic: Dict) -> ObservationTicket:
     """
     return ObservationTicket(name=dic['name'], ra=dic['ra'], dec=dic['dec'], start_time=dic['start_time'],
                              end_time=dic['end_time'], _filter=dic['filter'], num=dic['num'], exp_time=dic['exp_time'],
-                             self_guide=dic['self_guide'], guide=dic['guide'], cycle_filter=dic['cycle_filter'])
\ No newline at end of file
+                             self_guide=dic['self_guide'], guide=dic['guide'], cycle_filter=dic['cycle_filter'],
+                             priority=dic.get('priority'))
\ No newline at end of file
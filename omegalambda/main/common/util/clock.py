@@ -0,0 +1,266 @@
+# Time source for the observing code: the real clock, or a simulated one that skips ahead over waits
+import time
+import heapq
+import datetime
+import itertools
+import threading
+from typing import Optional, Union
+
+# How often, in real seconds, a simulated wait on an event looks to see whether the event was set
+_EVENT_POLL = 0.01
+# Share of one CPU that the process can be using and still count as idle
+_BUSY_CPU = 0.2
+
+
+class Clock:
+    """
+    The real clock.  Everything in the observing code that sleeps, waits on an event for a set time, or asks for
+    the current time, asks its clock, so that a SimulatedClock can be put in its place (see set_clock).  Timeouts on
+    hardware replies and downloads are not observing time, and stay on the real clock.
+    """
+
+    def time(self) -> float:
+        """
+        Returns
+        -------
+        FLOAT
+            Current time in seconds since the epoch.
+
+        """
+        return time.time()
+
+    def monotonic(self) -> float:
+        """
+        Returns
+        -------
+        FLOAT
+            Seconds from some fixed point, for measuring how long something took.
+
+        """
+        return time.monotonic()
+
+    def now(self, tz: Optional[datetime.tzinfo] = None) -> datetime.datetime:
+        """
+        Parameters
+        ----------
+        tz : datetime.tzinfo, optional
+            Time zone, as for datetime.datetime.now.  The default is None, for a naive local time.
+
+        Returns
+        -------
+        datetime.datetime
+            The current time.
+
+        """
+        return datetime.datetime.fromtimestamp(self.time(), tz)
+
+    def sleep(self, seconds: Union[int, float]) -> None:
+        """
+        Parameters
+        ----------
+        seconds : INT or FLOAT
+            How long to sleep for.
+
+        Returns
+        -------
+        None.
+
+        """
+        time.sleep(max(seconds, 0))
+
+    def wait(self, event: threading.Event, timeout: Optional[Union[int, float]] = None) -> bool:
+        """
+        Parameters
+        ----------
+        event : threading.Event
+            Event to wait for.
+        timeout : INT or FLOAT, optional
+            Longest to wait, in seconds.  The default is None, which waits until the event is set.
+
+        Returns
+        -------
+        BOOL
+            Whether the event was set, like threading.Event.wait.
+
+        """
+        return event.wait(timeout=timeout)
+
+
+class SimulatedClock(Clock):
+
+    def __init__(self, start: Optional[Union[float, datetime.datetime]] = None, speed: float = 1.0,
+                 idle: float = 0.005):
+        """
+        Description
+        -----------
+        A clock that jumps over waits.  Simulated time runs speed times faster than real time, but whenever the
+        process has been idle for idle real seconds (no thread has used the clock, and hardly any CPU time was
+        used), simulated time jumps straight to the earliest time that a thread is sleeping or waiting until.  So a
+        night of exposures, weather checks and closures, which is nearly all waiting, passes in the time it takes to
+        do the work in between.  A thread that is blocked on something else in real time, like a serial port, is not
+        seen, and time can jump while it waits; so the simulated hardware should take its time from this clock too
+        (see Simulator), and the clock should only be started, after which it can jump, once everything has been set
+        up and has connected.
+
+        Parameters
+        ----------
+        start : FLOAT or datetime.datetime, optional
+            Simulated time to start at, in seconds since the epoch or as a timezone aware time.  The default is None,
+            which starts at the real time.
+        speed : FLOAT, optional
+            How many times faster than real time the simulated time runs between jumps.  The default is 1.
+        idle : FLOAT, optional
+            Real seconds without any use of the clock before time jumps.  The default is 0.005.
+
+        Returns
+        -------
+        None.
+
+        """
+        if speed <= 0:
+            raise ValueError('Clock speed must be positive')
+        if isinstance(start, datetime.datetime):
+            start = start.timestamp()
+        self.speed = speed
+        self.idle = idle
+        self.jumps = 0
+        self.skipped = 0.0
+        self._lock = threading.Lock()
+        self._time = time.time() if start is None else float(start)
+        self._real = time.monotonic()
+        self._active = self._real
+        self._cpu = time.process_time()
+        self._sleepers = []
+        self._order = itertools.count()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='Clock-Th', daemon=True)
+
+    def _now(self):
+        return self._time + (time.monotonic() - self._real) * self.speed
+
+    def time(self) -> float:
+        with self._lock:
+            self._active = time.monotonic()
+            return self._now()
+
+    def monotonic(self) -> float:
+        # Simulated time never goes backwards, so it doubles as the monotonic clock
+        return self.time()
+
+    def sleep(self, seconds: Union[int, float]) -> None:
+        self.wait(None, seconds)
+
+    def wait(self, event: Optional[threading.Event], timeout: Optional[Union[int, float]] = None) -> bool:
+        if timeout is None:
+            return event.wait()
+        with self._lock:
+            self._active = time.monotonic()
+            sleeper = (self._now() + max(timeout, 0), next(self._order), threading.Event())
+            heapq.heappush(self._sleepers, sleeper)
+        (wake, _, woken) = sleeper
+        try:
+            while event is None or not event.is_set():
+                with self._lock:
+                    remaining = (wake - self._now()) / self.speed
+                if remaining <= 0:
+                    break
+                # An event can be set by anyone, so it is polled; a plain sleep only ends on time
+                woken.wait(timeout=min(remaining, _EVENT_POLL) if event is not None else remaining)
+        finally:
+            with self._lock:
+                self._sleepers.remove(sleeper)
+                heapq.heapify(self._sleepers)
+                self._active = time.monotonic()
+        return event is not None and event.is_set()
+
+    def advance(self, seconds: Union[int, float]) -> None:
+        """
+        Description
+        -----------
+        Moves simulated time forward, waking anyone whose wait has run out.
+
+        Parameters
+        ----------
+        seconds : INT or FLOAT
+            How far to move it forward.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self._lock:
+            self._jump(self._now() + max(seconds, 0))
+
+    def _jump(self, target):
+        # Lock must be held
+        now = self._now()
+        if target > now:
+            self._time = target
+            self._real = time.monotonic()
+            self.jumps += 1
+            self.skipped += target - now
+        self._active = time.monotonic()
+        for (wake, _, woken) in self._sleepers:
+            if wake <= target:
+                woken.set()
+
+    def _run(self):
+        real = time.monotonic()
+        while not self.stopping.wait(timeout=self.idle / 2):
+            (cpu, last_cpu) = (time.process_time(), self._cpu)
+            (real, last_real) = (time.monotonic(), real)
+            self._cpu = cpu
+            with self._lock:
+                # Threads busy working (saving an image, fitting a focus curve) are not idle either
+                if cpu - last_cpu > _BUSY_CPU * (real - last_real):
+                    self._active = real
+                if not self._sleepers or real - self._active < self.idle:
+                    continue
+                # Threads that were woken and have not run yet are not idle, just slow to be scheduled
+                if any(woken.is_set() for (_, _, woken) in self._sleepers):
+                    continue
+                self._jump(self._sleepers[0][0])
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopping.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout=1)
+
+
+_clock = Clock()
+
+
+def get_clock() -> Clock:
+    """
+    Returns
+    -------
+    Clock
+        The clock that the observing code takes its time from: the real clock, unless set_clock was given another.
+
+    """
+    return _clock
+
+
+def set_clock(clock: Optional[Clock]) -> None:
+    """
+    Description
+    -----------
+    Makes every class created from now on take its time from the given clock.  Like backend.set_simulator, it must be
+    called before the hardware and observing classes are created, since they keep the clock they were made with.
+
+    Parameters
+    ----------
+    clock : Clock or None
+        The clock to use, like a SimulatedClock.  None switches back to the real clock.
+
+    Returns
+    -------
+    None.
+
+    """
+    global _clock
+    _clock = clock if clock is not None else Clock()
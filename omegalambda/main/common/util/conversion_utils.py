@@ -3,17 +3,18 @@ import re
 import datetime
 from typing import Tuple, Union, Optional
 
-from scipy.optimize import minimize_scalar
-from astropy import units as u
-from astropy.coordinates import SkyCoord, FK5, AltAz, get_sun, EarthLocation
-from astropy.time import Time
 from numba import jit, njit, prange
 
 from . import time_utils
 
 
-@njit(parallel=True)
+@njit(parallel=True, cache=True)
 def _internal_altaz_to_radec(azimuth, altitude, latitude, lst, refraction):
+    return _altaz_to_radec(azimuth, altitude, latitude, lst, refraction)
+
+
+@njit(cache=True)
+def _altaz_to_radec(azimuth, altitude, latitude, lst, refraction):
     if refraction:
         pressure = 760
         temperature = 10
@@ -100,12 +101,18 @@ def convert_altaz_to_radec(azimuth: float, altitude: float, latitude: float, lon
         Calculated declination of target.
     """
     lst = time_utils.get_local_sidereal_time(longitude, time, leap_seconds)
-    ra, dec = _internal_altaz_to_radec(azimuth, altitude, latitude, lst, refraction)
+    # Always floats, so that the kernel is only ever compiled (and warmed up) for one signature
+    ra, dec = _internal_altaz_to_radec(float(azimuth), float(altitude), float(latitude), lst, bool(refraction))
     return ra, dec
 
 
-@njit(parallel=True)
+@njit(parallel=True, cache=True)
 def _internal_radec_to_altaz(ra, dec, latitude, longitude, lst, refraction):
+    return _radec_to_altaz(ra, dec, latitude, lst, refraction)
+
+
+@njit(cache=True)
+def _radec_to_altaz(ra, dec, latitude, lst, refraction):
     ha = (lst - ra) % 24
     if ha > 12:
         ha -= 24
@@ -113,7 +120,6 @@ def _internal_radec_to_altaz(ra, dec, latitude, longitude, lst, refraction):
     ha *= 15
     dec_r = dec * np.pi/180
     latitude_r = latitude * np.pi/180
-    longitude_r = longitude * np.pi/180
     HA_r = ha * np.pi/180
 
     alt_r = np.arcsin(np.sin(dec_r) * np.sin(latitude_r) + np.cos(dec_r) * np.cos(latitude_r) * np.cos(HA_r))
@@ -174,10 +180,139 @@ def convert_radec_to_altaz(ra: float, dec: float, latitude: float, longitude: fl
         Calculated altitude of target.
     """
     lst = time_utils.get_local_sidereal_time(longitude, time, leap_seconds)
-    az, alt = _internal_radec_to_altaz(ra, dec, latitude, longitude, lst, refraction)
+    # Always floats, so that the kernel is only ever compiled (and warmed up) for one signature
+    az, alt = _internal_radec_to_altaz(float(ra), float(dec), float(latitude), float(longitude), lst,
+                                       bool(refraction))
     return az, alt
 
 
+@njit(parallel=True, cache=True)
+def _internal_radec_to_altaz_array(ra, dec, latitude, longitude, julian_dates, leap_seconds, refraction):
+    n = ra.shape[0]
+    m = julian_dates.shape[0]
+    lst = np.empty(m)
+    for j in prange(m):
+        lst[j] = time_utils._internal_local_sidereal_time(julian_dates[j], longitude, leap_seconds)
+    ha = np.empty((n, m))
+    az = np.empty((n, m))
+    alt = np.empty((n, m))
+    secz = np.empty((n, m))
+    for k in prange(n * m):
+        i = k // m
+        j = k % m
+        hour_angle = (lst[j] - ra[i]) % 24
+        if hour_angle > 12:
+            hour_angle -= 24
+        ha[i, j] = hour_angle
+        az[i, j], alt[i, j] = _radec_to_altaz(ra[i], dec[i], latitude, lst[j], refraction)
+        secz[i, j] = 1 / np.sin(np.radians(alt[i, j])) if alt[i, j] > 0 else np.nan
+    return lst, ha, az, alt, secz
+
+
+def convert_radec_to_altaz_array(ra: Union[float, np.ndarray], dec: Union[float, np.ndarray], latitude: float,
+                                 longitude: float, julian_dates: Union[float, np.ndarray], leap_seconds: float = 0,
+                                 refraction=True) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Convert celestial coordinates to horizontal coordinates for N targets at M times at once, in a single compiled
+    call.  Same formulas as convert_radec_to_altaz.
+
+    Parameters
+    ----------
+    ra : FLOAT or NUMPY ARRAY
+        Right ascensions of the targets in hours.
+    dec : FLOAT or NUMPY ARRAY
+        Declinations of the targets in degrees, one for each right ascension.
+    latitude : FLOAT
+        Latitude of observatory.
+    longitude : FLOAT
+        Longitude of observatory.
+    julian_dates : FLOAT or NUMPY ARRAY
+        Julian dates (UTC) to calculate the coordinates at.
+    leap_seconds : INT
+        Leap second offset between TAI and TT.  If 0, will look it up in the bundled leap second table.
+    refraction : BOOL
+        Whether or not to correct for atmospheric refraction.
+
+    Returns
+    -------
+    lst : NUMPY ARRAY
+        Local sidereal time in hours at each julian date, shape (M,).
+    ha : NUMPY ARRAY
+        Hour angle of each target at each time in hours, between -12 and 12, shape (N, M).
+    az : NUMPY ARRAY
+        Azimuth of each target at each time, shape (N, M).
+    alt : NUMPY ARRAY
+        Altitude of each target at each time, shape (N, M).
+    airmass : NUMPY ARRAY
+        Airmass of each target at each time, shape (N, M).  NaN where the target is below the horizon.
+    """
+    ra = np.atleast_1d(np.asarray(ra, dtype=np.float64)).ravel()
+    dec = np.atleast_1d(np.asarray(dec, dtype=np.float64)).ravel()
+    julian_dates = np.atleast_1d(np.asarray(julian_dates, dtype=np.float64)).ravel()
+    if leap_seconds == 0:
+        leap_seconds = time_utils.get_leap_seconds(float(julian_dates.min()) if julian_dates.size else None)
+    return _internal_radec_to_altaz_array(ra, dec, float(latitude), float(longitude), julian_dates,
+                                          float(leap_seconds), bool(refraction))
+
+
+@njit(parallel=True, cache=True)
+def _internal_altaz_to_radec_array(azimuth, altitude, latitude, longitude, julian_dates, leap_seconds, refraction):
+    n = azimuth.shape[0]
+    m = julian_dates.shape[0]
+    lst = np.empty(m)
+    for j in prange(m):
+        lst[j] = time_utils._internal_local_sidereal_time(julian_dates[j], longitude, leap_seconds)
+    ra = np.empty((n, m))
+    dec = np.empty((n, m))
+    for k in prange(n * m):
+        i = k // m
+        j = k % m
+        ra[i, j], dec[i, j] = _altaz_to_radec(azimuth[i], altitude[i], latitude, lst[j], refraction)
+    return lst, ra, dec
+
+
+def convert_altaz_to_radec_array(azimuth: Union[float, np.ndarray], altitude: Union[float, np.ndarray],
+                                 latitude: float, longitude: float, julian_dates: Union[float, np.ndarray],
+                                 leap_seconds: float = 0, refraction=True) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Convert horizontal coordinates to celestial coordinates for N pointings at M times at once, in a single compiled
+    call.  Same formulas as convert_altaz_to_radec.
+
+    Parameters
+    ----------
+    azimuth : FLOAT or NUMPY ARRAY
+        Azimuths of the pointings in degrees.
+    altitude : FLOAT or NUMPY ARRAY
+        Altitudes of the pointings in degrees, one for each azimuth.
+    latitude : FLOAT
+        Latitude of observatory, degrees North.
+    longitude : FLOAT
+        Longitude of observatory, degrees East.
+    julian_dates : FLOAT or NUMPY ARRAY
+        Julian dates (UTC) to calculate the coordinates at.
+    leap_seconds : INT
+        Leap second offset between TAI and TT.  If 0, will look it up in the bundled leap second table.
+    refraction : BOOL
+        Whether or not to correct for atmospheric refraction.
+
+    Returns
+    -------
+    lst : NUMPY ARRAY
+        Local sidereal time in hours at each julian date, shape (M,).
+    ra : NUMPY ARRAY
+        Right ascension of each pointing at each time in hours, shape (N, M).
+    dec : NUMPY ARRAY
+        Declination of each pointing at each time in degrees, shape (N, M).
+    """
+    azimuth = np.atleast_1d(np.asarray(azimuth, dtype=np.float64)).ravel()
+    altitude = np.atleast_1d(np.asarray(altitude, dtype=np.float64)).ravel()
+    julian_dates = np.atleast_1d(np.asarray(julian_dates, dtype=np.float64)).ravel()
+    if leap_seconds == 0:
+        leap_seconds = time_utils.get_leap_seconds(float(julian_dates.min()) if julian_dates.size else None)
+    return _internal_altaz_to_radec_array(azimuth, altitude, float(latitude), float(longitude), julian_dates,
+                                          float(leap_seconds), bool(refraction))
+
+
 def convert_j2000_to_apparent(ra: float, dec: float) -> Tuple[float, float]:
     """
     Parameters
@@ -195,6 +330,10 @@ def convert_j2000_to_apparent(ra: float, dec: float) -> Tuple[float, float]:
     coords_apparent.dec.degree: FLOAT
         Declination of target in local topocentric coordinates ("JNow").
     """
+    # astropy.coordinates is slow to import, so it is only imported when needed
+    from astropy import units as u
+    from astropy.coordinates import SkyCoord, FK5
+    from astropy.time import Time
     obstime = Time(datetime.datetime.now(datetime.timezone.utc))
     # Start with ICRS
     coords_j2000 = SkyCoord(ra=ra*u.hourangle, dec=dec*u.degree, frame='icrs')
@@ -220,6 +359,9 @@ def convert_apparent_to_j2000(ra: float, dec: float) -> Tuple[float, float]:
     coords_j2000.dec.degree: FLOAT
         Declination of target in J2000.
     """
+    from astropy import units as u
+    from astropy.coordinates import SkyCoord, FK5
+    from astropy.time import Time
     obstime = Time(datetime.datetime.now(datetime.timezone.utc))
     # Start with FK5 (close enough to ICRS) with equinox at apparent time
     coords_apparent = SkyCoord(ra=ra*u.hourangle, dec=dec*u.degree, frame=FK5(equinox=obstime))
@@ -248,6 +390,8 @@ def get_sun_elevation(time: Union[str, datetime.datetime], latitude: float, long
     """
     if type(time) is not datetime.datetime:
         time = time_utils.convert_to_datetime_utc(time)
+    from astropy.coordinates import get_sun
+    from astropy.time import Time
     astrotime = Time(time, format='datetime', scale='utc')
     coords = get_sun(astrotime)
     (az, alt) = convert_radec_to_altaz(float(coords.ra.hour), float(coords.dec.degree), latitude, longitude, time)
@@ -281,17 +425,18 @@ def get_sunset(day: Union[str, datetime.datetime], latitude: float, longitude: f
         h, m, s = hms.split(':')
         return (get_sun_elevation(day.replace(hour=int(h), minute=int(m), second=int(float(s))), latitude, longitude) + 12)**2
 
+    from scipy.optimize import minimize_scalar
     sunset_hours = minimize_scalar(sunalt12, bounds=(12, 23), method='bounded')['x']
     hour, minute, second = sexagesimal(sunset_hours).split(':')
     return day.replace(hour=int(hour), minute=int(minute), second=int(float(second)), tzinfo=datetime.timezone.utc) - day.utcoffset()
 
 
-@njit(parallel=True)
+@njit(parallel=True, cache=True)
 def airmass(altitude: float) -> float:
     return 1/np.cos(np.pi/2 - np.radians(altitude))
 
 
-@njit
+@njit(cache=True)
 def truncate(number, digits) -> float:
     stepper = np.power(10, digits)
     return int(stepper * number) / stepper
@@ -0,0 +1,277 @@
+# Precomputed positions of each target over the night, looked up by time instead of recalculated
+import datetime
+import logging
+import numpy as np
+from typing import Dict, NamedTuple, Optional, Sequence, Union
+
+from . import conversion_utils
+
+
+class EphemerisPoint(NamedTuple):
+    ra: float
+    dec: float
+    alt: float
+    az: float
+    airmass: float
+    ha: float
+    sun_separation: float
+    moon_separation: float
+
+
+def _to_jd(time):
+    if isinstance(time, datetime.datetime):
+        return 2440587.5 + time.timestamp() / 86400
+    return time
+
+
+def _separation(ra1, dec1, ra2, dec2):
+    # Angular separation in degrees, with right ascensions in hours
+    (ra1, dec1, ra2, dec2) = (np.radians(ra1 * 15), np.radians(dec1), np.radians(ra2 * 15), np.radians(dec2))
+    cos = np.sin(dec1) * np.sin(dec2) + np.cos(dec1) * np.cos(dec2) * np.cos(ra1 - ra2)
+    return np.degrees(np.arccos(np.clip(cos, -1, 1)))
+
+
+class Ephemeris:
+
+    columns = ('ra', 'dec', 'alt', 'az', 'airmass', 'ha', 'sun_separation', 'moon_separation')
+    # Columns that wrap around, and what they wrap at
+    _periods = {'ra': 24, 'az': 360, 'ha': 24}
+
+    def __init__(self, ra, dec, jd0, step, table, latitude, longitude):
+        """
+        Description
+        -----------
+        Table of a target's apparent coordinates, altitude, azimuth, airmass, hour angle and separation from the Sun
+        and Moon at evenly spaced times.  Made by build_ephemerides rather than directly.  Looking up a time takes
+        the same few operations however long the table is: the row is found from the time by arithmetic, and the
+        values are interpolated linearly between that row and the next.  Times outside the table are calculated
+        directly, the slow way.
+
+        Parameters
+        ----------
+        ra : FLOAT
+            J2000 right ascension of the target in hours.
+        dec : FLOAT
+            J2000 declination of the target in degrees.
+        jd0 : FLOAT
+            Julian date (UTC) of the first row.
+        step : FLOAT
+            Time between rows, in days.
+        table : DICT
+            An array for each of Ephemeris.columns, all the same length.  Columns that wrap around (ra, az, ha) are
+            unwrapped, so that they can be interpolated.
+        latitude : FLOAT
+            Latitude of the observatory.
+        longitude : FLOAT
+            Longitude of the observatory.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.ra = ra
+        self.dec = dec
+        self.jd0 = jd0
+        self.step = step
+        self.table = table
+        self.latitude = latitude
+        self.longitude = longitude
+        self.rows = len(table['alt'])
+
+    @property
+    def jd_end(self):
+        return self.jd0 + (self.rows - 1) * self.step
+
+    def covers(self, time: Union[float, datetime.datetime]) -> bool:
+        """
+        Parameters
+        ----------
+        time : FLOAT or datetime.datetime
+            Julian date (UTC) or time.
+
+        Returns
+        -------
+        BOOL
+            Whether the time is inside the table.
+
+        """
+        jd = _to_jd(time)
+        return self.jd0 <= jd <= self.jd_end
+
+    def at(self, time: Union[float, datetime.datetime]) -> EphemerisPoint:
+        """
+        Parameters
+        ----------
+        time : FLOAT or datetime.datetime
+            Julian date (UTC) or time to look up.
+
+        Returns
+        -------
+        EphemerisPoint
+            ra and dec (apparent, in hours and degrees), alt, az, airmass (NaN below the horizon), ha (in hours,
+            between -12 and 12), sun_separation and moon_separation (in degrees) at that time.
+
+        """
+        jd = _to_jd(time)
+        if not self.covers(jd):
+            logging.debug('{} is outside of the ephemeris, calculating it directly'.format(jd))
+            point = build_ephemerides([(self.ra, self.dec)], jd, jd, self.step, self.latitude, self.longitude)[0]
+            return point.at(jd)
+        x = (jd - self.jd0) / self.step
+        i = min(int(x), self.rows - 2) if self.rows > 1 else 0
+        f = x - i
+        values = {}
+        for column in self.columns:
+            values[column] = self.table[column][i] + (self.table[column][i + 1] - self.table[column][i]) * f \
+                if self.rows > 1 else self.table[column][0]
+        for (column, period) in self._periods.items():
+            values[column] %= period
+        if values['ha'] > 12:
+            values['ha'] -= 24
+        values['airmass'] = 1 / np.sin(np.radians(values['alt'])) if values['alt'] > 0 else np.nan
+        return EphemerisPoint(**{column: float(value) for (column, value) in values.items()})
+
+    def sample(self, times: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Description
+        -----------
+        Looks up many times at once, like for the scheduler's grid.
+
+        Parameters
+        ----------
+        times : NUMPY ARRAY
+            Julian dates (UTC), all inside the table.
+
+        Returns
+        -------
+        DICT
+            An array of each of Ephemeris.columns at the times, wrapped and with airmass as in at().
+
+        """
+        x = np.clip((np.asarray(times, dtype=float) - self.jd0) / self.step, 0, self.rows - 1)
+        i = np.minimum(x.astype(int), max(self.rows - 2, 0))
+        f = x - i
+        j = np.minimum(i + 1, self.rows - 1)
+        values = {column: self.table[column][i] + (self.table[column][j] - self.table[column][i]) * f
+                  for column in self.columns}
+        for (column, period) in self._periods.items():
+            values[column] %= period
+        values['ha'] = np.where(values['ha'] > 12, values['ha'] - 24, values['ha'])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values['airmass'] = np.where(values['alt'] > 0, 1 / np.sin(np.radians(values['alt'])), np.nan)
+        return values
+
+
+def build_ephemerides(targets: Sequence, start: Union[float, datetime.datetime], end: Union[float, datetime.datetime],
+                      step: float = 1 / 1440, latitude: Optional[float] = None, longitude: Optional[float] = None,
+                      windows: Optional[Sequence] = None):
+    """
+    Description
+    -----------
+    Builds the ephemeris of many targets over the same night in one pass: the Sun and Moon positions are calculated
+    once for the whole grid of times, the apparent coordinates of every target at once with astropy (at the start
+    and end of the night; precession is linear over a night), and the altitudes, azimuths and hour angles of every
+    target at every time in a single compiled call.
+
+    Parameters
+    ----------
+    targets : LIST
+        (ra, dec) of each target, in J2000 hours and degrees.
+    start : FLOAT or datetime.datetime
+        Julian date (UTC) or time to start at.
+    end : FLOAT or datetime.datetime
+        Julian date (UTC) or time to end at.
+    step : FLOAT, optional
+        Time between rows in days.  The default is 1/1440, one minute.
+    latitude : FLOAT, optional
+        Latitude of the observatory.  The default is None, which uses the config's site_latitude.
+    longitude : FLOAT, optional
+        Longitude of the observatory.  The default is None, which uses the config's site_longitude.
+    windows : LIST, optional
+        (start, end) of each target, to keep only that part of the night in its table (with a row to spare at each
+        end).  The default is None, which keeps the whole night for every target.
+
+    Returns
+    -------
+    LIST
+        An Ephemeris for each target.
+
+    """
+    # astropy.coordinates is slow to import, so it is only imported when needed
+    from astropy import units as u
+    from astropy.coordinates import SkyCoord, FK5, get_sun, get_body
+    from astropy.time import Time
+    if latitude is None or longitude is None:
+        from ..IO import config_reader
+        config = config_reader.get_config()
+        latitude = config.site_latitude if latitude is None else latitude
+        longitude = config.site_longitude if longitude is None else longitude
+    (jd_start, jd_end) = (_to_jd(start), _to_jd(end))
+    rows = max(int(np.ceil((jd_end - jd_start) / step)) + 1, 2)
+    jds = jd_start + np.arange(rows) * step
+
+    ra2k = np.array([target[0] for target in targets], dtype=float)
+    dec2k = np.array([target[1] for target in targets], dtype=float)
+    equinoxes = Time([jds[0], jds[-1]], format='jd', scale='utc')
+    coords = SkyCoord(ra=ra2k[:, np.newaxis] * u.hourangle, dec=dec2k[:, np.newaxis] * u.degree,
+                      frame='icrs').transform_to(FK5(equinox=equinoxes))
+    fraction = (jds - jds[0]) / (jds[-1] - jds[0])
+    ra_ends = np.unwrap(coords.ra.hour * np.pi / 12, axis=1) * 12 / np.pi
+    ra = ra_ends[:, :1] + (ra_ends[:, 1:] - ra_ends[:, :1]) * fraction
+    dec = coords.dec.degree[:, :1] + (coords.dec.degree[:, 1:] - coords.dec.degree[:, :1]) * fraction
+
+    # Refraction and the LST are the same as the telescope limit check uses
+    (_, ha, az, alt, airmass) = conversion_utils.convert_radec_to_altaz_array(ra.mean(axis=1), dec.mean(axis=1),
+                                                                              latitude, longitude, jds)
+    times = Time(jds, format='jd', scale='utc')
+    sun = get_sun(times)
+    moon = get_body('moon', times)
+    sun_separation = _separation(ra, dec, sun.ra.hour, sun.dec.degree)
+    moon_separation = _separation(ra, dec, moon.ra.hour, moon.dec.degree)
+
+    ephemerides = []
+    for k in range(len(targets)):
+        if windows is not None:
+            (first, last) = (_to_jd(windows[k][0]), _to_jd(windows[k][1]))
+            i = int(np.clip(np.floor((first - jd_start) / step) - 1, 0, rows - 2))
+            j = int(np.clip(np.ceil((last - jd_start) / step) + 2, i + 2, rows))
+        else:
+            (i, j) = (0, rows)
+        table = {'ra': ra[k, i:j], 'dec': dec[k, i:j], 'alt': alt[k, i:j],
+                 'az': np.unwrap(np.radians(az[k, i:j])) * 180 / np.pi,
+                 'airmass': airmass[k, i:j], 'ha': np.unwrap(ha[k, i:j] * np.pi / 12) * 12 / np.pi,
+                 'sun_separation': sun_separation[k, i:j], 'moon_separation': moon_separation[k, i:j]}
+        # Copies, so that the full night's arrays can be freed
+        ephemerides.append(Ephemeris(float(ra2k[k]), float(dec2k[k]), float(jds[i]), step,
+                                     {column: np.array(values) for (column, values) in table.items()},
+                                     latitude, longitude))
+    return ephemerides
+
+
+def build_ticket_ephemerides(tickets, step: float = 1 / 1440, margin: float = 30) -> Dict:
+    """
+    Parameters
+    ----------
+    tickets : LIST
+        ObservationTicket objects.
+    step : FLOAT, optional
+        Time between rows in days.  The default is 1/1440, one minute.
+    margin : FLOAT, optional
+        Minutes to cover before each ticket's start time and after its end time.  The default is 30.
+
+    Returns
+    -------
+    DICT
+        The Ephemeris of each ticket, keyed by ticket, covering its start to end time.
+
+    """
+    tickets = list(tickets)
+    if not tickets:
+        return {}
+    margin = datetime.timedelta(minutes=margin)
+    windows = [(ticket.start_time - margin, ticket.end_time + margin) for ticket in tickets]
+    ephemerides = build_ephemerides([(ticket.ra, ticket.dec) for ticket in tickets],
+                                    min(window[0] for window in windows), max(window[1] for window in windows),
+                                    step, windows=windows)
+    return dict(zip(tickets, ephemerides))
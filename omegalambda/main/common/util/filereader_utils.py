@@ -2,33 +2,191 @@
 import logging
 import os
 import datetime
+import copy
 import numpy as np
-import matplotlib
 from typing import Union, Optional, Tuple
 
-import photutils
 from astropy.io import fits
 from astropy.stats import sigma_clipped_stats
-from photutils.aperture import CircularAperture, CircularAnnulus
+from scipy.spatial import cKDTree
 import threading
 
-from numba import jit, njit, prange
+from numba import njit, prange
 
 from ..IO import config_reader
+from . import plot_utils
 
 np.warnings.filterwarnings('ignore')
-# See condition_checker.py for explanation
-matplotlib.use('Agg', force=True)
-import matplotlib.pyplot as plt
-import matplotlib.colors as colors
 
 
-def mediancounts(image_path: str) -> float:
+class ImageContext:
+
+    def __init__(self, path: str, dtype: Optional[Union[str, np.dtype]] = None, sigma: float = 3,
+                 nsigma: float = 5, section: Optional[Tuple[int, int, int, int]] = None):
+        """
+        Description
+        -----------
+        Opens a FITS image once, memory-mapped, and caches the quantities that the star-finding and FWHM routines
+        need from it (sigma-clipped sky statistics and the detection threshold).  An ImageContext can be passed
+        to findstars, mediancounts, radial_average and Guider.find_guide_star in place of a file path so that
+        a single frame is only read and sigma-clipped once.
+
+        Parameters
+        ----------
+        path : STR
+            Path to the fits image file.
+        dtype : STR or NUMPY DTYPE, optional
+            Data type to convert the image data to (i.e. 'float32').  The default is None, which keeps the
+            native data type of the file.
+        sigma : FLOAT, optional
+            Number of standard deviations used for the sigma-clipped sky statistics.  The default is 3.
+        nsigma : FLOAT, optional
+            Number of standard deviations above the sky for the star detection threshold.  The default is 5.
+        section : TUPLE, optional
+            (x start, x end, y start, y end) pixel bounds of the only part of the image to read.  The bounds are
+            clipped to the image.  Only the rows of the file that overlap the section are read from disk, and the
+            sky statistics are computed from the section alone.  The default is None, which reads the entire image.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.path = path
+        self.sigma = sigma
+        self.nsigma = nsigma
+        self._hdul = fits.open(path, memmap=True, do_not_scale_image_data=True)
+        header = self._hdul[0].header
+        data = self._hdul[0].data
+        self.header = header
+        self.origin = (0, 0)
+        if section is not None:
+            x0, x1, y0, y1 = _clip_section(section, data.shape)
+            # Slicing the memory map before doing anything else keeps the rest of the frame on disk
+            data = data[y0:y1, x0:x1]
+            self.origin = (x0, y0)
+        bscale = header.get('BSCALE', 1)
+        bzero = header.get('BZERO', 0)
+        if bscale == 1 and bzero == 32768 and data.dtype.kind == 'i' and data.dtype.itemsize == 2:
+            # Unsigned 16 bit data (what MaxIm saves): flipping the sign bit is the same as adding BZERO
+            data = data.view(data.dtype.byteorder + 'u2') ^ np.uint16(0x8000)
+        elif bscale != 1 or bzero != 0:
+            # Any other scaled data cannot stay memory-mapped, so it is scaled here in a single pass
+            data = data.astype(dtype or np.float64) * bscale + bzero
+        self.data: np.ndarray = data if dtype is None else data.astype(dtype, copy=False)
+        logging.debug('Image data read sucessfully from {}'.format(path))
+        self._stats = None
+
+    def section(self, section: Tuple[int, int, int, int]) -> 'ImageContext':
+        """
+        Description
+        -----------
+        Creates an ImageContext for part of this image, without reading the file again.  Its sky statistics are
+        computed from the section alone.
+
+        Parameters
+        ----------
+        section : TUPLE
+            (x start, x end, y start, y end) pixel bounds of the section, relative to this image.  The bounds are
+            clipped to the image.
+
+        Returns
+        -------
+        ImageContext
+            The section of the image.  Its origin is relative to the full frame.
+
+        """
+        x0, x1, y0, y1 = _clip_section(section, self.data.shape)
+        context = copy.copy(self)
+        context.data = self.data[y0:y1, x0:x1]
+        context.origin = (self.origin[0] + x0, self.origin[1] + y0)
+        context._stats = None
+        return context
+
+    @property
+    def stats(self) -> Tuple[float, float, float]:
+        """
+        Returns
+        -------
+        TUPLE
+            The sigma-clipped (mean, median, standard deviation) of the image.  Computed on first use only.
+
+        """
+        if self._stats is None:
+            self._stats = sigma_clipped_stats(self.data, sigma=self.sigma)
+        return self._stats
+
+    @property
+    def median(self) -> float:
+        return self.stats[1]
+
+    @property
+    def stdev(self) -> float:
+        return self.stats[2]
+
+    @property
+    def threshold(self) -> float:
+        """
+        Returns
+        -------
+        FLOAT
+            Detection threshold for stars: the sky median plus nsigma times the sky standard deviation.
+
+        """
+        return self.median + self.nsigma * self.stdev
+
+    def close(self):
+        """
+        Description
+        -----------
+        Closes the underlying fits file.  The memory map stays valid for as long as self.data is referenced.
+
+        Returns
+        -------
+        None.
+
+        """
+        self._hdul.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _clip_section(section: Tuple[int, int, int, int], shape: Tuple[int, ...]) -> Tuple[int, int, int, int]:
+    """
+    Clips (x start, x end, y start, y end) pixel bounds to an image of the given (y, x) shape.
+    """
+    x0, x1, y0, y1 = (int(bound) for bound in section)
+    return max(x0, 0), min(max(x1, 0), shape[1]), max(y0, 0), min(max(y1, 0), shape[0])
+
+
+def _open_image(image: Union[str, ImageContext]) -> Tuple[ImageContext, bool]:
+    """
+    Parameters
+    ----------
+    image : STR or ImageContext
+        Path to a fits image file, or an already opened ImageContext.
+
+    Returns
+    -------
+    TUPLE
+        The ImageContext for the image, and whether it was opened here (and so must be closed by the caller).
+
+    """
+    if isinstance(image, ImageContext):
+        return image, False
+    return ImageContext(image), True
+
+
+def mediancounts(image: Union[str, ImageContext]) -> float:
     """
     Parameters
     ----------
-    image_path : STR
-        Path to image file to calculate median counts for.
+    image : STR or ImageContext
+        Path to image file, or opened ImageContext, to calculate median counts for.
 
     Returns
     -------
@@ -36,12 +194,49 @@ def mediancounts(image_path: str) -> float:
         Median counts of the specified image file.
 
     """
-    image = fits.getdata(image_path)
-    mean, median, stdev = sigma_clipped_stats(image, sigma=3)
+    context, owned = _open_image(image)
+    median = context.median
+    if owned:
+        context.close()
     return median
     
     
-def findstars(path: str, saturation: Union[int, float], subframe: Optional[Tuple[int]] = None,
+# Fields of the structured arrays returned by findstars
+STAR_DTYPE = np.dtype([('x', np.int64), ('y', np.int64), ('peak', np.float64), ('flux', np.float64),
+                       ('isolation', np.float64)])
+
+
+def _aperture_flux(image: np.ndarray, x: np.ndarray, y: np.ndarray, sky: float, r: int = 5) -> np.ndarray:
+    """
+    Description
+    -----------
+    Sky-subtracted counts inside a circular aperture of radius r around each (x, y) position, all at once.
+    Apertures that run off the edge of the image are clipped to it.
+
+    """
+    dy, dx = np.mgrid[-r:r + 1, -r:r + 1]
+    inside = dx ** 2 + dy ** 2 <= r ** 2
+    dx, dy = dx[inside], dy[inside]
+    xs = np.clip(x[:, np.newaxis] + dx, 0, image.shape[1] - 1)
+    ys = np.clip(y[:, np.newaxis] + dy, 0, image.shape[0] - 1)
+    return (image[ys, xs] - sky).sum(axis=1)
+
+
+def _isolation(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Description
+    -----------
+    Distance from each (x, y) position to its nearest neighbor, found with a KD-tree.  A lone position has an
+    isolation of infinity.
+
+    """
+    if len(x) < 2:
+        return np.full(len(x), np.inf)
+    distances, _ = cKDTree(np.column_stack((x, y))).query(np.column_stack((x, y)), k=2)
+    return distances[:, 1]
+
+
+def findstars(image: Union[str, ImageContext], saturation: Union[int, float], subframe: Optional[Tuple[int]] = None,
               return_data: bool = False):
     """
     Description
@@ -50,71 +245,204 @@ def findstars(path: str, saturation: Union[int, float], subframe: Optional[Tuple
 
     Parameters
     ----------
-    path : STR
-        Path to fits image file with stars in it.
+    image : STR or ImageContext
+        Path to fits image file with stars in it, or an opened ImageContext of that file.
     saturation : INT
         Number of counts for a star to be considered saturated for a specific CCD Camera.
     subframe : TUPLE
-        Tuple with x coordinate and y coordinate of the star to create a subframe around.
+        Tuple with x coordinate and y coordinate of the star to create a subframe around.  Only the subframe is read
+        from the image, and the sky background and detection threshold are computed from it alone.
     return_data : BOOL, optional
         If True, returns the image data and the standard deviation as well.  Mostly used for Radial_Average.
         The default is False.
 
     Returns
     -------
-    Tuple
-        Returns a tuple with the first element being a list of stars where each star is a tuple with
-        (x position, y position).  The second element is a list of peak count values.
+    stars : NUMPY STRUCTURED ARRAY
+        One entry per star, with fields (see STAR_DTYPE) x and y for the peak position (relative to the subframe
+        if there is one), peak for the peak counts, flux for the sky-subtracted counts within 5 pixels of the peak,
+        and isolation for the distance in pixels to the nearest other detected star.
 
     """
-    image = fits.getdata(path)
-    logging.debug('Image data read sucessfully from {}'.format(path))
-    mean, median, stdev = sigma_clipped_stats(image, sigma=3)
-    data = (image - median) ** 2
-    threshold = photutils.detect_threshold(image, nsigma=5)
+    offset = (0, 0)
     if not subframe:
-        starfound = photutils.find_peaks(data, threshold=threshold, box_size=49, border_width=500,
-                                         centroid_func=photutils.centroids.centroid_com)
+        context, owned = _open_image(image)
+        border_width = 500
     else:
+        # Only the guide box is read and analyzed, so the cost scales with the box size rather than the sensor size
         config_dict = config_reader.get_config()
         r = config_dict.guider_max_move / config_dict.plate_scale * 1.5
-        x_cent = subframe[0]
-        y_cent = subframe[1]
-        data_subframe = data[int(y_cent - r):int(y_cent + r), int(x_cent - r):int(x_cent + r)]
-        image = image[int(y_cent - r):int(y_cent + r), int(x_cent - r):int(x_cent + r)]
-        threshold = threshold[int(y_cent - r):int(y_cent + r), int(x_cent - r):int(x_cent + r)]
-        starfound = photutils.find_peaks(data_subframe, threshold=threshold, box_size=49, border_width=10,
+        box = (int(subframe[0] - r), int(subframe[0] + r), int(subframe[1] - r), int(subframe[1] + r))
+        if isinstance(image, ImageContext):
+            context = image.section((box[0] - image.origin[0], box[1] - image.origin[0],
+                                     box[2] - image.origin[1], box[3] - image.origin[1]))
+        else:
+            context = ImageContext(image, section=box)
+        owned = not isinstance(image, ImageContext)
+        border_width = 10
+        # Positions are returned relative to the guide box, even if it had to be clipped to the image
+        offset = (context.origin[0] - box[0], context.origin[1] - box[2])
+    image = context.data
+    median = stdev = np.nan
+    starfound = None
+    if image.size:
+        median = context.median
+        stdev = context.stdev
+        data = (image - median) ** 2
+        threshold = context.threshold
+        # Imported here, since photutils is slow to import and not needed until the first image is analyzed
+        import photutils.detection
+        import photutils.centroids
+        starfound = photutils.find_peaks(data, threshold=threshold, box_size=49, border_width=border_width,
                                          centroid_func=photutils.centroids.centroid_com)
 
-    n = 0
-    stars = []
-    peaks = []
+    stars = np.zeros(0, dtype=STAR_DTYPE)
     if starfound:
-        for _ in starfound:
-            bad_pixel = False
-            x_cent = starfound['x_peak'][n]
-            y_cent = starfound['y_peak'][n]
-            peak = image[y_cent, x_cent]
-            n += 1
-            if peak >= (saturation * 2) ** 2:
-                bad_pixel = True
-            pixels = [(y_cent, x_cent + 1), (y_cent, x_cent - 1), (y_cent + 1, x_cent), (y_cent - 1, x_cent)]
-            for value in pixels:
-                if image[value[0], value[1]] < 1.2 * median:
-                    bad_pixel = True
-            if bad_pixel:
-                continue
-            star = (x_cent, y_cent)
-            stars.append(star)
-            peaks.append(peak)
+        x = np.asarray(starfound['x_peak'], dtype=np.int64)
+        y = np.asarray(starfound['y_peak'], dtype=np.int64)
+        peak = image[y, x].astype(np.float64)
+        # Hot pixels and cosmic rays: all four neighbors of a real star's peak are well above the sky
+        neighbors = np.stack((image[y, x + 1], image[y, x - 1], image[y + 1, x], image[y - 1, x]))
+        good = np.all(neighbors >= 1.2 * median, axis=0) & (peak < (saturation * 2) ** 2)
+        stars = np.zeros(np.count_nonzero(good), dtype=STAR_DTYPE)
+        stars['x'] = x[good]
+        stars['y'] = y[good]
+        stars['peak'] = peak[good]
+        stars['flux'] = _aperture_flux(image, stars['x'], stars['y'], median)
+        stars['isolation'] = _isolation(stars['x'], stars['y'])
+        stars['x'] += offset[0]
+        stars['y'] += offset[1]
 
     if not return_data:
-        return stars, peaks
+        result = stars
     else:
-        return stars, peaks, image - median, stdev
+        result = stars, image - median, stdev
+    if owned:
+        context.close()
+    return result
+
+
+# Width (standard deviation, in binned pixels) of the correlation peak in phase_shift
+_PHASE_PEAK_WIDTH = 1.0
+
+
+def _phase_spectrum(data: np.ndarray, fft_size: int) -> Tuple[np.ndarray, int]:
+    """
+    Description
+    -----------
+    Bins an image down so that it fits in fft_size x fft_size pixels, keeps only what is above the sky, tapers
+    the edges, and takes its Fourier transform.
+
+    Returns
+    -------
+    spectrum : NUMPY ARRAY
+        Real Fourier transform of the binned image, zero-padded to fft_size x fft_size.
+    factor : INT
+        Binning factor that was used.
+
+    """
+    factor = max(1, int(np.ceil(max(data.shape) / fft_size)))
+    ny = (data.shape[0] // factor) * factor
+    nx = (data.shape[1] // factor) * factor
+    binned = data[:ny, :nx].reshape(ny // factor, factor, nx // factor, factor).mean(axis=(1, 3), dtype=np.float64)
+    binned -= np.median(binned)
+    np.clip(binned, 0, None, out=binned)
+    binned *= np.outer(np.hanning(binned.shape[0]), np.hanning(binned.shape[1]))
+    return np.fft.rfft2(binned, s=(fft_size, fft_size)), factor
+
+
+def _refine_peak(peak: int, values: np.ndarray, size: int) -> float:
+    """
+    Description
+    -----------
+    Subpixel position of a correlation peak from a gaussian (a parabola in log space) through it and its two
+    neighbors.  Positions past halfway wrap around to negative shifts.
+
+    """
+    values = np.log(np.maximum(values, 1e-12))
+    denominator = values[0] - 2 * values[1] + values[2]
+    refined = peak + (0.5 * (values[0] - values[2]) / denominator if denominator != 0 else 0)
+    if refined >= size / 2:
+        refined -= size
+    return refined
+
+
+def phase_reference(image: Union[str, ImageContext], fft_size: int) -> Tuple[np.ndarray, int]:
+    """
+    Description
+    -----------
+    Prepares a reference frame for phase_shift.
 
+    Parameters
+    ----------
+    image : STR or ImageContext
+        Path to the reference fits image, or an opened ImageContext of it.
+    fft_size : INT
+        Size of the (square) FFT.  The image is binned down to fit, so this bounds the cost of each frame.
 
-@njit(parallel=True, nogil=True)
+    Returns
+    -------
+    TUPLE
+        The reference spectrum and binning factor, to be passed to phase_shift.
+
+    """
+    context, owned = _open_image(image)
+    reference = _phase_spectrum(context.data, fft_size)
+    if owned:
+        context.close()
+    return reference
+
+
+def phase_shift(reference: Tuple[np.ndarray, int], image: Union[str, ImageContext],
+                fft_size: int) -> Tuple[float, float, float]:
+    """
+    Description
+    -----------
+    Measures how far an image has drifted from a reference frame with FFT phase correlation, refining the
+    correlation peak to subpixel precision with a gaussian through its neighbors on each axis.  No stars need to
+    be detected, so this still works when stars are saturated or lost.
+
+    Parameters
+    ----------
+    reference : TUPLE
+        From phase_reference.
+    image : STR or ImageContext
+        Path to the new fits image, or an opened ImageContext of it.  Must be the same size as the reference.
+    fft_size : INT
+        Size of the (square) FFT.  Must be the same as for the reference.
+
+    Returns
+    -------
+    dx : FLOAT
+        Drift of the image along the x axis relative to the reference, in (unbinned) pixels.
+    dy : FLOAT
+        Drift of the image along the y axis relative to the reference, in (unbinned) pixels.
+    strength : FLOAT
+        Height of the correlation peak, between 0 and 1.  Low values mean the match is unreliable (i.e. clouds).
+
+    """
+    context, owned = _open_image(image)
+    spectrum, factor = _phase_spectrum(context.data, fft_size)
+    if owned:
+        context.close()
+    cross_power = spectrum * np.conj(reference[0])
+    cross_power /= np.maximum(np.abs(cross_power), 1e-12)
+    # A gaussian taper turns the correlation peak from a single spike into a gaussian about 1 pixel wide, which
+    # is what makes the subpixel refinement accurate
+    ky = np.fft.fftfreq(fft_size)[:, np.newaxis]
+    kx = np.fft.rfftfreq(fft_size)[np.newaxis, :]
+    cross_power *= np.exp(-2 * (np.pi * _PHASE_PEAK_WIDTH) ** 2 * (kx ** 2 + ky ** 2))
+    correlation = np.fft.irfft2(cross_power, s=(fft_size, fft_size))
+    y_peak, x_peak = np.unravel_index(np.argmax(correlation), correlation.shape)
+    neighbors = np.arange(-1, 2)
+    dx = _refine_peak(x_peak, correlation[y_peak, (x_peak + neighbors) % fft_size], fft_size) * factor
+    dy = _refine_peak(y_peak, correlation[(y_peak + neighbors) % fft_size, x_peak], fft_size) * factor
+    # Normalized by the peak height for a perfect match
+    strength = float(correlation[y_peak, x_peak]) * 2 * np.pi * _PHASE_PEAK_WIDTH ** 2
+    return dx, dy, strength
+
+
+@njit(parallel=True, nogil=True, cache=True)
 def gaussianfit(x, a, x0, sigma):
     """
     Gaussian Fit Function
@@ -139,135 +467,331 @@ def gaussianfit(x, a, x0, sigma):
     return a*np.exp(-(x-x0)**2/(2*sigma**2))
 
 
-@jit(parallel=True, nogil=True)
-def _get_all_fwhm(stars, peaks, data, ri, sky, binsize):
-    fwhm_list = np.empty((len(stars),), dtype=np.float64)
-    snrs = np.empty((len(stars),), dtype=np.float64)
-    xarr = np.empty((len(stars),), dtype=np.ndarray)
-    yarr = np.empty((len(stars),), dtype=np.ndarray)
-    rarr = np.empty((len(stars),), dtype=np.ndarray)
-    stararr = np.empty((len(stars),), dtype=np.ndarray)
-
-    for ii in prange(len(stars)):
-        x_cent = stars[ii][0]
-        y_cent = stars[ii][1]
-        star = data[int(y_cent - ri):int(y_cent + ri), int(x_cent - ri):int(x_cent + ri)] + sky
-        centroidx, centroidy = photutils.centroids.centroid_com(star)
-        stary, starx = np.indices(star.shape)
-        r = np.hypot(starx - centroidx, stary - centroidy).astype(np.float64)
-
-        nbins = int(np.round(r.max() / binsize) + 1)
-        maxbin = nbins * binsize
-        bins, interp_points = np.linspace(0, maxbin, nbins + 1), np.arange(0, maxbin + .01, .01)
-        r, star = r.ravel(), star.ravel()
-        radialprofile = np.histogram(r, bins, weights=star)[0] / np.histogram(r, bins)[0]
-        radialprofile = np.interp(interp_points, bins[1:][radialprofile == radialprofile], radialprofile[radialprofile == radialprofile])
-
-        target_counts = (np.nanmax(radialprofile) + np.nanmin(radialprofile))/2
-        # radialprofile /= maximum
-        fwhm_list[ii] = 0
-        for xi in np.arange(len(radialprofile) - 1, -1, -1):
-            if radialprofile[xi] >= target_counts:
-                fwhm_list[ii] = 2 * interp_points[xi]
-                break
+@njit(nogil=True, cache=True)
+def _star_centroid(data, x0, x1, y0, y1, sky):
+    """
+    Description
+    -----------
+    Sky-subtracted center of mass of the data[y0:y1, x0:x1] cutout, in full-frame coordinates.  Pixels below the
+    sky level are clipped so that the surrounding background does not pull the centroid towards the cutout center.
+
+    """
+    total = 0.
+    sum_x = 0.
+    sum_y = 0.
+    for y in range(y0, y1):
+        for x in range(x0, x1):
+            value = data[y, x] - sky
+            if value > 0:
+                total += value
+                sum_x += value * x
+                sum_y += value * y
+    if total <= 0:
+        return (x0 + x1 - 1) / 2, (y0 + y1 - 1) / 2
+    return sum_x / total, sum_y / total
+
+
+@njit(nogil=True, cache=True)
+def _radial_bins(data, x0, x1, y0, y1, x_cent, y_cent, binsize):
+    """
+    Description
+    -----------
+    Accumulates the data[y0:y1, x0:x1] cutout into radial bins of width binsize around (x_cent, y_cent).
+
+    Returns
+    -------
+    sums : NUMPY ARRAY
+        Sum of the counts in each radial bin.
+    counts : NUMPY ARRAY
+        Number of pixels in each radial bin.
+
+    """
+    r_max = 0.
+    for x in (x0, x1 - 1):
+        for y in (y0, y1 - 1):
+            r_max = max(r_max, np.hypot(x - x_cent, y - y_cent))
+    nbins = int(np.round(r_max / binsize)) + 1
+    sums = np.zeros(nbins, dtype=np.float64)
+    counts = np.zeros(nbins, dtype=np.int64)
+    for y in range(y0, y1):
+        for x in range(x0, x1):
+            index = min(int(np.hypot(x - x_cent, y - y_cent) / binsize), nbins - 1)
+            sums[index] += data[y, x]
+            counts[index] += 1
+    return sums, counts
+
+
+@njit(nogil=True, cache=True)
+def _half_max_radius(sums, counts, binsize):
+    """
+    Description
+    -----------
+    Finds the outermost radius at which the binned radial profile falls through the halfway point between
+    its maximum and minimum, interpolating linearly between the bins on either side of the crossing.  Each bin
+    is placed at its outer edge.  If the profile never drops below half maximum, the outer edge of the last bin
+    is returned.
+
+    """
+    nbins = len(sums)
+    maximum = -np.inf
+    minimum = np.inf
+    for k in range(nbins):
+        if counts[k] > 0:
+            value = sums[k] / counts[k]
+            maximum = max(maximum, value)
+            minimum = min(minimum, value)
+    target_counts = (maximum + minimum) / 2
+    last = -1
+    for k in range(nbins - 1, -1, -1):
+        if counts[k] > 0 and sums[k] / counts[k] >= target_counts:
+            last = k
+            break
+    if last < 0:
+        return 0.
+    for k in range(last + 1, nbins):
+        if counts[k] > 0:
+            inner = sums[last] / counts[last]
+            outer = sums[k] / counts[k]
+            r_inner = (last + 1) * binsize
+            r_outer = (k + 1) * binsize
+            return r_inner + (inner - target_counts) / (inner - outer) * (r_outer - r_inner)
+    return nbins * binsize
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def _fwhm_kernel(data, xs, ys, peaks, ri, sky, binsize, fwhm_out, snr_out):
+    """
+    Description
+    -----------
+    Computes the fwhm and signal to noise ratio of every star at once, writing them into the preallocated
+    fwhm_out and snr_out arrays.  Stars are processed in parallel.
+
+    """
+    ny, nx = data.shape
+    for ii in prange(len(xs)):
+        x0 = max(int(xs[ii] - ri), 0)
+        x1 = min(int(xs[ii] + ri), nx)
+        y0 = max(int(ys[ii] - ri), 0)
+        y1 = min(int(ys[ii] + ri), ny)
+        if x1 <= x0 or y1 <= y0:
+            fwhm_out[ii] = 0
+            snr_out[ii] = 0
+            continue
+        x_cent, y_cent = _star_centroid(data, x0, x1, y0, y1, sky)
+        sums, counts = _radial_bins(data, x0, x1, y0, y1, x_cent, y_cent, binsize)
+        fwhm_out[ii] = 2 * _half_max_radius(sums, counts, binsize)
         # Signal to noise ratio of target, to be used as a weight
-        snrs[ii] = (peaks[ii] - sky) / np.sqrt(peaks[ii] + sky)
-        if fwhm_list[ii] < 3 or fwhm_list[ii] > 50:
-            snrs[ii] = 0
-
-        xarr[ii] = interp_points
-        yarr[ii] = radialprofile
-        rarr[ii] = r
-        stararr[ii] = star
-
-    peaks = np.array(peaks, dtype=np.float64)
-    if peaks.size:
-        saturation_index = np.argmax(peaks)
-        fwhm_peak = peaks[saturation_index]
-    else:
-        fwhm_peak = np.nan
-    fwhm_final = float(np.nansum(fwhm_list * snrs) / np.nansum(snrs))
+        snr_out[ii] = (peaks[ii] - sky) / np.sqrt(peaks[ii] + sky)
+        if fwhm_out[ii] < 3 or fwhm_out[ii] > 50:
+            snr_out[ii] = 0
 
-    return fwhm_final, fwhm_peak, fwhm_list, snrs, xarr, yarr, rarr, stararr
 
+def _native(data: np.ndarray) -> np.ndarray:
+    """
+    Numba can only read native byte order data, so big endian fits data is swapped (copied) here if necessary.
+    """
+    data = np.asarray(data)
+    if not data.dtype.isnative:
+        data = data.astype(data.dtype.newbyteorder('='))
+    return data
 
-def radial_average(path: str, saturation: Union[int, float], plot_lock=None, image_save_path=None) -> Tuple[Optional[Union[float, int]], Union[float, int]]:
+
+def radial_profile(data: np.ndarray, star: Tuple[int, int], sky: float, ri: int = 30,
+                   binsize: float = 0.5) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
     """
     Description
     -----------
-    Finds the median fwhm of an image.
+    Computes the radial profile of a single star in the same way as the fwhm kernel.  Only needed for plotting.
 
     Parameters
     ----------
-    path : STR
-        File path to fits image to get fwhm from.
-    saturation : INT
-        Number of counts for a star to be considered saturated for a specific CCD Camera.
-    plot_lock : threading.Lock
-        To prevent multiple plots from drawing across threads at once.
+    data : NUMPY ARRAY
+        Image data, including the sky.
+    star : TUPLE
+        (x position, y position) of the star.
+    sky : FLOAT
+        Sky background level of the image.
+    ri : INT, optional
+        Half-width of the square cutout around the star.  The default is 30.
+    binsize : FLOAT, optional
+        Width of the radial bins, in pixels.  The default is 0.5.
 
     Returns
     -------
-    fwhm_final : LIST
-        The fwhm of the brightest unsaturated star in the image, or the median fwhm if all stars are saturated.
-        If no fwhm was found, returns None.
+    r : NUMPY ARRAY
+        Radial distance of every pixel in the cutout from the star's centroid.
+    counts : NUMPY ARRAY
+        Counts of every pixel in the cutout.
+    bin_r : NUMPY ARRAY
+        Outer edge of every non-empty radial bin.
+    profile : NUMPY ARRAY
+        Mean counts of every non-empty radial bin.
 
     """
-    stars, peaks, data, stdev = findstars(path, saturation, return_data=True)
-    sky = mediancounts(path)
-    r_ = 30
-    binsize = 0.5
-    fwhm_final, fwhm_peak, fwhm_list, snrs, xarr, yarr, rarr, stararr = _get_all_fwhm(stars, peaks, data, r_, sky, binsize)
+    data = _native(data)
+    ny, nx = data.shape
+    x0, x1 = max(int(star[0] - ri), 0), min(int(star[0] + ri), nx)
+    y0, y1 = max(int(star[1] - ri), 0), min(int(star[1] + ri), ny)
+    x_cent, y_cent = _star_centroid(data, x0, x1, y0, y1, sky)
+    sums, counts = _radial_bins(data, x0, x1, y0, y1, x_cent, y_cent, binsize)
+    stary, starx = np.mgrid[y0:y1, x0:x1]
+    r = np.hypot(starx - x_cent, stary - y_cent)
+    valid = counts > 0
+    bin_r = (np.arange(len(sums)) + 1) * binsize
+    return r.ravel(), data[y0:y1, x0:x1].ravel(), bin_r[valid], sums[valid] / counts[valid]
+
+
+def _get_all_fwhm(stars: np.ndarray, data: np.ndarray, sky: float, ri: int = 30, binsize: float = 0.5,
+                 return_profiles: bool = False):
+    """
+    Description
+    -----------
+    Measures the fwhm of every star from its radial profile and combines them into a single, signal to noise
+    weighted, fwhm for the image.
 
-    if plot_lock:
-        plot_lock.acquire()
-    fig = plt.figure()
-    imdata = fits.getdata(path)
-    plt.imshow(imdata, cmap='gray', norm=colors.Normalize(vmin=np.nanmedian(imdata), vmax=np.nanmedian(imdata) + 400))
-    plt.gca().invert_yaxis()
-    plt.colorbar()
-    for i, star in enumerate(stars):
-        aperture = CircularAperture(star, r=5)
-        aperture.plot(color='blue', lw=2)
-        plt.text(star[0]+20, star[1]+20, s='{}'.format(i+1), color='blue')
-
-    if not image_save_path:
-        current_path = os.path.abspath(os.path.dirname(__file__))
-        target_path = os.path.join(current_path, r'../../../test/FocusApertures_{}.png'.format(datetime.datetime.now().strftime('%Y%m%d-%H%M%S')))
-        plt.savefig(target_path, dpi=300)
+    Parameters
+    ----------
+    stars : NUMPY STRUCTURED ARRAY
+        The stars, as returned by findstars.
+    data : NUMPY ARRAY
+        Image data, including the sky.
+    sky : FLOAT
+        Sky background level of the image.
+    ri : INT, optional
+        Half-width of the square cutout around each star.  The default is 30.
+    binsize : FLOAT, optional
+        Width of the radial bins, in pixels.  The default is 0.5.
+    return_profiles : BOOL, optional
+        If True, also returns the radial profile of every star (see radial_profile).  The default is False.
+
+    Returns
+    -------
+    fwhm_final : FLOAT
+        Signal to noise weighted fwhm of the image, or None if no star had a usable fwhm.
+    fwhm_peak : FLOAT
+        Highest peak count value of any of the stars.
+    fwhm_list : NUMPY ARRAY
+        Fwhm of each star.
+    snrs : NUMPY ARRAY
+        Signal to noise ratio of each star (0 for stars with an unrealistic fwhm).
+    profiles : LIST
+        Only returned if return_profiles is True.  The radial_profile of each star.
+
+    """
+    data = _native(data)
+    xs = stars['x'].astype(np.float64)
+    ys = stars['y'].astype(np.float64)
+    peaks = stars['peak'].astype(np.float64)
+    fwhm_list = np.zeros(len(stars), dtype=np.float64)
+    snrs = np.zeros(len(stars), dtype=np.float64)
+    if len(stars):
+        _fwhm_kernel(data, xs, ys, peaks, ri, float(sky), binsize, fwhm_list, snrs)
+        fwhm_peak = peaks.max()
     else:
-        plt.savefig(os.path.join(image_save_path, 'FocusApertures_{}.png'.format(datetime.datetime.now().strftime('%Y%m%d-%H%M%S'))), dpi=300)
-    plt.clf()
-    plt.cla()
-    plt.close('all')
-
-    fig, ax = plt.subplots(ncols=2, nrows=2)
-    highest_snr = np.argsort(snrs)[::-1][:4]
-    highest_fwhm = fwhm_list[highest_snr]
-    highest_x = xarr[highest_snr]
-    highest_y = yarr[highest_snr]
-    highest_r = rarr[highest_snr]
-    highest_star = stararr[highest_snr]
-    for n in range(len(highest_r)):
+        fwhm_peak = np.nan
+    weight = snrs.sum()
+    fwhm_final = float((fwhm_list * snrs).sum() / weight) if weight > 0 else None
+    if not return_profiles:
+        return fwhm_final, fwhm_peak, fwhm_list, snrs
+    profiles = [radial_profile(data, (x, y), sky, ri, binsize) for x, y in zip(xs, ys)]
+    return fwhm_final, fwhm_peak, fwhm_list, snrs, profiles
+
+
+def _plot_apertures(target_path: str, imdata: np.ndarray, sky: float, stars):
+    """
+    Description
+    -----------
+    Draws the image with a numbered aperture around each star found by findstars, and saves it to target_path.
+
+    """
+    # Only needed for this plot, which is drawn on the renderer thread
+    from matplotlib import colors
+    from photutils.aperture import CircularAperture
+    fig = plot_utils.new_figure()
+    ax = fig.add_subplot()
+    im = ax.imshow(imdata, cmap='gray', norm=colors.Normalize(vmin=sky, vmax=sky + 400))
+    ax.invert_yaxis()
+    fig.colorbar(im, ax=ax)
+    for i, star in enumerate(stars):
+        aperture = CircularAperture((star['x'], star['y']), r=5)
+        aperture.plot(ax=ax, color='blue', lw=2)
+        ax.text(star['x']+20, star['y']+20, s='{}'.format(i+1), color='blue')
+    fig.savefig(target_path, dpi=300)
+
+
+def _plot_profiles(target_path: str, profiles, snrs, fwhms):
+    """
+    Description
+    -----------
+    Draws the radial profiles (see radial_profile) of up to 4 stars, and saves them to target_path.
+
+    """
+    fig = plot_utils.new_figure()
+    ax = fig.subplots(ncols=2, nrows=2, squeeze=False)
+    for n, (r, counts, bin_r, profile) in enumerate(profiles):
         i = 0 if n <= 1 else 1
         j = int((n + 1) % 2 == 0)
-        ax[j, i].scatter(highest_r[n], highest_star[n], c='b', s=2)
-        ax[j, i].plot(highest_x[n], highest_y[n], 'r-')
-        ax[j, i].set_title('SNR = {:.3f}, FWHM = {:.3f}'.format(snrs[highest_snr][n], highest_fwhm[n]))
+        ax[j, i].scatter(r, counts, c='b', s=2)
+        ax[j, i].plot(bin_r, profile, 'r-')
+        ax[j, i].set_title('SNR = {:.3f}, FWHM = {:.3f}'.format(snrs[n], fwhms[n]))
         ax[j, i].set_xlabel('Radial distance [px]')
         ax[j, i].set_ylabel('Counts')
     fig.subplots_adjust(wspace=.5, hspace=.5)
     fig.suptitle('Radial Profiles for 4 Highest SNR stars')
-    if not image_save_path:
-        current_path = os.path.abspath(os.path.dirname(__file__))
-        target_path = os.path.join(current_path, r'../../../test/FocusProfiles_{}.png'.format(datetime.datetime.now().strftime('%Y%m%d-%H%M%S')))
-        plt.savefig(target_path, dpi=300)
-    else:
-        plt.savefig(os.path.join(image_save_path, 'FocusProfiles_{}.png'.format(datetime.datetime.now().strftime('%Y%m%d-%H%M%S'))), dpi=300)
-    plt.clf()
-    plt.cla()
-    plt.close('all')
-    if plot_lock:
-        plot_lock.release()
-
-    return fwhm_final, fwhm_peak
\ No newline at end of file
+    fig.savefig(target_path, dpi=300)
+
+
+def radial_average(image: Union[str, ImageContext], saturation: Union[int, float],
+                   plotter: Optional[plot_utils.PlotRenderer] = None,
+                   image_save_path=None) -> Tuple[Optional[Union[float, int]], Union[float, int]]:
+    """
+    Description
+    -----------
+    Finds the median fwhm of an image.
+
+    Parameters
+    ----------
+    image : STR or ImageContext
+        File path to fits image to get fwhm from, or an opened ImageContext of that file.
+    saturation : INT
+        Number of counts for a star to be considered saturated for a specific CCD Camera.
+    plotter : PlotRenderer, optional
+        Renders the aperture and radial profile plots in the background.  If None, the plots are drawn before
+        returning.
+    image_save_path : STR, optional
+        Directory to save the plots to.  The default is None, which saves them to the test directory.
+
+    Returns
+    -------
+    fwhm_final : LIST
+        The fwhm of the brightest unsaturated star in the image, or the median fwhm if all stars are saturated.
+        If no fwhm was found, returns None.
+
+    """
+    context, owned = _open_image(image)
+    try:
+        stars = findstars(context, saturation)
+        sky = context.median
+        r_ = 30
+        binsize = 0.5
+        fwhm_final, fwhm_peak, fwhm_list, snrs = _get_all_fwhm(stars, context.data, sky, r_, binsize)
+
+        if not image_save_path:
+            current_path = os.path.abspath(os.path.dirname(__file__))
+            image_save_path = os.path.join(current_path, r'../../../test')
+        timestamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        # The memory map stays valid after the context is closed, for as long as the renderer holds on to it
+        plot_utils.submit_plot(plotter, 'FocusApertures', _plot_apertures,
+                               os.path.join(image_save_path, 'FocusApertures_{}.png'.format(timestamp)),
+                               context.data, sky, stars)
+        highest_snr = np.argsort(snrs)[::-1][:4]
+        profiles = [radial_profile(context.data, (stars['x'][index], stars['y'][index]), sky, r_, binsize)
+                    for index in highest_snr]
+        plot_utils.submit_plot(plotter, 'FocusProfiles', _plot_profiles,
+                               os.path.join(image_save_path, 'FocusProfiles_{}.png'.format(timestamp)),
+                               profiles, snrs[highest_snr], fwhm_list[highest_snr])
+    finally:
+        if owned:
+            context.close()
+
+    return fwhm_final, fwhm_peak
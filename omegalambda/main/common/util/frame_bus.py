@@ -0,0 +1,270 @@
+# Frame bus for passing new camera frames to the guider, focuser, etc.
+import threading
+import collections
+import datetime
+import logging
+from typing import Optional, Callable
+
+from . import filereader_utils
+from .clock import get_clock
+
+
+class Frame:
+
+    def __init__(self, path: str, image_type: str, exposure_time: float, **header_kwargs):
+        """
+        Description
+        -----------
+        A single frame saved by the camera.  The image data is only read the first time it is needed, and is then
+        shared by every subscriber without copying.
+
+        Parameters
+        ----------
+        path : STR
+            Path the frame was saved to.
+        image_type : STR
+            "light" or "dark".
+        exposure_time : FLOAT
+            Exposure time of the frame in seconds.
+        **header_kwargs : ANY
+            Extra FITS header keywords that were set on the frame.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.path = path
+        self.image_type = image_type
+        self.exposure_time = exposure_time
+        self.header_kwargs = header_kwargs
+        self.time = get_clock().now(datetime.timezone.utc)
+        self._image = None
+        self._lock = threading.Lock()
+
+    @property
+    def image(self) -> filereader_utils.ImageContext:
+        """
+        Returns
+        -------
+        ImageContext
+            The frame's image, with read-only data.  Opened (memory-mapped) by whichever subscriber asks first;
+            its sky statistics are likewise only computed once for all subscribers.
+
+        """
+        with self._lock:
+            if self._image is None:
+                self._image = filereader_utils.ImageContext(self.path)
+                self._image.data.flags.writeable = False
+                # The memory map stays valid after the file is closed
+                self._image.close()
+            return self._image
+
+    @property
+    def data(self):
+        return self.image.data
+
+    @property
+    def header(self):
+        return self.image.header
+
+    def __repr__(self):
+        return 'Frame({})'.format(self.path)
+
+
+class Subscription:
+
+    def __init__(self, bus: 'FrameBus', name: str, maxlen: int = 2, accept: Optional[Callable[[Frame], bool]] = None):
+        """
+        Description
+        -----------
+        A bounded queue of frames for a single subscriber.  When it is full, the oldest frame is dropped to make
+        room for the new one, so a slow subscriber always works on recent frames and never holds up the camera.
+        Created by FrameBus.subscribe.
+
+        Parameters
+        ----------
+        bus : FrameBus
+            The bus the subscription belongs to.
+        name : STR
+            Name of the subscriber, for logging.
+        maxlen : INT, optional
+            Maximum number of frames to keep waiting.  The default is 2.
+        accept : CALLABLE, optional
+            Function that takes a Frame and returns whether the subscriber wants it.  The default is None, which
+            accepts every frame.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.bus = bus
+        self.name = name
+        self.accept = accept
+        self.frames = collections.deque(maxlen=maxlen)
+        self.condition = threading.Condition()
+        self.dropped = 0
+
+    def put(self, frame: Frame):
+        """
+        Description
+        -----------
+        Adds a frame to the subscription, dropping the oldest waiting frame if it is full.  Called by the bus.
+
+        """
+        if self.accept is not None and not self.accept(frame):
+            return
+        with self.condition:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+                logging.debug('{} is behind: dropping {}'.format(self.name, self.frames[0]))
+            self.frames.append(frame)
+            self.condition.notify_all()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Frame]:
+        """
+        Parameters
+        ----------
+        timeout : FLOAT, optional
+            Maximum time to wait for a frame, in seconds.  The default is None, which waits indefinitely.
+
+        Returns
+        -------
+        Frame
+            The oldest waiting frame, or None if no frame arrived before the timeout.
+
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.frames, timeout=timeout):
+                return None
+            return self.frames.popleft()
+
+    def latest(self, timeout: Optional[float] = None) -> Optional[Frame]:
+        """
+        Parameters
+        ----------
+        timeout : FLOAT, optional
+            Maximum time to wait for a frame, in seconds.  The default is None, which waits indefinitely.
+
+        Returns
+        -------
+        Frame
+            The newest waiting frame (any older ones are discarded), or None if no frame arrived before the timeout.
+
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.frames, timeout=timeout):
+                return None
+            frame = self.frames.pop()
+            self.frames.clear()
+            return frame
+
+    def clear(self):
+        """
+        Description
+        -----------
+        Discards any waiting frames.
+
+        """
+        with self.condition:
+            self.frames.clear()
+
+    def close(self):
+        """
+        Description
+        -----------
+        Stops receiving frames.
+
+        """
+        self.bus.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class FrameBus:
+
+    def __init__(self):
+        """
+        Description
+        -----------
+        Publishes each new frame saved by the camera to every subscriber, so that the guider and focuser do not
+        have to scan the image directory or read the same file again.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.subscriptions = []
+        self.lock = threading.Lock()
+
+    def subscribe(self, name: str, maxlen: int = 2, accept: Optional[Callable[[Frame], bool]] = None) -> Subscription:
+        """
+        Parameters
+        ----------
+        name : STR
+            Name of the subscriber, for logging.
+        maxlen : INT, optional
+            Maximum number of frames to keep waiting for this subscriber.  The default is 2.
+        accept : CALLABLE, optional
+            Function that takes a Frame and returns whether the subscriber wants it.  The default is None, which
+            accepts every frame.
+
+        Returns
+        -------
+        Subscription
+            Receives every frame published from now on.
+
+        """
+        subscription = Subscription(self, name, maxlen, accept)
+        with self.lock:
+            self.subscriptions.append(subscription)
+        logging.debug('{} has subscribed to new frames'.format(name))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            if subscription in self.subscriptions:
+                self.subscriptions.remove(subscription)
+        logging.debug('{} has unsubscribed from new frames'.format(subscription.name))
+
+    def publish(self, frame: Frame):
+        """
+        Description
+        -----------
+        Hands a new frame to every subscriber.  Never blocks on a subscriber.
+
+        Parameters
+        ----------
+        frame : Frame
+            The new frame.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            subscription.put(frame)
+
+
+_frame_bus = FrameBus()
+
+
+def get_frame_bus() -> FrameBus:
+    """
+    Returns
+    -------
+    _frame_bus : FrameBus
+        Global frame bus shared by the camera and every frame consumer.  It outlives any one Camera object, so
+        subscriptions survive camera thread restarts.
+
+    """
+    return _frame_bus
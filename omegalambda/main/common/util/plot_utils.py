@@ -0,0 +1,169 @@
+# Plot rendering service for diagnostic plots
+import threading
+import collections
+import logging
+from typing import Callable, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+
+def new_figure(**kwargs) -> 'Figure':
+    """
+    Description
+    -----------
+    Creates a figure that is drawn with the Agg backend, without going through pyplot.  Figures made this way do
+    not share any global state, so they may be drawn from any thread without a lock and never have to be closed.
+
+    Parameters
+    ----------
+    **kwargs : ANY
+        Keyword arguments to be passed to matplotlib.figure.Figure.
+
+    Returns
+    -------
+    fig : Figure
+        The new figure.
+
+    """
+    # Imported here, so that matplotlib is only loaded once something is actually plotted
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(**kwargs)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+class PlotRenderer(threading.Thread):
+
+    def __init__(self, max_jobs: int = 4):
+        """
+        Description
+        -----------
+        Subclassed from threading.Thread.  Renders diagnostic plots in the background so that the focusing, guiding
+        and weather threads never have to wait on matplotlib.  Plot jobs are put on a bounded queue with submit.  If
+        a job is submitted with the same key as one that is still waiting, the waiting job is replaced by the new one,
+        and if the queue is full the oldest waiting job is dropped.
+
+        Parameters
+        ----------
+        max_jobs : INT, optional
+            Maximum number of plot jobs that may be waiting to be rendered at once.  The default is 4.
+
+        Returns
+        -------
+        None.
+
+        """
+        super(PlotRenderer, self).__init__(name='PlotRenderer-Th', daemon=True)
+        self.max_jobs = max_jobs
+        self.jobs = collections.OrderedDict()
+        self.condition = threading.Condition()
+        self.stopping = threading.Event()
+        self.dropped = 0
+
+    def submit(self, key: str, function: Callable, *args, **kwargs):
+        """
+        Description
+        -----------
+        Puts a plot job on the queue.  Returns immediately.
+
+        Parameters
+        ----------
+        key : STR
+            Identifies the kind of plot (usually its file name prefix).  A waiting job with the same key is replaced,
+            so only the newest version of each plot is drawn when the renderer falls behind.
+        function : CALLABLE
+            Function that draws and saves the plot.  It should draw on a figure from new_figure rather than using
+            pyplot.
+        *args : ANY
+            The arguments to be passed to function.
+        **kwargs : ANY
+            The keyword arguments to be passed to function.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.condition:
+            if key in self.jobs:
+                del self.jobs[key]
+                logging.debug('Replacing waiting {} plot with a newer one'.format(key))
+            elif len(self.jobs) >= self.max_jobs:
+                old_key, _ = self.jobs.popitem(last=False)
+                self.dropped += 1
+                logging.debug('Plot renderer is behind: dropping waiting {} plot'.format(old_key))
+            self.jobs[key] = (function, args, kwargs)
+            self.condition.notify()
+
+    def run(self):
+        """
+        Description
+        -----------
+        Started by calling PlotRenderer.start() [as a subclass of threading.Thread].  Renders plot jobs in the order
+        they were submitted until stop is called.
+
+        Returns
+        -------
+        None.
+
+        """
+        while True:
+            with self.condition:
+                while not self.jobs and not self.stopping.is_set():
+                    self.condition.wait()
+                if self.stopping.is_set():
+                    break
+                key, (function, args, kwargs) = self.jobs.popitem(last=False)
+            try:
+                function(*args, **kwargs)
+                logging.debug('Rendered {} plot'.format(key))
+            except Exception as exc:
+                # A broken plot should never take down the renderer
+                logging.exception(exc)
+
+    def stop(self):
+        """
+        Description
+        -----------
+        Stops the renderer.  Any plots that are still waiting are not drawn.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.condition:
+            self.stopping.set()
+            self.condition.notify()
+
+
+def submit_plot(plotter: Optional[PlotRenderer], key: str, function: Callable, *args, **kwargs):
+    """
+    Description
+    -----------
+    Hands a plot job to a PlotRenderer, or draws it immediately on the calling thread if there is none.
+
+    Parameters
+    ----------
+    plotter : PlotRenderer or None
+        The plot renderer to use.
+    key : STR
+        See PlotRenderer.submit.
+    function : CALLABLE
+        Function that draws and saves the plot.
+    *args : ANY
+        The arguments to be passed to function.
+    **kwargs : ANY
+        The keyword arguments to be passed to function.
+
+    Returns
+    -------
+    None.
+
+    """
+    if plotter is not None and plotter.is_alive():
+        plotter.submit(key, function, *args, **kwargs)
+    else:
+        function(*args, **kwargs)
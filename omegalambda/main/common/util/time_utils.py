@@ -1,18 +1,13 @@
 import datetime
 import numpy as np
 from astropy.time import Time
-import pandas as pd
-from astroquery.simbad import Simbad
-from astropy.coordinates import SkyCoord
-import astropy.units as u
-from barycorrpy import JDUTC_to_BJDTDB
 import logging
 from typing import Union, Optional
-import requests
-import requests.exceptions
 import re
 import os
-import urllib3.exceptions
+import json
+import time
+import threading
 from numba import jit, njit, prange
 
 import pytz
@@ -206,6 +201,150 @@ def decimal_year(time=None) -> float:
         time.minute/(days_in_year*24*60) + time.second/(days_in_year*24*60*60)
 
 
+class TimeScales:
+
+    def __init__(self, path=None):
+        """
+        Description
+        -----------
+        Process-wide source of leap seconds and sidereal time.  The leap second table is read once, from the copy
+        bundled with the code, so nothing has to be downloaded.  The slowly varying parts of the sidereal time
+        (GMST at 0h UT and the equation of the equinoxes) are calculated once per UT day, so that the local sidereal
+        time at any moment is a few additions.
+
+        Parameters
+        ----------
+        path : STR, optional
+            Path to a leap second table in the format of the IERS Leap_Second.dat file.  The default is None, which
+            uses leap_seconds.dat next to this file.
+
+        Returns
+        -------
+        None.
+
+        """
+        if path is None:
+            path = os.path.join(os.path.abspath(os.path.dirname(__file__)), r'leap_seconds.dat')
+        self.path = path
+        self.lock = threading.Lock()
+        self.mjd = None
+        self.offsets = None
+        self.expires = None
+        self.day_terms = {}
+
+    def _load(self):
+        mjd = []
+        offsets = []
+        expires = None
+        try:
+            with open(self.path, 'r') as file:
+                for line in file:
+                    if line.startswith('#'):
+                        if match := re.search('File expires on (.+)', line):
+                            expires = dateutil.parser.parse(match.group(1).strip())
+                        continue
+                    values = line.split()
+                    if len(values) >= 5:
+                        mjd.append(float(values[0]))
+                        offsets.append(int(values[4]))
+        except OSError:
+            logging.error('Could not read the leap second table at {}'.format(self.path))
+        if not mjd:
+            # TAI - UTC since 2017
+            mjd, offsets = [57754.0], [37]
+        self.mjd = np.array(mjd)
+        self.offsets = np.array(offsets)
+        self.expires = expires
+        if expires and expires < datetime.datetime.now():
+            logging.warning('The leap second table at {} expired on {}; assuming there have been no leap seconds '
+                            'since.  Update it from the IERS.'.format(self.path, expires.date()))
+
+    def leap_seconds(self, jd: Optional[float] = None) -> int:
+        """
+        Parameters
+        ----------
+        jd : FLOAT, optional
+            Julian date (UTC).  The default is None, which uses the current time.
+
+        Returns
+        -------
+        INT
+            The number of leap seconds (TAI - UTC) in effect at that time.
+
+        """
+        if self.mjd is None:
+            with self.lock:
+                if self.mjd is None:
+                    self._load()
+        if jd is None:
+            jd = time.time() / (24*60*60) + 2440587.5
+        index = np.searchsorted(self.mjd, jd - 2400000.5, side='right') - 1
+        return int(self.offsets[max(index, 0)])
+
+    def local_sidereal_time(self, jd: float, longitude: float, leap_seconds: Optional[float] = None) -> float:
+        """
+        Parameters
+        ----------
+        jd : FLOAT
+            Julian date (UTC).
+        longitude : FLOAT
+            Site longitude.  West is negative.
+        leap_seconds : INT, optional
+            The number of leap seconds (TAI - UTC).  The default is None, which looks it up in the table.
+
+        Returns
+        -------
+        FLOAT
+            Local mean sidereal time in hours.  Same as _internal_local_sidereal_time, to within floating point.
+
+        """
+        # Julian date at the start of the UT day
+        jd0 = np.floor(jd - 0.5) + 0.5
+        if leap_seconds is None:
+            leap_seconds = self.leap_seconds(jd0)
+        key = (jd0, leap_seconds)
+        terms = self.day_terms.get(key)
+        if terms is None:
+            terms = _internal_sidereal_day_terms(jd0, float(leap_seconds))
+            if len(self.day_terms) > 64:
+                self.day_terms.clear()
+            self.day_terms[key] = terms
+        return (terms + (jd - jd0) * 24 * 1.00273790935 + longitude / 15) % 24
+
+
+_time_scales = None
+
+
+def get_time_scales():
+    """
+    Returns
+    -------
+    _time_scales : TimeScales
+        Global time-scale service, created the first time it is needed.
+
+    """
+    global _time_scales
+    if _time_scales is None:
+        _time_scales = TimeScales()
+    return _time_scales
+
+
+def get_leap_seconds(jd: Optional[float] = None) -> int:
+    """
+    Parameters
+    ----------
+    jd : FLOAT, optional
+        Julian date (UTC).  The default is None, which uses the current time.
+
+    Returns
+    -------
+    leap_seconds : INT
+        The number of seconds offset between TAI and UTC, from the bundled leap second table.
+
+    """
+    return get_time_scales().leap_seconds(jd)
+
+
 def get_local_sidereal_time(longitude: float, date: Optional[Union[str, datetime.datetime]] = None,
                             leap_seconds = 0) -> float:
     """
@@ -225,7 +364,7 @@ def get_local_sidereal_time(longitude: float, date: Optional[Union[str, datetime
         will calculate the LST for the current date & time.
     leap_seconds : INT, optional
         The number of seconds offset between TAI and TT.  As of April 9, 2021, there are 37 seconds offset.
-        If 0, will do an html request to get the current number.
+        If 0, will look it up in the bundled leap second table.
 
     Returns
     -------
@@ -233,49 +372,61 @@ def get_local_sidereal_time(longitude: float, date: Optional[Union[str, datetime
         Local sidereal time in hours.
 
     """
-    if leap_seconds == 0:
-        current_path = os.path.abspath(os.path.dirname(__file__))
-        leapsec_file = os.path.abspath(os.path.join(current_path, r"leap_second.txt"))
-        if os.path.exists(leapsec_file):
-            # logging.debug('Leap Second information retrieved from text file!')
-            with open(leapsec_file, 'r') as file:
-                text = file.readlines()[0]
-        else:
-            logging.debug('Sending HTTP request to the Paris Observatory for current leap second information!')
-            s = requests.Session()
-            try:
-                req = s.get('https://hpiers.obspm.fr/eop-pc/webservice/CURL/leapSecond.php')
-                text = req.text
-                with open(leapsec_file, 'w') as file:
-                    file.write(req.text)
-            except (urllib3.exceptions.MaxRetryError, urllib3.exceptions.HTTPError, urllib3.exceptions.TimeoutError,
-                    urllib3.exceptions.InvalidHeader, requests.exceptions.ConnectionError, requests.exceptions.Timeout,
-                    requests.exceptions.HTTPError):
-                    text = None
-
-        if text is not None:
-            match = re.search('([0-9]+)|', text)
-            if match:
-                leap_seconds = int(match.group(0))
-        else:
-            logging.warning('Could not get leap second data!')
-
     if date is None:
         date = datetime.datetime.now(datetime.timezone.utc)
     if type(date) is not datetime.datetime:
         date = convert_to_datetime_utc(date)
     if not date.tzinfo:
         date = pytz.utc.localize(date)
-    if date.tzinfo not in (pytz.UTC, pytz.utc, datetime.timezone.utc):
-        date = date.astimezone(pytz.UTC)
-    jd = convert_to_jd_utc(date.replace(hour=0, minute=0, second=0, microsecond=0))
-    ut_hours = fractional_hours_of_day(date)
+    # Julian date straight from the unix timestamp, which is much faster than going through astropy
+    jd = date.timestamp() / (24*60*60) + 2440587.5
+    return get_time_scales().local_sidereal_time(jd, longitude, leap_seconds or None)
+
+
+def get_local_sidereal_time_array(longitude: float, julian_dates: Union[float, np.ndarray],
+                                  leap_seconds=0) -> np.ndarray:
+    """
+    Find the local mean sidereal time at many times at once.  Same formulas as get_local_sidereal_time.
+
+    Parameters
+    ----------
+    longitude : FLOAT
+        Site longitude where you want to calculate LST.  West is negative.
+    julian_dates : FLOAT or NUMPY ARRAY
+        Julian dates (UTC) for which you want to calculate LST.
+    leap_seconds : INT, optional
+        The number of seconds offset between TAI and TT.  If 0, will look it up in the bundled leap second table.
 
+    Returns
+    -------
+    LST : NUMPY ARRAY
+        Local sidereal time in hours at each julian date, with the same shape as julian_dates.
+
+    """
+    julian_dates = np.asarray(julian_dates, dtype=np.float64)
+    if leap_seconds == 0:
+        leap_seconds = get_leap_seconds(float(julian_dates.min()) if julian_dates.size else None)
+    return _internal_local_sidereal_time_array(julian_dates.ravel(), float(longitude), float(leap_seconds)).reshape(
+        julian_dates.shape)
+
+
+@njit(cache=True)
+def _internal_sidereal_day_terms(jd, leap_seconds):
+    # GMST at 0h UT plus the equation of the equinoxes, which only change (noticeably) from day to day
     omega = sun_moon_longitudes(jd, leap_seconds)[0]
     tmid = (jd - 2451545.0) / 36525.0  # offset Julian centuries
     t0 = (6.697374558 + 2400.0513369072 * tmid + (2.58622 * tmid**2)*1e-5 - (1.7222078704899681391543959355894 * tmid**3)*1e-9) % 24
-    gmst = (t0 + ut_hours * 1.00273790935 + n_longitude(jd, leap_seconds) * np.cos(true_obliquity(jd, leap_seconds)*np.pi/180) / 15) % 24
-    gmst += (0.00625 * np.sin(omega) + 0.0000063 * np.sin(2 * omega)) / 3600
+    t0 += n_longitude(jd, leap_seconds) * np.cos(true_obliquity(jd, leap_seconds)*np.pi/180) / 15
+    t0 += (0.00625 * np.sin(omega) + 0.0000063 * np.sin(2 * omega)) / 3600
+    return t0
+
+
+@njit(cache=True)
+def _internal_local_sidereal_time(julian_date, longitude, leap_seconds):
+    # Julian date at the start of the UT day
+    jd = np.floor(julian_date - 0.5) + 0.5
+    ut_hours = (julian_date - jd) * 24
+    gmst = _internal_sidereal_day_terms(jd, leap_seconds) + ut_hours * 1.00273790935
 
     lmst_frac = (gmst + longitude / 15) / 24
     day_frac = lmst_frac - int(lmst_frac)
@@ -285,7 +436,15 @@ def get_local_sidereal_time(longitude: float, date: Optional[Union[str, datetime
     return lmst
 
 
-@njit
+@njit(parallel=True, cache=True)
+def _internal_local_sidereal_time_array(julian_dates, longitude, leap_seconds):
+    lst = np.empty(julian_dates.shape[0])
+    for i in prange(julian_dates.shape[0]):
+        lst[i] = _internal_local_sidereal_time(julian_dates[i], longitude, leap_seconds)
+    return lst
+
+
+@njit(cache=True)
 def sun_moon_longitudes(julian_date, leap_seconds):
     """
     Find the longitude of the moon's ascending node, the mean orbital longitude of the moon, and the geometric mean longitude
@@ -333,7 +492,7 @@ def sun_moon_longitudes(julian_date, leap_seconds):
     return omega, glsun, lmoon
 
 
-@njit
+@njit(cache=True)
 def n_longitude(julian_date, leap_seconds):
     """
     Find the nutation of the longitude of the ecliptic for a specific julian date.
@@ -361,7 +520,7 @@ def n_longitude(julian_date, leap_seconds):
     return dpsi
 
 
-@njit
+@njit(cache=True)
 def true_obliquity(julian_date, leap_seconds):
     """
     Find the true obliquity of the ecliptic for a specific julian date.
@@ -407,12 +566,31 @@ def convert_to_jd_utc(time=None, split_date=False):
     return t.jd
 
 
-def convert_to_bjd_tdb(jd, name, lat, lon, height, ra=None, dec=None):
+def query_target_astrometry(name, ra=None, dec=None):
+    """
+    Description
+    -----------
+    Queries SIMBAD for a target's position, proper motion, parallax and radial velocity, which are needed to
+    convert times to BJD_TDB.  Searches by name first, then by position.
+
+    Parameters
+    ----------
+    name : STR
+        Name of the target.
+    ra : FLOAT, optional
+        Right ascension of the target in degrees (J2000), for the position search.  The default is None.
+    dec : FLOAT, optional
+        Declination of the target in degrees (J2000), for the position search.  The default is None.
+
+    Returns
+    -------
+    astrometry : DICT or None
+        Keys "ra" and "dec" (degrees, J2000), "pmra" and "pmdec" (mas/yr), "parallax" (mas) and "rv" (m/s).  None if
+        the target could not be found or is missing any of these.
+
+    """
     # Get target proper motion, parallax, and radial velocity from exofop
-    epoch = 2451545.0
     pmra = pmdec = None
-    if ra:
-        ra *= 15
 
     # First try ExoFOP for proper motions
     # if ('TOI' in name) or ('toi' in name):
@@ -427,6 +605,11 @@ def convert_to_bjd_tdb(jd, name, lat, lon, height, ra=None, dec=None):
     #             pmra = toi_info['PM RA (mas/yr)'].values[0]
     #             pmdec = toi_info['PM Dec (mas/yr)'].values[0]
 
+    # Imported here, since astroquery is slow to import and only needed the first time each target is seen
+    from astroquery.simbad import Simbad
+    from astropy.coordinates import SkyCoord
+    import astropy.units as u
+
     # Query SIMBAD for proper motion, parallax, and RV
     try:
         simbad = Simbad()
@@ -458,12 +641,176 @@ def convert_to_bjd_tdb(jd, name, lat, lon, height, ra=None, dec=None):
 
     if (not radial_velocity) or (not pmra) or (not pmdec) or (not ra) or (not dec) or (not parallax):
         return None
+    if np.ma.is_masked([pmra, pmdec, parallax, radial_velocity]):
+        return None
+    return {'ra': float(ra), 'dec': float(dec), 'pmra': float(pmra), 'pmdec': float(pmdec),
+            'parallax': float(parallax), 'rv': float(radial_velocity)}
+
+
+class AstrometryCache:
+
+    retry_time = 30*60
+
+    def __init__(self, path=None):
+        """
+        Description
+        -----------
+        Keeps each target's astrometry (see query_target_astrometry) so that SIMBAD only has to be asked once per
+        target, rather than once per image.  Targets that were found are also saved to a json file, so they are
+        known straight away in later runs.  Lookups run in the background, so a slow or unreachable SIMBAD never
+        holds up the caller for longer than it is willing to wait.
+
+        Parameters
+        ----------
+        path : STR, optional
+            Path to the json file.  The default is None, which uses astrometry_cache.json next to this file.
+
+        Returns
+        -------
+        None.
+
+        """
+        if path is None:
+            path = os.path.join(os.path.abspath(os.path.dirname(__file__)), r'astrometry_cache.json')
+        self.path = path
+        self.lock = threading.Lock()
+        self.targets = {}
+        # Targets that could not be found, and when they were last tried
+        self.failed = {}
+        self.pending = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as file:
+                    self.targets = json.load(file)
+            except (OSError, json.JSONDecodeError):
+                logging.warning('Could not read the astrometry cache at {}'.format(self.path))
+
+    @staticmethod
+    def key(name):
+        return ' '.join(str(name).split()).lower()
 
-    return JDUTC_to_BJDTDB(JDUTC=jd, ra=ra, dec=dec, epoch=epoch, pmra=pmra, pmdec=pmdec, px=parallax,
-                           rv=radial_velocity, lat=lat, longi=lon, alt=height, leap_update=False)[0][0]
+    def _save(self):
+        try:
+            with open(self.path, 'w') as file:
+                json.dump(self.targets, file, indent=1)
+        except OSError:
+            logging.warning('Could not save the astrometry cache to {}'.format(self.path))
+
+    def _resolve(self, key, name, ra, dec):
+        astrometry = None
+        try:
+            astrometry = query_target_astrometry(name, ra, dec)
+        except Exception:
+            # Anything going wrong here (a missing astroquery, an unexpected SIMBAD table) must not leave the target
+            # pending forever
+            logging.exception('Error looking up the astrometry for {}'.format(name))
+        finally:
+            with self.lock:
+                if astrometry:
+                    self.targets[key] = astrometry
+                    self._save()
+                    logging.debug('Astrometry for {} has been cached'.format(name))
+                else:
+                    self.failed[key] = time.monotonic()
+                    logging.warning('Could not get the astrometry for {} from SIMBAD; BJD_TDB will not be calculated '
+                                    'for it'.format(name))
+                self.pending.pop(key).set()
+
+    def get(self, name, ra=None, dec=None, timeout=None):
+        """
+        Parameters
+        ----------
+        name : STR
+            Name of the target.
+        ra : FLOAT, optional
+            Right ascension of the target in degrees (J2000), in case SIMBAD does not know the name.
+        dec : FLOAT, optional
+            Declination of the target in degrees (J2000), in case SIMBAD does not know the name.
+        timeout : INT or FLOAT, optional
+            Maximum time to wait for SIMBAD, in seconds, if the target is not cached yet.  The default is None, which
+            waits until the lookup is finished.  With 0, the lookup is only started.
+
+        Returns
+        -------
+        DICT or None
+            The target's astrometry, or None if it is not known (yet).
+
+        """
+        key = self.key(name)
+        with self.lock:
+            if key in self.targets:
+                return self.targets[key]
+            event = self.pending.get(key)
+            if event is None:
+                if key in self.failed and time.monotonic() - self.failed[key] < self.retry_time:
+                    return None
+                event = self.pending[key] = threading.Event()
+                threading.Thread(target=self._resolve, args=(key, name, ra, dec), name='Astrometry-Th',
+                                 daemon=True).start()
+        event.wait(timeout)
+        with self.lock:
+            return self.targets.get(key)
+
+
+_astrometry_cache = None
+
+
+def get_astrometry_cache():
+    """
+    Returns
+    -------
+    _astrometry_cache : AstrometryCache
+        Global astrometry cache, created the first time it is needed.
+
+    """
+    global _astrometry_cache
+    if _astrometry_cache is None:
+        _astrometry_cache = AstrometryCache()
+    return _astrometry_cache
+
+
+def convert_to_bjd_tdb(jd, name, lat, lon, height, ra=None, dec=None, timeout=None):
+    """
+    Parameters
+    ----------
+    jd : FLOAT
+        Julian date (UTC) to convert.
+    name : STR
+        Name of the target.
+    lat : FLOAT
+        Site latitude in degrees.
+    lon : FLOAT
+        Site longitude in degrees.
+    height : FLOAT
+        Site altitude in meters.
+    ra : FLOAT, optional
+        Right ascension of the target in hours (J2000).  The default is None, which uses the position from SIMBAD.
+    dec : FLOAT, optional
+        Declination of the target in degrees (J2000).  The default is None, which uses the position from SIMBAD.
+    timeout : INT or FLOAT, optional
+        Maximum time to wait for SIMBAD if the target's astrometry is not cached yet.  The default is None, which
+        waits indefinitely.
+
+    Returns
+    -------
+    FLOAT or None
+        BJD_TDB, or None if the target's astrometry is not known.
+
+    """
+    epoch = 2451545.0
+    if ra:
+        ra *= 15
+    astrometry = get_astrometry_cache().get(name, ra, dec, timeout=timeout)
+    if not astrometry:
+        return None
+    from barycorrpy import JDUTC_to_BJDTDB
+    # Only the astrometry needs SIMBAD: the conversion itself is done locally
+    return JDUTC_to_BJDTDB(JDUTC=jd, ra=ra or astrometry['ra'], dec=dec or astrometry['dec'], epoch=epoch,
+                           pmra=astrometry['pmra'], pmdec=astrometry['pmdec'], px=astrometry['parallax'],
+                           rv=astrometry['rv'], lat=lat, longi=lon, alt=height, leap_update=False)[0][0]
 
 
-@njit
+@njit(cache=True)
 def truncate(number, digits) -> float:
     stepper = np.power(10, digits)
     return int(stepper * number) / stepper
@@ -0,0 +1,133 @@
+# Radar and satellite image classification, and weather trends, for the weather checks
+import io
+import numpy as np
+from typing import Optional, Sequence, Tuple
+
+from PIL import Image
+
+# Fairfax in the SSEC GOES CONUS images, as (left, upper, right, lower) pixels
+FAIRFAX_BOX = (1340, 295, 1380, 335)
+
+
+def decode_image(content: bytes, box: Optional[Tuple[int, int, int, int]] = None,
+                 mode: Optional[str] = None) -> np.ndarray:
+    """
+    Parameters
+    ----------
+    content : BYTES
+        A downloaded image (PNG, GIF, ...).
+    box : TUPLE, optional
+        (left, upper, right, lower) pixels to crop to, before any conversion.  The default is None, for the whole
+        image.
+    mode : STR, optional
+        PIL mode to convert to after cropping, like "RGBA".  The default is None, which keeps the image's own mode,
+        so a palette image gives its palette indices.
+
+    Returns
+    -------
+    NUMPY ARRAY
+        The (cropped) image, without it ever being written to disk.
+
+    """
+    with Image.open(io.BytesIO(content)) as img:
+        if box is not None:
+            img = img.crop(box)
+        if mode is not None and img.mode != mode:
+            img = img.convert(mode)
+        return np.asarray(img)
+
+
+def radar_coverage(tiles: Sequence[bytes], colors: Optional[np.ndarray] = None, tolerance: int = 0) -> np.ndarray:
+    """
+    Description
+    -----------
+    Finds the fraction of each radar tile that shows precipitation.  The tiles are decoded and then classified all at
+    once.
+
+    Parameters
+    ----------
+    tiles : LIST of BYTES
+        Downloaded radar tiles, all the same size.
+    colors : NUMPY ARRAY, optional
+        Colour table, an N x 3 (RGB) or N x 4 (RGBA) array of the colours that count as precipitation.  The default
+        is None, which counts every pixel that is not fully transparent black.
+    tolerance : INT, optional
+        Largest difference in any channel for a pixel to match a colour in the table.  The default is 0.
+
+    Returns
+    -------
+    NUMPY ARRAY
+        Fraction (0 to 1) of each tile covered by precipitation.
+
+    """
+    pixels = np.stack([decode_image(tile, mode='RGBA') for tile in tiles])
+    if colors is None:
+        precipitation = pixels.any(axis=-1)
+    else:
+        colors = np.asarray(colors, dtype=np.int16)
+        channels = pixels[..., np.newaxis, :colors.shape[1]].astype(np.int16)
+        precipitation = (np.abs(channels - colors) <= tolerance).all(axis=-1).any(axis=-1)
+    return precipitation.mean(axis=(1, 2))
+
+
+def cloud_coverage(content: bytes, saturation: float, box: Tuple[int, int, int, int] = FAIRFAX_BOX) \
+        -> Tuple[float, np.ndarray]:
+    """
+    Parameters
+    ----------
+    content : BYTES
+        A downloaded GOES infrared satellite image.
+    saturation : FLOAT
+        Smallest pixel value that counts as cloud.
+    box : TUPLE, optional
+        (left, upper, right, lower) pixels of the area to check.  The default is FAIRFAX_BOX.
+
+    Returns
+    -------
+    coverage : FLOAT
+        Fraction (0 to 1) of the area covered by clouds.
+    crop : NUMPY ARRAY
+        Pixel values of the area.
+
+    """
+    crop = decode_image(content, box=box)
+    return float(np.count_nonzero(crop >= saturation) / crop.size), crop
+
+
+def forecast_crossing(times: np.ndarray, values: np.ndarray, limit: float, min_points: int = 3) -> Optional[float]:
+    """
+    Description
+    -----------
+    Fits a straight line to recent readings of one quantity and finds when it will rise to a limit.
+
+    Parameters
+    ----------
+    times : NUMPY ARRAY
+        Times of the readings, in seconds.
+    values : NUMPY ARRAY
+        The readings.  NaN (missing) readings are left out of the fit.
+    limit : FLOAT
+        The limit that the readings must stay below.
+    min_points : INT, optional
+        Fewest readings to fit a trend to.  The default is 3.
+
+    Returns
+    -------
+    FLOAT or None
+        Time at which the trend reaches the limit (the time of the last reading, if the trend is already past it),
+        or None if there are too few readings or the trend is not rising.
+
+    """
+    good = np.isfinite(values)
+    if np.count_nonzero(good) < min_points:
+        return None
+    (times, values) = (times[good], values[good])
+    if np.ptp(times) <= 0:
+        return None
+    # Fitted about the last reading, so the intercept is the trend's current value
+    (slope, current) = np.polyfit(times - times[-1], values, 1)
+    if slope <= 0:
+        return None
+    if current >= limit:
+        return float(times[-1])
+    return float(times[-1] + (limit - current) / slope)
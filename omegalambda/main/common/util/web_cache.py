@@ -0,0 +1,156 @@
+# Shared HTTP session with keep-alive pooling and a small response cache, for the weather checks
+import time
+import logging
+import threading
+import collections
+from typing import Optional, Hashable
+
+import requests
+import requests.adapters
+
+
+class _CacheEntry:
+
+    __slots__ = ('response', 'expires', 'etag', 'last_modified')
+
+    def __init__(self, response: requests.Response, expires: float):
+        self.response = response
+        self.expires = expires
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+
+
+class WebCache:
+
+    def __init__(self, user_agent: Optional[str] = None, max_entries: int = 200, pool_size: int = 8):
+        """
+        Description
+        -----------
+        A requests session shared by every thread, which keeps connections alive between requests, plus a cache of
+        successful responses.  A cached response is returned without any request while it is fresh (for its ttl);
+        after that it is revalidated with If-None-Match / If-Modified-Since when the server sent an ETag or
+        Last-Modified header, so that an unchanged page costs a "304 Not Modified" instead of the whole page.
+
+        Parameters
+        ----------
+        user_agent : STR, optional
+            User agent sent with every request.  The default is None, which uses requests' own.
+        max_entries : INT, optional
+            Number of responses to keep; the least recently used are dropped first.  The default is 200.
+        pool_size : INT, optional
+            Number of connections kept open to each host.  The default is 8.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if user_agent:
+            self.session.headers.update({'User-Agent': user_agent})
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = collections.Counter()
+
+    def get(self, url: str, timeout: Optional[float] = None, ttl: float = 0, key: Optional[Hashable] = None) \
+            -> requests.Response:
+        """
+        Parameters
+        ----------
+        url : STR
+            Address to download.
+        timeout : FLOAT, optional
+            Connect and read timeout in seconds.  The default is None, which waits forever.
+        ttl : FLOAT, optional
+            Seconds that the response may be reused without asking the server.  The default is 0, so the server
+            is always asked, but with a conditional request if possible.
+        key : HASHABLE, optional
+            What to cache the response under.  The default is None, which uses the url.  Useful when the url holds
+            something that changes without changing the page, like an API key.
+
+        Returns
+        -------
+        requests.Response
+            The response, which may be a cached one.  Only successful (200) responses are cached.
+
+        """
+        key = url if key is None else key
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is not None and time.monotonic() < entry.expires:
+            self._count('hits', 0)
+            return entry.response
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        response = self.session.get(url, timeout=timeout, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            entry.expires = time.monotonic() + ttl
+            self._count('revalidated', 0)
+            return entry.response
+        self._count('downloads', len(response.content))
+        if response.status_code == 200 and (ttl > 0 or 'ETag' in response.headers or
+                                            'Last-Modified' in response.headers):
+            with self.lock:
+                self.entries[key] = _CacheEntry(response, time.monotonic() + ttl)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return response
+
+    def forget(self, key: Hashable) -> None:
+        """
+        Description
+        -----------
+        Drops a cached response, so that the next request for it downloads it again.
+
+        Parameters
+        ----------
+        key : HASHABLE
+            The url or key the response was cached under.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def _count(self, kind: str, size: int) -> None:
+        with self.lock:
+            self.stats[kind] += 1
+            self.stats['bytes'] += size
+        logging.debug('Web cache: {} ({} bytes)'.format(kind, size))
+
+
+_web_cache = None
+
+
+def get_web_cache(user_agent: Optional[str] = None) -> WebCache:
+    """
+    Parameters
+    ----------
+    user_agent : STR, optional
+        User agent for the session, only used the first time it is created.  The default is None.
+
+    Returns
+    -------
+    _web_cache : WebCache
+        Global HTTP session and response cache, created the first time it is needed.  It outlives any one Conditions
+        object, so its connections and cached images survive condition checker restarts.
+
+    """
+    global _web_cache
+    if _web_cache is None:
+        _web_cache = WebCache(user_agent=user_agent)
+    return _web_cache
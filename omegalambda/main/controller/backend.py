@@ -0,0 +1,236 @@
+# Hardware backend: the real COM objects and serial ports on the observatory PC, or the simulator
+import os
+import glob
+import logging
+import subprocess
+import serial.tools.list_ports
+
+try:
+    import pythoncom
+    import pywintypes
+    import win32com.client
+except ImportError:
+    # pywin32 only exists on Windows; anywhere else only the simulator can be used
+    pythoncom = None
+    pywintypes = None
+    win32com = None
+
+
+class SimulatedComError(Exception):
+    """
+    Stands in for pywintypes.com_error where pywin32 is not installed.  Takes the same arguments:
+    (hresult, strerror, excepinfo, argerror).
+    """
+    pass
+
+
+com_error = pywintypes.com_error if pywintypes is not None else SimulatedComError
+
+_simulator = None
+
+
+def get_simulator():
+    """
+    Returns
+    -------
+    _simulator : Simulator or None
+        The simulator that the hardware classes are connected to, or None if they use the real hardware.
+
+    """
+    return _simulator
+
+
+def set_simulator(simulator):
+    """
+    Description
+    -----------
+    Connects every hardware class created from now on to the given simulator instead of the real hardware.
+
+    Parameters
+    ----------
+    simulator : Simulator or None
+        From omegalambda.main.simulator.simulator.  None switches back to the real hardware.
+
+    Returns
+    -------
+    None.
+
+    """
+    global _simulator
+    _simulator = simulator
+
+
+def dispatch(prog_id):
+    """
+    Parameters
+    ----------
+    prog_id : STR
+        COM ProgID of the object to connect to, like "MaxIm.CCDCamera".
+
+    Returns
+    -------
+    OBJECT
+        The COM object, or the simulated device standing in for it.
+
+    """
+    if _simulator is not None:
+        return _simulator.dispatch(prog_id)
+    if win32com is None:
+        raise com_error(-2147221005, 'pywin32 is not installed, so {} cannot be dispatched'.format(prog_id),
+                        None, None)
+    return win32com.client.Dispatch(prog_id)
+
+
+def co_initialize():
+    """
+    Description
+    -----------
+    Initializes COM for the calling thread.  Does nothing for the simulator.
+
+    Returns
+    -------
+    None.
+
+    """
+    if _simulator is None and pythoncom is not None:
+        pythoncom.CoInitialize()
+
+
+def co_uninitialize():
+    """
+    Description
+    -----------
+    Uninitializes COM for the calling thread.  Does nothing for the simulator.
+
+    Returns
+    -------
+    None.
+
+    """
+    if _simulator is None and pythoncom is not None:
+        pythoncom.CoUninitialize()
+
+
+def comports():
+    """
+    Returns
+    -------
+    LIST
+        serial.tools.list_ports_common.ListPortInfo objects for every serial port that devices may be connected to.
+
+    """
+    if _simulator is not None:
+        return _simulator.comports()
+    return list(serial.tools.list_ports.comports())
+
+
+def program_running(program):
+    """
+    Parameters
+    ----------
+    program : STR
+        Name of the Windows executable, like "MaxIm_DL.exe".
+
+    Returns
+    -------
+    BOOL
+        True if the program is running and responding, otherwise False.  For the simulator, True unless the program
+        was made to hang with Simulator.hang_program.
+
+    """
+    return program in running_programs([program])
+
+
+def running_programs(programs):
+    """
+    Description
+    -----------
+    Finds which of the given programs are running and responding, with a single look at the process list: tasklist
+    on Windows, /proc elsewhere (like Wine on Linux), or the simulator's hung programs.
+
+    Parameters
+    ----------
+    programs : LIST
+        Names of the executables, like "MaxIm_DL.exe".
+
+    Returns
+    -------
+    SET
+        The programs that are running and responding.
+
+    """
+    if _simulator is not None:
+        return set(programs) - _simulator.hung_programs
+    if os.name == 'nt':
+        return set(programs) & _tasklist_programs()
+    return set(programs) & _proc_programs()
+
+
+def _tasklist_programs():
+    # One line per responding process, like "MaxIm_DL.exe","1234","Console","1","150,000 K"
+    output = subprocess.run('tasklist /FI "STATUS eq running" /FO CSV /NH', stdout=subprocess.PIPE,
+                            text=True).stdout
+    return {line.split('","')[0].strip('"') for line in output.splitlines() if line.startswith('"')}
+
+
+def _proc_programs():
+    names = set()
+    for path in glob.glob('/proc/[0-9]*/stat'):
+        try:
+            with open(path) as file:
+                stat = file.read()
+        except OSError:
+            # The process ended while looking
+            continue
+        # "pid (name) state ...", where the name may itself hold spaces or parentheses
+        name = stat[stat.index('(') + 1:stat.rindex(')')]
+        state = stat[stat.rindex(')') + 2:stat.rindex(')') + 3]
+        if state not in ('Z', 'T', 't', 'X'):
+            names.add(name)
+    return names
+
+
+def kill_program(program):
+    """
+    Description
+    -----------
+    Force-quits a Windows program.  Does nothing for the simulator.
+
+    Parameters
+    ----------
+    program : STR
+        Name of the Windows executable, like "TheSkyX.exe".
+
+    Returns
+    -------
+    None.
+
+    """
+    if _simulator is not None:
+        logging.debug('Simulator: not killing {}'.format(program))
+        # Killed and started again, so no longer hung
+        _simulator.hung_programs.discard(program)
+        return
+    subprocess.call('taskkill /f /im {}'.format(program))
+
+
+def start_program(path):
+    """
+    Description
+    -----------
+    Starts a Windows program without waiting for it.  Does nothing for the simulator.
+
+    Parameters
+    ----------
+    path : STR
+        Full path to the executable.
+
+    Returns
+    -------
+    None.
+
+    """
+    if _simulator is not None:
+        logging.debug('Simulator: not starting {}'.format(path))
+        return
+    subprocess.Popen(r'"{}"'.format(path))
@@ -1,11 +1,10 @@
-import time
 import threading
 import logging
-import pywintypes
-import win32com.client
 from typing import Optional, Union
 
 from .hardware import Hardware
+from . import backend
+from ..common.util import frame_bus
 
 
 class Camera(Hardware):
@@ -21,7 +20,8 @@ class Camera(Hardware):
         """
         self.cooler_settle = threading.Event()
         self.image_done = threading.Event()
-        self.camera_lock = threading.Lock()
+        # Reentrant, since an exposure cut short by a crash disconnects (and so sets the cooler) while holding it
+        self.camera_lock = threading.RLock()
         self.fwhm: Optional[Union[float, int]] = None
         self.cooler_status = False
         super(Camera, self).__init__(name='Camera')
@@ -58,10 +58,10 @@ class Camera(Hardware):
             True if successful, otherwise False.
         """
         try:
-            self.Camera = win32com.client.Dispatch("MaxIm.CCDCamera")
-            self.Application = win32com.client.Dispatch("MaxIm.Application")
+            self.Camera = backend.dispatch("MaxIm.CCDCamera")
+            self.Application = backend.dispatch("MaxIm.Application")
             self.check_connection()
-        except (AttributeError, pywintypes.com_error):
+        except (AttributeError, backend.com_error):
             logging.error('Cannot connect to camera')
             return False
         else:
@@ -91,14 +91,14 @@ class Camera(Hardware):
         with self.camera_lock:
             try:
                 self.Camera.CoolerOn = True
-            except (AttributeError, pywintypes.com_error):
+            except (AttributeError, backend.com_error):
                 logging.error("Could not turn on cooler")
 
             if self.Camera.CoolerOn and toggle is True:
                 try:
                     self.Camera.TemperatureSetpoint = self.config_dict.cooler_setpoint
                     self.cooler_status = True
-                except (AttributeError, pywintypes.com_error):
+                except (AttributeError, backend.com_error):
                     logging.warning('Could not change camera cooler setpoint')
                 else:
                     logging.info("Cooler Setpoint set to {0:.1f} C".format(self.Camera.TemperatureSetpoint))
@@ -106,7 +106,7 @@ class Camera(Hardware):
                 try:
                     self.Camera.TemperatureSetpoint = self.config_dict.cooler_idle_setpoint
                     self.cooler_status = False
-                except (AttributeError, pywintypes.com_error):
+                except (AttributeError, backend.com_error):
                     logging.warning('Could not change camera cooler setpoint')
                 else:
                     logging.info("Cooler Setpoint set to {0:.1f} C".format(self.Camera.TemperatureSetpoint))
@@ -165,7 +165,7 @@ class Camera(Hardware):
         while not (self.Camera.TemperatureSetpoint - 0.2 <= self.Camera.Temperature <= self.Camera.TemperatureSetpoint
                    + 0.2):
             logging.info("Waiting for cooler to settle...")
-            time.sleep(60)
+            self.clock.sleep(60)
             t += 1
             if t < self.config_dict.cooler_settle_time:
                 continue
@@ -180,7 +180,7 @@ class Camera(Hardware):
             if self.Camera.Temperature < self.Camera.TemperatureSetpoint:
                 break
             last_temp = temp
-        time.sleep(1)
+        self.clock.sleep(1)
         logging.info("Cooler has settled")
         self.cooler_settle.set()
         return
@@ -196,7 +196,7 @@ class Camera(Hardware):
         None.
         """
         while self.Camera.ImageReady is False and self.crashed.isSet() is False:
-            time.sleep(1)
+            self.clock.sleep(1)
         if self.Camera.ImageReady:
             return True
         elif self.crashed.isSet():
@@ -233,29 +233,37 @@ class Camera(Hardware):
 
         Returns
         -------
-        None.
+        bool
+            True if the image was taken (and saved, if save_path was given), otherwise False.
         """
         while self.crashed.isSet():
-            time.sleep(1)
+            self.clock.sleep(1)
         with self.camera_lock:
+            image_type = type
             type = 1 if type == "light" else 0 if type == "dark" else None
             if type is None:
                 logging.error("Invalid exposure type.")
-                return
+                return False
             logging.debug('Exposing image')
             self.Camera.SetFullFrame()
             self.Camera.Expose(exposure_time, type, filter)
+            # No point asking whether the image is ready until the shutter has closed
+            self.clock.wait(self.crashed, exposure_time)
             check = self._image_ready()
             if header_kwargs:
                 for key, value in header_kwargs.items():
                     self.Camera.SetFITSKey(key, value)
             if save_path is None:
-                return
+                return bool(check)
             elif check:
                 self.Camera.SaveImage(save_path)
+                # Subscribers get the new frame directly, rather than having to look for it on disk
+                frame_bus.get_frame_bus().publish(frame_bus.Frame(save_path, image_type, exposure_time,
+                                                                  **header_kwargs))
                 self.image_done.set()
                 self.image_done.clear()
-                
+            return bool(check)
+
     def disconnect(self):
         """
         Description
@@ -271,7 +279,7 @@ class Camera(Hardware):
                 self.cooler_set(False)
                 self.Camera.Quit()
                 self.live_connection.clear()
-            except (AttributeError, pywintypes.com_error):
+            except (AttributeError, backend.com_error):
                 logging.error("Could not disconnect from camera")
             else:
                 logging.info("Camera has successfully disconnected")
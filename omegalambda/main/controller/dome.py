@@ -1,11 +1,8 @@
-import time
 import threading
 import logging
-import subprocess
-import pywintypes
-import win32com.client
 
 from .hardware import Hardware
+from . import backend
 
 
 class Dome(Hardware):
@@ -55,9 +52,9 @@ class Dome(Hardware):
             True if successful, otherwise False.
         """
         try:
-            self.Dome = win32com.client.Dispatch("ASCOMDome.Dome")
+            self.Dome = backend.dispatch("ASCOMDome.Dome")
             self.check_connection()
-        except (AttributeError, pywintypes.com_error):
+        except (AttributeError, backend.com_error):
             logging.error('Could not connect to dome')
             return False
         else:
@@ -77,7 +74,7 @@ class Dome(Hardware):
 
         """
         while self.Dome.Slewing:
-            time.sleep(2)
+            self.clock.sleep(2)
         if not self.Dome.Slewing:
             return
         
@@ -89,11 +86,13 @@ class Dome(Hardware):
 
         Returns
         -------
-        None.
+        shutter : INT
+            0 = open, 1 = closed, 2 = opening, 3 = closing, 4 = error.
 
         """
         # Shutter status: 0 = open, 1 = closed, 2 = opening, 3 = closing, 4 = error.
         self.shutter = self.Dome.ShutterStatus
+        return self.shutter
     
     def home(self):
         """
@@ -111,13 +110,13 @@ class Dome(Hardware):
         try:
             with self.dome_move_lock:
                 self.Dome.FindHome()
-        except pywintypes.com_error:
+        except backend.com_error:
             logging.error('Dome cannot find home')
         else: 
             logging.info("Dome is homing")
             t = 0
             while not self.Dome.AtHome:
-                time.sleep(5)
+                self.clock.sleep(5)
                 t += 5
                 if t >= 5*60:
                     logging.warning('Dome is still homing...ASCOM may be incorrectly reporting status.')
@@ -146,7 +145,7 @@ class Dome(Hardware):
             with self.dome_move_lock:
                 self._is_ready()
                 self.Dome.Park()
-        except pywintypes.com_error:
+        except backend.com_error:
             logging.error("Error parking dome")
             return False
         else: 
@@ -173,10 +172,10 @@ class Dome(Hardware):
             with self.dome_move_lock:
                 self.Dome.OpenShutter()
                 logging.info("Shutter is opening")
-                time.sleep(2)
+                self.clock.sleep(2)
             t = 0
             while self.Dome.ShutterStatus in (1, 2, 4):
-                time.sleep(5)
+                self.clock.sleep(5)
                 t += 5
                 if t >= 5*60:
                     logging.warning('Shutter is still opening...ASCOM may be incorrectly reporting status.')
@@ -191,10 +190,10 @@ class Dome(Hardware):
             with self.dome_move_lock:
                 self.Dome.CloseShutter()
                 logging.info("Shutter is closing")
-                time.sleep(2)
+                self.clock.sleep(2)
             t = 0
             while self.Dome.ShutterStatus in (0, 3, 4):
-                time.sleep(5)
+                self.clock.sleep(5)
                 t += 5
                 if t >= 5*60:
                     logging.warning('Shutter is still closing...ASCOM may be incorrectly reporting status.')
@@ -227,19 +226,19 @@ class Dome(Hardware):
             try:
                 with self.dome_move_lock:
                     self.Dome.Slaved = True
-            except pywintypes.com_error:
+            except backend.com_error:
                 logging.error("Cannot sync dome to scope")
             else: 
                 logging.info("Dome is syncing to scope")
                 self._is_ready()
                 # Extra wait in case the dome pauses in the middle of syncing
-                time.sleep(5)
+                self.clock.sleep(5)
                 self._is_ready()
                 self.move_done.set()
         elif toggle is False:
             try:
                 self.Dome.Slaved = False
-            except pywintypes.com_error:
+            except backend.com_error:
                 logging.error("Cannot stop syncing dome to scope")
             else: 
                 logging.info("Dome is no longer syncing to scope")
@@ -262,7 +261,7 @@ class Dome(Hardware):
         try:
             with self.dome_move_lock:
                 self.Dome.SlewtoAzimuth(azimuth)
-        except pywintypes.com_error:
+        except backend.com_error:
             logging.error("Error slewing dome")
         else: 
             logging.info("Dome is slewing to {} degrees".format(azimuth))
@@ -297,16 +296,16 @@ class Dome(Hardware):
         """
         self._is_ready()
         while self.Dome.ShutterStatus != 1:
-            time.sleep(5)
+            self.clock.sleep(5)
         if self.Dome.AtPark and self.Dome.ShutterStatus == 1:
             try: 
                 self.Dome.Connected = False
                 self.live_connection.clear()
                 return True
-            except (AttributeError, pywintypes.com_error):
+            except (AttributeError, backend.com_error):
                 logging.error("Could not disconnect from dome")
-                subprocess.call('taskkill /f /im ASCOMDome.exe')
-                subprocess.Popen(r'"C:\Program Files (x86)\Common Files\ASCOM\Dome\ASCOMDome.exe"')
+                backend.kill_program('ASCOMDome.exe')
+                backend.start_program(r'C:\Program Files (x86)\Common Files\ASCOM\Dome\ASCOMDome.exe')
                 return False
         else: 
             logging.critical("Dome is not parked, or shutter not closed")
@@ -1,12 +1,12 @@
 # Flatfield Lamp Controller
 import logging
 import serial
-import serial.tools.list_ports
 from serial.serialutil import SerialException
 import threading
 import time
 
 from .hardware import Hardware
+from . import backend
 
 class FlatLamp(Hardware):
     startMarker = '<'
@@ -33,7 +33,7 @@ class FlatLamp(Hardware):
         self.timeout_time = time.time() + 5
         self.lamp_done = threading.Event()
         
-        ports = serial.tools.list_ports.comports()
+        ports = backend.comports()
         
         self.arduino_ports = []
         for p in ports:
@@ -158,7 +158,8 @@ class FlatLamp(Hardware):
 
         Returns
         -------
-        None.
+        bool
+            True if successful, otherwise False.
 
         """
         self.lamp_done.clear()
@@ -166,10 +167,12 @@ class FlatLamp(Hardware):
             self.ser.write('1'.encode())
         except SerialException:
             logging.error('Could not turn on the flatfield lamp')
+            return False
         else:
             logging.info('The flat lamp is now on')
             self.status = 'on'
             self.lamp_done.set()
+            return True
        
     def turn_off(self):
         """
@@ -179,7 +182,8 @@ class FlatLamp(Hardware):
 
         Returns
         -------
-        None.
+        bool
+            True if successful, otherwise False.
 
         """
         self.lamp_done.clear()
@@ -187,10 +191,12 @@ class FlatLamp(Hardware):
             self.ser.write('0'.encode())
         except SerialException:
             logging.error('Could not turn off the flatfield lamp')
+            return False
         else: 
             logging.info('The flat lamp is now off')
             self.status = 'off'
             self.lamp_done.set()
+            return True
        
     def disconnect(self):
         """
@@ -1,12 +1,11 @@
 import logging
 import threading
-import time
 import re
 import serial
-import serial.tools.list_ports
 from serial.serialutil import SerialException
 
 from .hardware import Hardware
+from . import backend
 from ..common.IO import config_reader
 
 
@@ -65,7 +64,7 @@ class Focuser(Hardware):
         BOOL
             True if successful, otherwise False.
         """
-        ports = list(serial.tools.list_ports.comports())
+        ports = backend.comports()
         com = [port for port in ports if "COM" in port.description]
         if len(com) >= 1:
             for comport in com:
@@ -161,7 +160,7 @@ class Focuser(Hardware):
                 logging.info('The new focus position is {}'.format(self.position))
             except SerialException:
                 logging.error('Could not move focuser in.')
-            time.sleep(2)
+            self.clock.sleep(2)
             self.adjusting.set()
         return True
 
@@ -192,7 +191,7 @@ class Focuser(Hardware):
                 logging.info('The new focus position is {}'.format(self.position))
             except SerialException:
                 logging.error('Could not move focuser out.')
-            time.sleep(2)
+            self.clock.sleep(2)
             self.adjusting.set()
         return True
 
@@ -226,7 +225,7 @@ class Focuser(Hardware):
                 logging.info('The new focus position is {}'.format(self.position))
             except SerialException:
                 logging.error('Could not move to absolute position.')
-            time.sleep(2)
+            self.clock.sleep(2)
             self.adjusting.set()
         return True
 
@@ -1,21 +1,15 @@
 # Focusing procedures
 import os
 import logging
-import time
 import threading
 import numpy as np
-import datetime
 from scipy.optimize import curve_fit
-import matplotlib
 
 from .hardware import Hardware
 from ..common.IO import config_reader
-from ..common.util import filereader_utils
+from ..common.util import filereader_utils, plot_utils, frame_bus
 
 np.warnings.filterwarnings('ignore')
-# Use the non-interactive Agg backned.  See condition_checker.py for explanation.
-matplotlib.use('Agg', force=True)
-import matplotlib.pyplot as plt
 
 
 def standard_parabola(x, a, b, c):
@@ -30,9 +24,25 @@ def standard_parabola(x, a, b, c):
     return a + b*x + c*x**2
 
 
+def _plot_focus_fit(target_path, x, y, xfit, yfit):
+    """
+    Draws the measured fwhm values and the parabolic fit against focus position, and saves it to target_path.
+    """
+    fig = plot_utils.new_figure()
+    ax = fig.add_subplot()
+    ax.plot(x, y, 'bo', label='Raw data')
+    ax.plot(xfit, yfit, 'r-', label='Parabolic fit')
+    ax.legend()
+    ax.set_xlabel('Focus Positions (units)')
+    ax.set_ylabel('FWHM value (pixels)')
+    ax.set_title('Focus Positions Graph')
+    ax.grid()
+    fig.savefig(target_path)
+
+
 class FocusProcedures(Hardware):
 
-    def __init__(self, focus_obj, camera_obj, conditions_obj, shutdown_event, plot_lock=None):
+    def __init__(self, focus_obj, camera_obj, conditions_obj, shutdown_event, plotter=None):
         """
         Initializes focusprocedures as a subclass of hardware.
 
@@ -44,8 +54,8 @@ class FocusProcedures(Hardware):
             From custom camera class.
         conditions_obj : CLASS INSTANCE OBJECT of Conditions
             From custom conditions class.
-        plot_lock : threading.Lock
-            Thread lock so as not to attempt multiple matplotlib plots at once.
+        plotter : PlotRenderer, optional
+            Renders the focus plots in the background.  If None, plots are drawn on this thread.
 
         Returns
         -------
@@ -56,7 +66,7 @@ class FocusProcedures(Hardware):
         self.camera = camera_obj
         self.conditions = conditions_obj
         self.config_dict = config_reader.get_config()
-        self.plot_lock = plot_lock
+        self.plotter = plotter
         self.position_previous = None
         self.temp_previous = None
         self.shutdown_event = shutdown_event
@@ -85,10 +95,7 @@ class FocusProcedures(Hardware):
         -------
         FLOAT or INT : The temperature value as read by the focuser class.
         """
-        self.focuser.onThread(self.focuser.get_temperature)
-        self.focuser.adjusting.wait()
-        time.sleep(1)
-        return self.focuser.temperature
+        return self.focuser.onThread(self.focuser.get_temperature).get(timeout=60)
 
     def startup_focus_procedure(self, exp_time, _filter, image_path):
         """
@@ -117,23 +124,24 @@ class FocusProcedures(Hardware):
         if not os.path.exists(os.path.join(image_path, r'focuser_images')):
             os.mkdir(os.path.join(image_path, r'focuser_images'))
         # Creates new sub-directory for focuser images
-        self.focuser.onThread(self.focuser.current_position)
-        self.focuser.adjusting.wait()
-        time.sleep(2)
-        initial_position = self.focuser.position
+        position = self.focuser.onThread(self.focuser.current_position)
+        initial_position = position.get(timeout=60, default=self.focuser.position)
         fwhm_values = []
         focus_positions = []
         peaks = []
         i = 0
         errors = 0
         crash_loops = 0
+        focus_directory = os.path.abspath(os.path.join(image_path, r'focuser_images'))
+        frames = frame_bus.get_frame_bus().subscribe(
+            self.label, accept=lambda frame: os.path.dirname(os.path.abspath(frame.path)) == focus_directory)
         while i < self.config_dict.focus_iterations:
             if not self.initial_focusing.isSet():
                 break
             if self.camera.crashed.isSet() or self.focuser.crashed.isSet():
                 if crash_loops <= 4:
                     logging.warning('The camera or focuser has crashed...waiting for potential recovery.')
-                    time.sleep(10)
+                    self.clock.sleep(10)
                     crash_loops += 1
                     continue
                 elif crash_loops > 4:
@@ -142,15 +150,16 @@ class FocusProcedures(Hardware):
                     break
             while self.shutdown_event.isSet():
                 logging.info('Temporarily pausing focus procedures while shut down due to weather...')
-                time.sleep(self.config_dict.weather_freq * 60)
+                self.clock.sleep(self.config_dict.weather_freq * 60)
             image_name = '{0:s}_{1:.3f}s-{2:04d}.fits'.format('FocuserImage', exp_time, i + 1)
             path = os.path.join(image_path, r'focuser_images', image_name)
             self.camera.onThread(self.camera.expose, exp_time, _filter, save_path=path, type="light")
-            self.focuser.onThread(self.focuser.current_position)
-            self.camera.image_done.wait()
-            time.sleep(2)
-            current_position = self.focuser.position
-            fwhm, peak = filereader_utils.radial_average(path, self.config_dict.saturation, plot_lock=self.plot_lock,
+            position = self.focuser.onThread(self.focuser.current_position)
+            frame = frames.get(timeout=exp_time*2 + 60)
+            current_position = position.get(timeout=60, default=self.focuser.position)
+            # The published frame is analyzed in memory; the file is only read if the frame never arrived
+            fwhm, peak = filereader_utils.radial_average(frame.image if frame else path, self.config_dict.saturation,
+                                                         plotter=self.plotter,
                                                          image_save_path=os.path.join(image_path, r'focuser_images'))
             if abs(current_position - initial_position) >= self.config_dict.focus_max_distance:
                 logging.error('Focuser has stepped too far away from initial position and could not find a focus.')
@@ -165,42 +174,34 @@ class FocusProcedures(Hardware):
                     break
             errors = 0      # This way it must be 3 in a row
             if i < self.config_dict.focus_iterations // 2:
-                self.focuser.onThread(self.focuser.move_in, self.config_dict.initial_focus_delta)
-                self.focuser.adjusting.wait(timeout=10)
+                self.focuser.onThread(self.focuser.move_in, self.config_dict.initial_focus_delta).get(timeout=60)
             elif i == self.config_dict.focus_iterations // 2:
                 self.focuser.onThread(self.focuser.absolute_move,
-                                      int(initial_position + self.config_dict.initial_focus_delta))
-                time.sleep(5)
-                self.focuser.adjusting.wait(timeout=30)
+                                      int(initial_position + self.config_dict.initial_focus_delta)).get(timeout=60)
             elif i > self.config_dict.focus_iterations // 2:
-                self.focuser.onThread(self.focuser.move_out, self.config_dict.initial_focus_delta)
-                self.focuser.adjusting.wait(timeout=10)
+                self.focuser.onThread(self.focuser.move_out, self.config_dict.initial_focus_delta).get(timeout=60)
             logging.debug('Found fwhm = {} for the last image'.format(fwhm))
             fwhm_values.append(fwhm)
             focus_positions.append(current_position)
             peaks.append(peak)
             i += 1
-        
+        frames.close()
+
         fit_status, minfocus = self.plot_focus_model(fwhm_values, focus_positions, peaks)
         if minfocus:
             if abs(initial_position - minfocus) <= self.config_dict.focus_max_distance:
                 logging.info('The focuser found a minimum focus at {}'.format(int(minfocus)))
-                self.focuser.adjusting.wait(timeout=10)
-                self.focuser.onThread(self.focuser.absolute_move, int(minfocus))
-                self.focuser.adjusting.wait(timeout=30)
+                self.focuser.onThread(self.focuser.absolute_move, int(minfocus)).get(timeout=60)
             else:
                 fit_status = False
         if not fit_status:
             logging.error('The focuser could not find a minimum focus.  Resetting to initial position.')
-            self.focuser.adjusting.wait(timeout=10)
-            self.focuser.onThread(self.focuser.absolute_move, initial_position)
-            self.focuser.adjusting.wait(timeout=30)
+            self.focuser.onThread(self.focuser.absolute_move, initial_position).get(timeout=60)
 
         self.focused.set()
-        self.focuser.onThread(self.focuser.current_position)
-        time.sleep(2)
         self.temp_previous = self.conditions.temperature
-        self.position_previous = self.focuser.position
+        position = self.focuser.onThread(self.focuser.current_position)
+        self.position_previous = position.get(timeout=60, default=self.focuser.position)
         return
 
     def plot_focus_model(self, fwhm_values, position_values, peak_values):
@@ -220,29 +221,12 @@ class FocusProcedures(Hardware):
                                bounds=([-np.inf, -np.inf, 1e-5], [np.inf, np.inf, np.inf]))
             xfit = np.linspace(med - 75, med + 75, 126)
             yfit = fit[2] * (xfit ** 2) + fit[1] * xfit + fit[0]
-            if not isinstance(self.plot_lock, type(None)):
-                self.plot_lock.acquire()
-            else:
-                logging.warning('No thread lock is being utilized for plot drawing: plots may draw incorrectly!')
-            fig, ax = plt.subplots()
-            ax.plot(x, y, 'bo', label='Raw data')
-            ax.plot(xfit, yfit, 'r-', label='Parabolic fit')
-            ax.legend()
-            ax.set_xlabel('Focus Positions (units)')
-            ax.set_ylabel('FWHM value (pixels)')
-            ax.set_title('Focus Positions Graph')
-            ax.grid()
             current_path = os.path.abspath(os.path.dirname(__file__))
             target_path = os.path.abspath(os.path.join(current_path, r'../../test/FocusPlot_{}.png'.format(
-                datetime.datetime.now().strftime('%Y%m%d_%H%M%S'))))
+                self.clock.now().strftime('%Y%m%d_%H%M%S'))))
             target_path_2 = os.path.abspath(os.path.join(current_path, r'../../test/FocusData_{}.txt'.format(
-                datetime.datetime.now().strftime('%Y%m%d_%H%M%S'))))
-            plt.savefig(target_path)
-            plt.clf()
-            plt.cla()
-            plt.close('all')
-            if not isinstance(self.plot_lock, type(None)):
-                self.plot_lock.release()
+                self.clock.now().strftime('%Y%m%d_%H%M%S'))))
+            plot_utils.submit_plot(self.plotter, 'FocusPlot', _plot_focus_fit, target_path, x, y, xfit, yfit)
             d = np.array([[xi, yi] for xi, yi in zip(x, y)])
             np.savetxt(target_path_2, d, delimiter=',', header='Position [steps], FWHM [px]', fmt=('%d', '%.5f'))
 
@@ -272,15 +256,14 @@ class FocusProcedures(Hardware):
         self.continuous_focusing.set()
         while self.continuous_focusing.isSet() and (self.camera.crashed.isSet() is False
                                                     and self.focuser.crashed.isSet() is False):
-            time.sleep(self.config_dict.focus_adjust_frequency * 60)
+            self.clock.sleep(self.config_dict.focus_adjust_frequency * 60)
             logging.debug('Continuous focusing procedure is alive...')
             temp_current = self.conditions.temperature
             if temp_current is None:
                 continue
             if self.position_previous is None:
-                self.focuser.onThread(self.focuser.current_position)
-                time.sleep(2)
-                self.position_previous = self.focuser.position
+                position = self.focuser.onThread(self.focuser.current_position)
+                self.position_previous = position.get(timeout=60, default=self.focuser.position)
                 continue
             if self.temp_previous is None or ((temp_current - self.temp_previous) > 30):
                 self.temp_previous = temp_current
@@ -292,30 +275,10 @@ class FocusProcedures(Hardware):
             if not func:
                 self.temp_previous = temp_current
                 continue
-            self.focuser.onThread(func, abs(pos_diff))
-            self.focuser.adjusting.wait(timeout=15)
+            self.focuser.onThread(func, abs(pos_diff)).get(timeout=60)
             self.temp_previous = temp_current
             self.position_previous = new_position
 
-    @staticmethod
-    def get_newest_image(image_path):
-        """
-
-        Parameters
-        ----------
-        image_path : STR
-            File path to the images being saved by the camera.
-
-        Returns
-        -------
-        newest_image : STR
-            Full path to the most recently created image file in the given directory.
-        """
-        images = os.listdir(image_path)
-        paths = [full_path for fname in images if os.path.isfile(full_path := os.path.join(image_path, fname))]
-        newest_image = max(paths, key=os.path.getctime)
-        return newest_image
-
     def stop_constant_focusing(self):
         """
         Description
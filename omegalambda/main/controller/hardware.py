@@ -1,17 +1,55 @@
 # Hardware class to be inherited by camera, telescope, dome, etc.
 import threading
 import queue
-import time
 import logging
+import concurrent.futures
 
-import pythoncom
-
+from . import backend
 from ..common.IO import config_reader
+from ..common.util.clock import get_clock
+
+
+class CommandFuture(concurrent.futures.Future):
+    """
+    Handle returned by Hardware.onThread.  Resolves with the return value (or exception) of the function once it
+    has run on the hardware thread.
+    """
+
+    def get(self, timeout=None, default=None):
+        """
+        Description
+        -----------
+        Waits for the function to finish, without raising.
+
+        Parameters
+        ----------
+        timeout : INT or FLOAT, optional
+            Maximum time to wait, in seconds.  The default is None, which waits indefinitely.
+        default : ANY, optional
+            Value to return if the function did not finish in time, was cancelled, or raised an exception.  The
+            default is None.
+
+        Returns
+        -------
+        ANY
+            The function's return value, or default.
+
+        """
+        try:
+            return self.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            logging.warning('Timed out after {} s waiting for a hardware command to finish'.format(timeout))
+        except concurrent.futures.CancelledError:
+            logging.warning('Hardware command was cancelled because its thread stopped')
+        except Exception:
+            # Already logged by the hardware thread
+            pass
+        return default
 
 
 class Hardware(threading.Thread):
 
-    timeout = 1.0/60
+    timeout = 60
 
     def __init__(self, name):
         """
@@ -41,6 +79,7 @@ class Hardware(threading.Thread):
         super(Hardware, self).__init__(name=self.label + '-Th', daemon=True)       # Called threading.Thread.__init__
 
         self.config_dict = config_reader.get_config()  # Gets the config object as a class variable
+        self.clock = get_clock()        # Sleeps and waits in observing time, which a simulation can speed up
         self.live_connection = threading.Event()
 
     def onThread(self, function, *args, **kwargs):
@@ -49,7 +88,7 @@ class Hardware(threading.Thread):
         -----------
         Used to put a function on a specific thread other than the main thread.  This will put said function
         on that thread's queue and will be called as soon as the thread is ready to receive such a request.  Threads
-        check for new function calls once every second when they are not already running a function.
+        wake up as soon as a function is put on their queue, if they are not already running a function.
 
         Parameters
         ----------
@@ -63,11 +102,18 @@ class Hardware(threading.Thread):
 
         Returns
         -------
-        None.
+        future : CommandFuture
+            Resolves with the function's return value once it has run.  Use future.result() or future.get() to wait
+            for the function to finish, rather than sleeping.
 
         """
-        self.q.put((function, args, kwargs))
+        future = CommandFuture()
+        self.q.put((function, args, kwargs, future))
         logging.debug('{} has been put on the {} queue'.format(function, self.label))
+        if self.stopping.isSet() and not self.is_alive():
+            # Nothing will ever run it
+            self._cancel_pending()
+        return future
 
     def _class_connect(self):
         """
@@ -97,23 +143,54 @@ class Hardware(threading.Thread):
         None.
 
         """
-        pythoncom.CoInitialize()
+        backend.co_initialize()
         if not self._class_connect():
-            pythoncom.CoUninitialize()
+            backend.co_uninitialize()
+            self._cancel_pending()
             return
         while not self.stopping.isSet():
             #logging.debug("{0:s} thread is alive".format(self.label))
             try:
-                function, args, kwargs = self.q.get(timeout=self.timeout)
-                try:
-                    function(*args, **kwargs)
-                    logging.debug('{} has been run on the {} thread'.format(function, self.label))
-                except Exception as exc:
-                    logging.exception(exc)
-                    self.stop()
+                item = self.q.get(timeout=self.timeout)
+            except queue.Empty:
+                continue
+            if item is None:
+                # Wake-up call from stop
+                continue
+            function, args, kwargs, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = function(*args, **kwargs)
+                logging.debug('{} has been run on the {} thread'.format(function, self.label))
+            except Exception as exc:
+                logging.exception(exc)
+                future.set_exception(exc)
+                self.stop()
+            else:
+                future.set_result(result)
+        self._cancel_pending()
+        backend.co_uninitialize()
+
+    def _cancel_pending(self):
+        """
+        Description
+        -----------
+        Cancels every function still waiting on the queue once the thread has stopped, so that nothing waits on
+        them forever.
+
+        Returns
+        -------
+        None.
+
+        """
+        while True:
+            try:
+                item = self.q.get_nowait()
             except queue.Empty:
-                time.sleep(1)
-        pythoncom.CoUninitialize()
+                break
+            if item is not None:
+                item[3].cancel()
         
     def stop(self):
         """
@@ -130,6 +207,8 @@ class Hardware(threading.Thread):
         """
         logging.debug("Stopping {} thread".format(self.label))
         self.stopping.set()
+        # Wakes the run loop if this was not called from the thread itself
+        self.q.put(None)
         
     def check_connection(self):
         """
@@ -151,12 +230,14 @@ class Hardware(threading.Thread):
         """
         Description
         -----------
-        Resets the Hardware loop time to the specified value for all Hardware classes.
+        Resets the Hardware loop time to the specified value for all Hardware classes.  Threads wake up immediately
+        for new functions and for stop, so this only sets how often an idle thread checks whether it was stopped
+        by other means.
 
         Parameters
         ----------
         loop_time : INT or FLOAT
-            How quickly the queue will loop and check for new functions to execute, in seconds.
+            How often an idle thread checks whether it should stop, in seconds.
 
         Returns
         -------
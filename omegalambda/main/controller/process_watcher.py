@@ -0,0 +1,148 @@
+# Watches whether the Windows programs behind the hardware (MaxIm DL, TheSkyX, ASCOM Dome) are responding
+import time
+import logging
+import threading
+
+from . import backend
+
+
+class ProcessWatcher(threading.Thread):
+
+    def __init__(self, programs, interval=5, sampler=None, on_not_responding=None):
+        """
+        Description
+        -----------
+        Subclassed from threading.Thread.  Looks at the process list every interval seconds, in one go for all of
+        the programs, and keeps whether each one is responding.  For each program, the not_responding Event is set
+        as soon as it is seen to have stopped responding, and cleared when it is back, so that nothing else ever
+        has to start a process to check; the responsive Event is its opposite, for waiting until a program is back
+        (or has been restarted).  If on_not_responding is given, it is called (on this thread) at the same
+        moment, so that the program can be restarted straight away instead of whenever something next checks.
+
+        Parameters
+        ----------
+        programs : LIST
+            Names of the executables to watch, like "MaxIm_DL.exe".
+        interval : INT or FLOAT, optional
+            Seconds between looks at the process list.  The default is 5.
+        sampler : CALLABLE, optional
+            Function that takes the list of programs and returns the set of those that are responding.  The default
+            is None, which uses backend.running_programs.
+        on_not_responding : CALLABLE, optional
+            Function that takes the name of a program, called each time that program stops responding.  No samples
+            are taken until it returns.  The default is None.
+
+        Returns
+        -------
+        None.
+
+        """
+        super(ProcessWatcher, self).__init__(name='ProcessWatcher-Th', daemon=True)
+        self.programs = list(programs)
+        self.interval = interval
+        self.sampler = sampler or backend.running_programs
+        self.on_not_responding = on_not_responding
+        self.not_responding = {program: threading.Event() for program in self.programs}
+        self.responsive = {program: threading.Event() for program in self.programs}
+        for event in self.responsive.values():
+            event.set()
+        self.sampled = threading.Event()
+        self.sample_time = None
+        self.grace = {}
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def run(self):
+        logging.debug('Beginning process watching: {}'.format(', '.join(self.programs)))
+        while not self.stopping.isSet():
+            try:
+                self.sample()
+            except Exception:
+                logging.exception('Could not read the process list')
+            self.stopping.wait(timeout=self.interval)
+
+    def sample(self):
+        """
+        Description
+        -----------
+        Looks at the process list once and updates the events.  Programs within a restart grace period are taken
+        to be responding.
+
+        Returns
+        -------
+        None.
+
+        """
+        running = self.sampler(self.programs)
+        now = time.monotonic()
+        stopped = []
+        with self.lock:
+            for program in self.programs:
+                responding = program in running or self.grace.get(program, 0) > now
+                event = self.not_responding[program]
+                if responding and event.isSet():
+                    logging.info('{} is responding again'.format(program))
+                    event.clear()
+                    self.responsive[program].set()
+                elif not responding and not event.isSet():
+                    logging.error('{} is not responding'.format(program))
+                    self.responsive[program].clear()
+                    event.set()
+                    stopped.append(program)
+            self.sample_time = now
+        self.sampled.set()
+        if self.on_not_responding is not None:
+            for program in stopped:
+                try:
+                    self.on_not_responding(program)
+                except Exception:
+                    logging.exception('Could not restart {}'.format(program))
+
+    def responding(self, program, max_age=None):
+        """
+        Parameters
+        ----------
+        program : STR
+            Name of the executable.
+        max_age : INT or FLOAT, optional
+            Oldest sample to trust, in seconds.  The default is None, which is three intervals.  If the last sample
+            is older (like if this thread has stopped), the process list is checked directly instead.
+
+        Returns
+        -------
+        BOOL
+            Whether the program was responding at the last sample.
+
+        """
+        max_age = 3 * self.interval if max_age is None else max_age
+        if self.sample_time is None or time.monotonic() - self.sample_time > max_age:
+            logging.warning('No recent process sample, checking {} directly'.format(program))
+            return program in self.sampler([program])
+        return not self.not_responding[program].isSet()
+
+    def restarted(self, program, grace=60):
+        """
+        Description
+        -----------
+        Marks a program as just restarted: it is taken to be responding for the next grace seconds, while it starts
+        up, so that it is not restarted again before it has had the chance.
+
+        Parameters
+        ----------
+        program : STR
+            Name of the executable.
+        grace : INT or FLOAT, optional
+            Seconds to wait before watching it again.  The default is 60.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.lock:
+            self.grace[program] = time.monotonic() + grace
+            self.not_responding[program].clear()
+            self.responsive[program].set()
+
+    def stop(self):
+        self.stopping.set()
@@ -1,13 +1,12 @@
 import threading
 import logging
-import time
-import subprocess
-import pywintypes
-import win32com.client
+import math
+import datetime
 
 from ..common.util import conversion_utils
 from ..common.util import time_utils
 from .hardware import Hardware
+from . import backend
 
 
 class Telescope(Hardware):
@@ -26,6 +25,8 @@ class Telescope(Hardware):
         self.movement_lock = threading.Lock()
         self.last_slew_status = None
         self.status = True
+        # Ephemerides of the night's targets, so that their coordinates can be looked up instead of calculated
+        self.ephemerides = []
         # Threading event sets flags and allows threads to interact with each other
         super(Telescope, self).__init__(name='Telescope')       # Calls Hardware.__init__ with the name 'Telescope'
 
@@ -61,16 +62,50 @@ class Telescope(Hardware):
             True if successful, otherwise False.
         """
         try:
-            self.Telescope = win32com.client.Dispatch("ASCOM.SoftwareBisque.Telescope")
+            self.Telescope = backend.dispatch("ASCOM.SoftwareBisque.Telescope")
             self.Telescope.SlewSettleTime = 1
             self.check_connection()
-        except (AttributeError, pywintypes.com_error):
+        except (AttributeError, backend.com_error):
             logging.error('Could not connect to the telescope')
             return False
         else:
             logging.info('Telescope has successfully connected')
         return True
 
+    def _ephemeris_point(self, ra, dec, time=None, j2000=False):
+        """
+        Parameters
+        ----------
+        ra : FLOAT
+            Right ascension in hours.
+        dec : FLOAT
+            Declination in degrees.
+        time : CLASS INSTANCE OBJECT of DATETIME.DATETIME, optional
+            Time to look up.  The default is None, which is the current time.
+        j2000 : BOOL, optional
+            Whether ra and dec are J2000 coordinates, rather than apparent ones.  The default is False.
+
+        Returns
+        -------
+        EphemerisPoint or None
+            The ephemeris of the target at these coordinates (within 0.05 degrees, for apparent coordinates), or
+            None if they are not one of the night's targets or the time is outside of its ephemeris.
+
+        """
+        time = time or self.clock.now(datetime.timezone.utc)
+        for ephemeris in self.ephemerides:
+            if not ephemeris.covers(time):
+                continue
+            if j2000:
+                if (ephemeris.ra, ephemeris.dec) == (ra, dec):
+                    return ephemeris.at(time)
+                continue
+            point = ephemeris.at(time)
+            if abs(point.dec - dec) < 0.05 and \
+                    abs((point.ra - ra + 12) % 24 - 12) * 15 * math.cos(math.radians(dec)) < 0.05:
+                return point
+        return None
+
     def __check_coordinate_limit(self, ra, dec, time=None, verbose=0):
         """
 
@@ -93,12 +128,17 @@ class Telescope(Hardware):
             slew may proceed.
 
         """
-        lst = time_utils.get_local_sidereal_time(self.config_dict.site_longitude, time)
-        ha = (lst - ra) % 24 # in hours
-        if ha > 12:
-            ha -= 24
-        (az, alt) = conversion_utils.convert_radec_to_altaz(ra, dec, self.config_dict.site_latitude,
-                                                            self.config_dict.site_longitude, time)
+        time = time or self.clock.now(datetime.timezone.utc)
+        point = self._ephemeris_point(ra, dec, time)
+        if point is not None:
+            (ha, az, alt) = (point.ha, point.az, point.alt)
+        else:
+            lst = time_utils.get_local_sidereal_time(self.config_dict.site_longitude, time)
+            ha = (lst - ra) % 24 # in hours
+            if ha > 12:
+                ha -= 24
+            (az, alt) = conversion_utils.convert_radec_to_altaz(ra, dec, self.config_dict.site_latitude,
+                                                                self.config_dict.site_longitude, time)
 
         if verbose:
             logging.debug('Telescope Coordinates: ' + str(ra) + ' ' + str(dec))
@@ -125,7 +165,7 @@ class Telescope(Hardware):
         """
         while self.Telescope.Slewing:
             logging.debug("In _is_ready slew loop")
-            time.sleep(1)
+            self.clock.sleep(1)
         if not self.Telescope.Slewing:
             return
 
@@ -155,20 +195,20 @@ class Telescope(Hardware):
             # self.Telescope.Park()
             park_status = self.slewaltaz(self.config_dict.telescope_park_az, self.config_dict.telescope_park_alt, tracking=False,
                                          coord_check_delay_ms=coord_check_delay_ms)
-        except (AttributeError, pywintypes.com_error) as exc:
+        except (AttributeError, backend.com_error) as exc:
             logging.error("Could not park telescope.  Exception: {}".format(exc))
             return False
         if park_status == -100:
             self.slew_done.set()
             return park_status
-        time.sleep(1)
+        self.clock.sleep(1)
         t = 0
         while self.Telescope.Tracking:
             try:
                 self.Telescope.Tracking = False
-            except (AttributeError, pywintypes.com_error) as exc:
+            except (AttributeError, backend.com_error) as exc:
                 logging.error("Could not disable tracking.  Exception: {}".format(exc))
-            time.sleep(5)
+            self.clock.sleep(5)
             t += 5
             if t >= 25:
                 logging.critical("Failed to disable telescope tracking. "
@@ -178,7 +218,7 @@ class Telescope(Hardware):
         with self.movement_lock:
             try:
                 self.Telescope.Park()
-            except (AttributeError, pywintypes.com_error) as exc:
+            except (AttributeError, backend.com_error) as exc:
                 logging.error("Could not park telescope.  Exception: {}".format(exc))
                 return False
         logging.info('Telescope is parked, tracking off')
@@ -200,7 +240,7 @@ class Telescope(Hardware):
             with self.movement_lock:
                 self.Telescope.Unpark()
                 self.Telescope.Tracking = True
-        except (AttributeError, pywintypes.com_error) as e:
+        except (AttributeError, backend.com_error) as e:
             logging.error("Error unparking telescope or tracking")
             logging.exception(e)
             return False
@@ -231,8 +271,9 @@ class Telescope(Hardware):
 
         """
         self.slew_done.clear()
-        (ra, dec) = conversion_utils.convert_j2000_to_apparent(ra, dec)
         # Telescope internally uses apparent epoch coordinates, but we input in J2000
+        point = self._ephemeris_point(ra, dec, j2000=True)
+        (ra, dec) = (point.ra, point.dec) if point is not None else conversion_utils.convert_j2000_to_apparent(ra, dec)
         if self.__check_coordinate_limit(ra, dec, verbose=1) is False:
             logging.error("Coordinates are outside of physical slew limits.")
             self.last_slew_status = False
@@ -243,8 +284,8 @@ class Telescope(Hardware):
                     logging.info('Slewing to RA/Dec')
                     self.Telescope.SlewToCoordinatesAsync(ra, dec)
                     if coord_check_delay_ms > 0:
-                        time.sleep(coord_check_delay_ms/1000)
-                    time.sleep(1)
+                        self.clock.sleep(coord_check_delay_ms/1000)
+                    self.clock.sleep(1)
                     while self.Telescope.Slewing:
                         logging.debug("In slew loop")
                         in_limits = self.__check_coordinate_limit(self.Telescope.RightAscension, self.Telescope.Declination, verbose=1)
@@ -254,13 +295,13 @@ class Telescope(Hardware):
                                              ' aborting slew!')
                             self.Telescope.Tracking = False
                             self.last_slew_status = -100
-                            time.sleep(2)
+                            self.clock.sleep(2)
                             self.slew_done.set()
                             return -100
-                        time.sleep(.1)
+                        self.clock.sleep(.1)
                     self.Telescope.Tracking = tracking
-                    time.sleep(2)
-            except (AttributeError, pywintypes.com_error) as e:
+                    self.clock.sleep(2)
+            except (AttributeError, backend.com_error) as e:
                 logging.error("ASCOM Error slewing to target.  You may safely ignore this warning.")
                 logging.exception(e)
             self._is_ready()
@@ -276,7 +317,7 @@ class Telescope(Hardware):
             with self.movement_lock:
                 logging.info('Setting telescope tracking to {}'.format(str(tracking)))
                 self.Telescope.Tracking = tracking
-        except (AttributeError, pywintypes.com_error):
+        except (AttributeError, backend.com_error):
             logging.error('Could not set telescope tracking!')
         self._is_ready()
         return True
@@ -313,7 +354,7 @@ class Telescope(Hardware):
         try:
             with self.movement_lock:
                 self.Telescope.PulseGuide(direction_num, duration)
-        except (AttributeError, pywintypes.com_error):
+        except (AttributeError, backend.com_error):
             logging.error("Could not pulse guide")
             return False
         else:
@@ -384,6 +425,7 @@ class Telescope(Hardware):
             Whether or not slew was successful.
 
         """
+        time = time or self.clock.now(datetime.timezone.utc)
         (ra, dec) = conversion_utils.convert_altaz_to_radec(az, alt, self.config_dict.site_latitude,
                                                             self.config_dict.site_longitude, time)
         (ra, dec) = conversion_utils.convert_apparent_to_j2000(ra, dec)
@@ -423,9 +465,9 @@ class Telescope(Hardware):
             try: 
                 self.Telescope.Connected = False
                 self.live_connection.clear()
-                subprocess.call("taskkill /f /im TheSkyX.exe")
+                backend.kill_program('TheSkyX.exe')
                 # This is the only way it will actually disconnect from TheSkyX so far
-            except (AttributeError, pywintypes.com_error):
+            except (AttributeError, backend.com_error):
                 logging.error("Could not disconnect from telescope")
                 return False
             else:
@@ -1,21 +1,64 @@
-import time
 import logging
 import threading
 
+from ..common.util.clock import get_clock
+
+
+class HealthSnapshot:
+
+    def __init__(self, connected, crashed, telescope_coords_check):
+        """
+        Description
+        -----------
+        The state of the observatory at one moment, as seen by the thread monitor.  Never changed after it is made,
+        so it can be read from any thread without a lock.
+
+        Parameters
+        ----------
+        connected : DICT
+            Whether each hardware thread (by name, like "camera") has a live connection.
+        crashed : TUPLE
+            Names of the threads that have crashed.
+        telescope_coords_check : BOOL
+            Whether the telescope was last found within its physical limits.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.clock = get_clock()
+        self.time = self.clock.monotonic()
+        self.connected = connected
+        self.crashed = crashed
+        self.telescope_coords_check = telescope_coords_check
+
+    @property
+    def age(self):
+        return self.clock.monotonic() - self.time
+
 
 class Monitor(threading.Thread):
 
-    def __init__(self, th_dict):
+    devices = ('camera', 'telescope', 'dome', 'focuser', 'flatlamp')
+
+    def __init__(self, th_dict, interval=1):
         self.threadlist = th_dict
+        self.interval = interval
         self.run_th_monitor = threading.Event()
         self.run_th_monitor.set()
         self.crashed = []
         self.n_restarts = {'camera': 0, 'telescope': 0,'dome': 0, 'focuser': 0,
                            'flatlamp': 0,'conditions': 0, 'guider': 0,
-                           'focus_procedures': 0, 'gui': 0
+                           'focus_procedures': 0, 'gui': 0, 'plotter': 0
                            }
         self.telescope_coords_check = True
         self.skip_telescope_check = False
+        self.coords_check = None
+        self.coords_check_start = None
+        self.snapshot = None
+        # Snapshots age, and the checks repeat, in observing time, which a simulation can speed up
+        self.clock = get_clock()
         super(Monitor, self).__init__(name='Monitor', daemon=True)
 
     def run(self):
@@ -23,7 +66,7 @@ class Monitor(threading.Thread):
         Description
         -----------
         Constantly checks the inputted threads to see if they
-        are alive
+        are alive, and keeps a health snapshot up to date
 
         Returns
         -------
@@ -40,13 +83,65 @@ class Monitor(threading.Thread):
                         logging.error('{} thread has raised an exception'.format(self.threadlist[th_name].name))
                         logging.debug('List of crashed threads: {}'.format(self.crashed))
             if 'telescope' not in self.crashed and not self.skip_telescope_check:
-                self.threadlist['telescope'].onThread(self.threadlist['telescope'].check_current_coords)
-                time.sleep(2)
-                self.telescope_coords_check = self.threadlist['telescope'].status
-                self.threadlist['telescope'].slew_done.wait(timeout=60)
-                time.sleep(2)
-                self.telescope_coords_check = self.threadlist['telescope'].status
-            time.sleep(1)
+                self.update_coords_check()
+            self.snapshot = self.take_snapshot()
+            self.clock.sleep(self.interval)
+
+    def update_coords_check(self):
+        '''
+        Description
+        -----------
+        Collects the result of the last telescope coordinate check, if it has finished, and starts the next one.
+        The check resolves as soon as the telescope thread is free, i.e. after any slew in progress has finished,
+        so it is not waited on here, and the snapshots keep coming while the telescope is busy.
+
+        Returns
+        -------
+        None.
+        '''
+        if self.coords_check is not None:
+            if self.coords_check.done():
+                self.telescope_coords_check = self.coords_check.get(default=self.telescope_coords_check)
+            elif self.clock.monotonic() - self.coords_check_start > 60:
+                logging.warning('Timed out after 60 s waiting for the telescope coordinate check')
+            else:
+                return
+        telescope = self.threadlist['telescope']
+        self.coords_check = telescope.onThread(telescope.check_current_coords)
+        self.coords_check_start = self.clock.monotonic()
+
+    def take_snapshot(self):
+        '''
+        Returns
+        -------
+        HealthSnapshot
+            The current state of the hardware connections, threads and telescope limits.
+        '''
+        return HealthSnapshot(
+            connected={name: self.threadlist[name].live_connection.is_set() for name in self.devices
+                       if name in self.threadlist},
+            crashed=tuple(self.crashed),
+            telescope_coords_check=self.telescope_coords_check)
+
+    def health(self, max_age=None):
+        '''
+        Parameters
+        ----------
+        max_age : INT or FLOAT, optional
+            Oldest snapshot to accept, in seconds.  The default is None, which is five times the interval between
+            snapshots.
+
+        Returns
+        -------
+        HealthSnapshot or None
+            The latest health snapshot, or None if there is none as recent as max_age (like if the monitor has
+            stopped).
+        '''
+        snapshot = self.snapshot
+        max_age = 5 * self.interval if max_age is None else max_age
+        if snapshot is None or snapshot.age > max_age:
+            return None
+        return snapshot
 
 
 
@@ -6,12 +6,16 @@ from json.decoder import JSONDecodeError
 
 from ...logger.logger import Logger
 from ..observing.observation_run import ObservationRun
+from ..controller import backend
+from ..simulator.simulator import Simulator
+from . import warmup
 from ..common.IO.json_reader import Reader
 from ..common.IO import config_reader
 from ..common.datatype.object_reader import ObjectReader
 
 
-def run(obs_tickets, data=None, config=None, _filter=None, logger=None, shutdown=None, calibration=None, focus=None):
+def run(obs_tickets, data=None, config=None, _filter=None, logger=None, shutdown=None, calibration=None, focus=None,
+        simulate=False, speed=1):
     """
 
     Parameters
@@ -41,6 +45,11 @@ def run(obs_tickets, data=None, config=None, _filter=None, logger=None, shutdown
     focus : BOOL, optional
         Toggle to focus on target or not.  The default is None, in which case True will be passed in via argparse,
         so focusing will be enabled.
+    simulate : BOOL, optional
+        Toggle to run on the simulated hardware instead of the real hardware.  The default is False.
+    speed : INT or FLOAT, optional
+        How many times faster than real time the simulated hardware should run.  Only used if simulate is True.  The
+        default is 1.
 
     Returns
     -------
@@ -105,9 +114,23 @@ def run(obs_tickets, data=None, config=None, _filter=None, logger=None, shutdown
             logging.debug('Folder already exists: {:s}'.format(fol))
     logging.info('New directories for tonight\'s observing have been made!')
         
+    # Compiles the numba kernels before any hardware starts, so that the first slew or focus does not have to wait
+    warmup.warm_up()
+
+    simulator = None
+    if simulate:
+        # Must be set up before the hardware classes are created, since they look for their devices on creation
+        simulator = Simulator(speed=speed)
+        simulator.start()
+        backend.set_simulator(simulator)
+
     run_object = ObservationRun(observation_request_list, folder, shutdown, calibration, focus)
     run_object.observe()
 
+    if simulator:
+        simulator.stop()
+        backend.set_simulator(None)
+
     log_object.stop()
 
 
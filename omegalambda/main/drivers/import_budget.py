@@ -0,0 +1,59 @@
+# Import-time budget for the parts of the package that should start instantly
+import sys
+import logging
+import subprocess
+
+# Seconds each module may take to import in a fresh interpreter, including its parents
+BUDGETS = {
+    'omegalambda': 0.3,
+    'omegalambda.__main__': 0.3,
+    'omegalambda.main.common.datatype.object_reader': 0.5,
+    'omegalambda.main.common.datatype.observation_ticket': 0.5,
+}
+
+
+def import_time(module):
+    """
+    Parameters
+    ----------
+    module : STR
+        Full name of the module, like "omegalambda.main.common.datatype.observation_ticket".
+
+    Returns
+    -------
+    FLOAT
+        Seconds it takes to import the module in a new interpreter, so that nothing is already imported.
+
+    """
+    code = 'import time; t = time.perf_counter(); import {}; print(time.perf_counter() - t)'.format(module)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def check_import_budget(budgets=None):
+    """
+    Description
+    -----------
+    Measures how long each module takes to import, and logs an error for every module that is over its budget.
+
+    Parameters
+    ----------
+    budgets : DICT, optional
+        Seconds allowed for each module.  The default is None, which uses BUDGETS.
+
+    Returns
+    -------
+    BOOL
+        True if every module imported within its budget, otherwise False.
+
+    """
+    budgets = budgets or BUDGETS
+    ok = True
+    for module, budget in budgets.items():
+        seconds = import_time(module)
+        if seconds > budget:
+            logging.error('Importing {} took {:.3f} s, over its budget of {:.3f} s'.format(module, seconds, budget))
+            ok = False
+        else:
+            logging.info('Importing {} took {:.3f} s (budget {:.3f} s)'.format(module, seconds, budget))
+    return ok
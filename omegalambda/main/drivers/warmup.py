@@ -0,0 +1,114 @@
+# Compiles every numba kernel up front, or loads it from numba's on-disk cache, so nothing compiles mid-observation
+import time
+import logging
+import datetime
+import numpy as np
+from numba.core.registry import CPUDispatcher
+
+from ..common.util import time_utils, conversion_utils, filereader_utils
+
+
+def kernels():
+    """
+    Returns
+    -------
+    DICT
+        Every numba kernel in the util modules, keyed by "module.function".
+
+    """
+    found = {}
+    for module in (time_utils, conversion_utils, filereader_utils):
+        for name, obj in vars(module).items():
+            if isinstance(obj, CPUDispatcher) and obj.py_func.__module__ == module.__name__:
+                found['{}.{}'.format(module.__name__.rsplit('.', 1)[-1], name)] = obj
+    return found
+
+
+def _star_frame(dtype):
+    """
+    Returns
+    -------
+    stars : NUMPY STRUCTURED ARRAY
+        A few stars, in the format returned by filereader_utils.findstars.
+    data : NUMPY ARRAY
+        A small frame with those stars on it, in the given data type.
+
+    """
+    stars = np.zeros(3, dtype=[('x', np.float64), ('y', np.float64), ('peak', np.float64)])
+    stars['x'] = (40, 100, 160)
+    stars['y'] = (50, 120, 70)
+    stars['peak'] = 5000
+    yy, xx = np.mgrid[:200, :200]
+    data = np.full((200, 200), 1000.)
+    for star in stars:
+        data += (star['peak'] - 1000) * np.exp(-((xx - star['x'])**2 + (yy - star['y'])**2) / (2 * 2.5**2))
+    return stars, data.astype(dtype)
+
+
+def _sidereal_time():
+    now = datetime.datetime.now(datetime.timezone.utc)
+    jd = time_utils.convert_to_jd_utc(now)
+    time_utils.get_local_sidereal_time(-77.3, now)
+    time_utils.get_local_sidereal_time_array(-77.3, jd + np.arange(2) / 24)
+
+
+def _coordinates():
+    now = datetime.datetime.now(datetime.timezone.utc)
+    jd = time_utils.convert_to_jd_utc(now)
+    conversion_utils.convert_radec_to_altaz(12.0, 30.0, 38.8, -77.3, now)
+    conversion_utils.convert_altaz_to_radec(180.0, 45.0, 38.8, -77.3, now)
+    conversion_utils.convert_radec_to_altaz_array(np.array([12.0, 18.0]), np.array([30.0, -10.0]), 38.8, -77.3,
+                                                  jd + np.arange(2) / 24)
+    conversion_utils.convert_altaz_to_radec_array(np.array([180.0, 90.0]), np.array([45.0, 30.0]), 38.8, -77.3,
+                                                  jd + np.arange(2) / 24)
+    conversion_utils.airmass(45.0)
+    conversion_utils.sexagesimal(12.5)
+    time_utils.sexagesimal(12.5)
+
+
+def _fwhm():
+    # MaxIm images are read as unsigned 16 bit integers; float images are also supported
+    for dtype in (np.uint16, np.float32, np.float64):
+        stars, data = _star_frame(dtype)
+        filereader_utils._get_all_fwhm(stars, data, 1000., 30, 0.5, return_profiles=True)
+    filereader_utils.gaussianfit(np.linspace(-5, 5, 11), 1., 0., 1.)
+
+
+def warm_up():
+    """
+    Description
+    -----------
+    Runs every numba kernel once, with the argument types the observing code uses, so that each one is compiled (or
+    loaded from numba's on-disk cache, if it was compiled before) now, instead of stalling the first coordinate check,
+    header, or focus of the night.  The time taken is logged for each group of kernels.
+
+    Returns
+    -------
+    report : DICT
+        "seconds" : time taken by each group of kernels, "compiled" and "cached" : the kernels that had to be
+        compiled and the kernels that were loaded from the cache.
+
+    """
+    steps = {'sidereal time': _sidereal_time, 'coordinate conversions': _coordinates, 'fwhm': _fwhm}
+    seconds = {}
+    start = time.perf_counter()
+    for name, step in steps.items():
+        t = time.perf_counter()
+        step()
+        seconds[name] = time.perf_counter() - t
+        logging.info('Numba warm-up: {} kernels ready in {:.2f} s'.format(name, seconds[name]))
+    compiled = []
+    cached = []
+    for name, kernel in kernels().items():
+        if not kernel.signatures:
+            # Only ever called from inside other kernels, so it was compiled into them
+            continue
+        if sum(kernel.stats.cache_misses.values()):
+            compiled.append(name)
+        else:
+            cached.append(name)
+    logging.info('Numba warm-up finished in {:.2f} s: {} kernels compiled, {} loaded from the cache'.format(
+        time.perf_counter() - start, len(compiled), len(cached)))
+    if compiled:
+        logging.debug('Compiled: {}'.format(', '.join(compiled)))
+    return {'seconds': seconds, 'compiled': compiled, 'cached': cached}
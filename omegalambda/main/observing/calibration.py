@@ -1,9 +1,10 @@
 # Darks & Flats automation
 import os
+import re
 import threading
 import logging
 
-from ..common.IO import config_reader
+from ..common.IO import config_reader, run_journal
 from ..common.util import filereader_utils
 from ..common.datatype import filter_wheel
 from ..controller.hardware import Hardware
@@ -71,38 +72,56 @@ class Calibration(Hardware):
 
         """
         self.flats_done.clear()
-        self.flatlamp.onThread(self.flatlamp.turn_on)
-        lamp = self.flatlamp.lamp_done.wait(timeout=60)
-        if not lamp:
-            return False
         # ticket.filter should be either a string or a list of strings
         filters = ticket.filter if type(ticket.filter) is list \
             else [ticket.filter] if type(ticket.filter) is str else None
         if not filters:
             logging.error('Wrong data type for filter(s) argument')
             return False
-        if not os.path.exists(os.path.join(self.image_directories[ticket], 'Flats_{}'.format(ticket.name))):
-            os.mkdir(os.path.join(self.image_directories[ticket], 'Flats_{}'.format(ticket.name)))
-        else:
-            logging.info('Flat folder already exists!  Assuming they have been collected, & aborting flat collection.')
-            self.flatlamp.onThread(self.flatlamp.turn_off)
-            self.flatlamp.lamp_done.wait(timeout=60)
+        folder = os.path.join(self.image_directories[ticket], 'Flats_{}'.format(ticket.name))
+        os.makedirs(folder, exist_ok=True)
+        journal = run_journal.get_run_journal(self.image_directories[ticket])
+        self._adopt_images(journal, ticket.name, 'flat', folder,
+                           r'Flat_(?P<exp_time>[\d.]+)s_(?P<filter>.+?)-(?P<index>\d+)-final\.fits$')
+        remaining = []
+        for f in filters:
+            done = journal.completed(ticket.name, 'flat', f)
+            if done:
+                # The darks for the flats are taken at the exposure time the final flats were taken with
+                self.filter_exp_times[f] = done[-1].exp_time
+            if len({entry.index for entry in done}) < self.config_dict.calibration_num:
+                remaining.append(f)
+        if not remaining:
+            logging.info('Flats have already been collected for {}, skipping flat collection.'.format(ticket.name))
             self.flats_done.set()
             return True
-        for f in filters:
+        lamp = self.flatlamp.onThread(self.flatlamp.turn_on).get(timeout=60, default=False)
+        if not lamp:
+            return False
+        for f in remaining:
             j = 0
             scaled = False
+            taken = {entry.index for entry in journal.completed(ticket.name, 'flat', f)}
+            if taken:
+                # Fills in the flats an interrupted run is missing, at the exposure time its final flats were taken with
+                scaled = True
+                logging.info('{} {} flats already taken, taking the rest.'.format(len(taken), f))
             while j < self.config_dict.calibration_num:
+                if j + 1 in taken:
+                    j += 1
+                    continue
                 image_name = 'Flat_{0:.3f}s_{1:s}-{2:04d}.fits'.format(self.filter_exp_times[f], str(f).upper(), j + 1)
                 if scaled:
                     image_name = image_name.replace('.fits', '-final.fits')
-                self.camera.onThread(self.camera.expose, self.filter_exp_times[f], self.filterwheel_dict[f], 
-                                     save_path=os.path.join(self.image_directories[ticket],
-                                                            r'Flats_{}'.format(ticket.name),
-                                                            image_name), type='light')
-                self.camera.image_done.wait()
-                median = filereader_utils.mediancounts(os.path.join(
-                    self.image_directories[ticket], r'Flats_{}'.format(ticket.name), image_name))
+                    # Only the final flats are kept, so only they go in the journal
+                    journal.plan(ticket.name, 'flat', f, self.filter_exp_times[f], j + 1,
+                                 os.path.join(folder, image_name))
+                    journal.start(os.path.join(folder, image_name))
+                saved = self.camera.onThread(self.camera.expose, self.filter_exp_times[f], self.filterwheel_dict[f],
+                                             save_path=os.path.join(folder, image_name), type='light').get()
+                if scaled:
+                    journal.finish(os.path.join(folder, image_name), bool(saved))
+                median = filereader_utils.mediancounts(os.path.join(folder, image_name))
                 if scaled is False and median < self.config_dict.saturation:
                     # Calculate exposure time
                     scale_factor = 0.6*self.config_dict.saturation / median
@@ -121,14 +140,12 @@ class Calibration(Hardware):
                         scaled = True
                 else:
                     j += 1
-        files = os.listdir(os.path.join(self.image_directories[ticket], 'Flats_{}'.format(ticket.name)))
-        for file in files:
-            file = os.path.join(self.image_directories[ticket], 'Flats_{}'.format(ticket.name), file)
+        for file in os.listdir(folder):
+            file = os.path.join(folder, file)
             if 'final' not in str(file):
                 os.remove(file)
         logging.info('Test flats removed!')
-        self.flatlamp.onThread(self.flatlamp.turn_off)
-        self.flatlamp.lamp_done.wait(timeout=60)
+        self.flatlamp.onThread(self.flatlamp.turn_off).get(timeout=60)
         self.flats_done.set()
         return True
         
@@ -160,39 +177,59 @@ class Calibration(Hardware):
         if not exp_times:
             logging.error('Wrong data type for exp_time(s) argument')
             return False
-        if not os.path.exists(os.path.join(self.image_directories[ticket], 'Darks_{}'.format(ticket.name))):
-            os.mkdir(os.path.join(self.image_directories[ticket], 'Darks_{}'.format(ticket.name)))
-        else:
-            logging.info('Dark folder already exists!  Assuming they have been collected, & aborting dark collection...')
-            self.darks_done.set()
-            return True
-        for f in filters:
-            for j in range(self.config_dict.calibration_num):
-                image_name = 'Dark_{0:.3f}s-{1:04d}.fits'.format(self.filter_exp_times[f], j + 1)
-                match = False
-                for name in os.listdir(os.path.join(self.image_directories[ticket], 'Darks_{}'.format(ticket.name))):
-                    if name == image_name:
-                        match = True
-                if match:
-                    continue
-                self.camera.onThread(self.camera.expose, self.filter_exp_times[f], 4,
-                                     save_path=os.path.join(self.image_directories[ticket], r'Darks_{}'.format(ticket.name),
-                                                            image_name), type='dark')
-                self.camera.image_done.wait()
-
-        for exp_time in exp_times:
+        folder = os.path.join(self.image_directories[ticket], 'Darks_{}'.format(ticket.name))
+        os.makedirs(folder, exist_ok=True)
+        journal = run_journal.get_run_journal(self.image_directories[ticket])
+        self._adopt_images(journal, ticket.name, 'dark', folder, r'Dark_(?P<exp_time>[\d.]+)s-(?P<index>\d+)\.fits$')
+        # Darks for the flats' exposure times, then for the ticket's own; any already taken are skipped
+        done = {(entry.exp_time, entry.index) for entry in journal.completed(ticket.name, 'dark')}
+        for exp_time in [self.filter_exp_times[f] for f in filters] + exp_times:
             for k in range(self.config_dict.calibration_num):
-                image_name = 'Dark_{0:.3f}s-{1:04d}.fits'.format(exp_time, k + 1)
-                match = False
-                for name in os.listdir(os.path.join(self.image_directories[ticket], 'Darks_{}'.format(ticket.name))):
-                    if name == image_name:
-                        match = True
-                if match:
+                if (round(exp_time, 3), k + 1) in done:
                     continue
-                self.camera.onThread(self.camera.expose, exp_time, 4,
-                                     save_path=os.path.join(self.image_directories[ticket],
-                                                            r'Darks_{}'.format(ticket.name),
-                                                            image_name), type='dark')
-                self.camera.image_done.wait()
+                image_name = 'Dark_{0:.3f}s-{1:04d}.fits'.format(exp_time, k + 1)
+                journal.plan(ticket.name, 'dark', None, exp_time, k + 1, os.path.join(folder, image_name))
+                journal.start(os.path.join(folder, image_name))
+                saved = self.camera.onThread(self.camera.expose, exp_time, 4,
+                                             save_path=os.path.join(folder, image_name), type='dark').get()
+                journal.finish(os.path.join(folder, image_name), bool(saved))
+                if saved:
+                    done.add((round(exp_time, 3), k + 1))
         self.darks_done.set()
         return True
+
+    def _adopt_images(self, journal, name, kind, folder, pattern):
+        """
+        Description
+        -----------
+        Adds calibration images saved before the run journal was kept to the journal, so that they are not taken
+        again.  Only looks at the folder if the journal has none of this kind for the target, so it only happens once.
+
+        Parameters
+        ----------
+        journal : RunJournal
+            Journal of the ticket's image directory.
+        name : STR
+            Name of the target.
+        kind : STR
+            "flat" or "dark".
+        folder : STR
+            Folder the images were saved to.
+        pattern : STR
+            Regular expression for the image names, with "exp_time" and "index" groups, and a "filter" group for flats.
+
+        Returns
+        -------
+        None.
+
+        """
+        if journal.completed(name, kind):
+            return
+        for fname in os.listdir(folder):
+            if m := re.match(pattern, fname):
+                _filter = m.groupdict().get('filter')
+                if _filter is not None:
+                    # File names have the filter in upper case
+                    _filter = {f.upper(): f for f in self.filterwheel_dict}.get(_filter, _filter)
+                journal.plan(name, kind, _filter, float(m.group('exp_time')), int(m.group('index')),
+                             os.path.join(folder, fname), status='done')
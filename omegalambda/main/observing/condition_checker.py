@@ -13,32 +13,47 @@ import datetime
 import json
 import time
 import numpy as np
-import matplotlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-from PIL import Image
-
-from ..common.util import time_utils, conversion_utils
+from ..common.util import time_utils, conversion_utils, plot_utils, web_cache, weather_utils
+from ..common.util.clock import get_clock
 from ..common.IO import config_reader
-
-# Use the non-interactive Agg backend, which does not have the memory leak problems associated with the deafult
-# TkAgg backend upon closing plots.  This is necessary for long runs where we expect to generate hundreds if not
-# thousands of diagnostic plots in the background.
-matplotlib.use('Agg', force=True)
-from matplotlib import pyplot as plt
-from matplotlib import colors as mplc
+from ..common.IO.weather_store import WeatherStore
+from ..controller import backend
+
+_connection_errors = (urllib3.exceptions.MaxRetryError, urllib3.exceptions.HTTPError, urllib3.exceptions.TimeoutError,
+                      urllib3.exceptions.InvalidHeader, requests.exceptions.ConnectionError,
+                      requests.exceptions.Timeout, requests.exceptions.HTTPError)
+
+
+def _plot_cloud_cover(target_path, img_internal, percent_cover):
+    """
+    Draws the cropped satellite image used for the cloud coverage check, and saves it to target_path.
+    """
+    from matplotlib import colors as mplc
+    colornorm = mplc.Normalize(vmin=0, vmax=256)
+    fig = plot_utils.new_figure()
+    ax = fig.add_subplot()
+    plot = ax.imshow(img_internal, cmap='PuOr', norm=colornorm)
+    pos = ax.get_position()
+    cbar_ax = fig.add_axes([0.83, pos.y0, 0.025, pos.height])
+    fig.colorbar(plot, cax=cbar_ax)
+    ax.set_title('Percent Cover: {:.2f}%'.format(percent_cover))
+    fig.savefig(target_path)
 
 
 class Conditions(threading.Thread):
 
-    def __init__(self, plot_lock=None):
+    def __init__(self, plotter=None):
         """
         Subclassed from threading.Thread.  Conditions periodically checks the humidity, wind, sun position, clouds, and
-        rain while observing.
+        rain while observing.  Every check is recorded in a weather store, and the recent trends are used to set
+        weather_warning shortly before the weather is expected to become too poor, ahead of weather_alert.
 
         Parameters
         ----------
-        plot_lock : threading.Lock
-            A thread lock to prevent multiple matplotlib plots from being opened simultaneously across different threads.
+        plotter : PlotRenderer, optional
+            Renders the cloud coverage plots in the background.  If None, plots are drawn on this thread.
 
         Returns
         -------
@@ -50,11 +65,15 @@ class Conditions(threading.Thread):
         self.weather = None
         self.radar = None
         self.weather_alert = threading.Event()
+        self.weather_warning = threading.Event()
         self.connection_alert = threading.Event()
         self.stop = threading.Event()
-        self.plot_lock = plot_lock
+        self.plotter = plotter
         # Threading events to set flags and interact between threads
         self.config_dict = config_reader.get_config()  # Global config dictionary
+        self.clock = get_clock()
+        # Any reliable site, to check the internet connection
+        self.internet_url = 'http://google.com'
         # GMU COS Website for temperature, humidity and wind
         self.weather_url = 'http://weather.cos.gmu.edu/Current_Monitor.htm'
         # weather.gov API for backup temperature, humidity and wind
@@ -63,16 +82,46 @@ class Conditions(threading.Thread):
         # Weather.com radar for rain
         self.rain_url = 'https://weather.com/weather/radar/interactive/' + \
                         'l/b63f24c17cc4e2d086c987ce32b2927ba388be79872113643d2ef82b2b13e813'
+        # Weather.com radar tiles and SSEC GOES satellite images
+        self.tile_url = 'https://api.weather.com/v3/TileServer/tile?product=twcRadarMosaic&ts={ts}&xyz={xyz}' + \
+                        '&apiKey={key}'
+        self.cloud_url = 'https://www.ssec.wisc.edu/data/geo/images/goes-16/animation_images/' + \
+                         '{satellite}_{year}{day}_{time}_{band}_conus.gif'
+        # One pooled, caching session for every source, kept from one check (and condition checker) to the next
+        self.web = web_cache.get_web_cache(self.config_dict.user_agent)
+        # The radar page is only needed for its API key, which lasts for hours.  Radar tiles and satellite images
+        # are published every 5 minutes and never change afterwards, so each is only downloaded once.
+        self.api_key_ttl = 6 * 60 * 60
+        self.image_ttl = 30 * 60
+        # Percent of each radar tile showing rain, and of the sky around Fairfax covered by clouds, at the last check
+        self.rain_coverage = None
+        self.cloud_coverage = None
+        # Each source is fetched on its own thread, and has weather_timeout seconds to report
+        self.deadlines = {'weather': self.config_dict.weather_timeout, 'radar': self.config_dict.weather_timeout,
+                          'clouds': self.config_dict.weather_timeout}
+        self.fetch_pool = ThreadPoolExecutor(max_workers=len(self.deadlines), thread_name_prefix='Weather-Th')
+        self.tile_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='RadarTile-Th')
+        self.fetches = {}
         self.sun = False
         self.temperature = None
         current_directory = os.path.abspath(os.path.dirname(__file__))
         self.weather_directory = os.path.join(current_directory, r'..', r'..', r'resources', r'weather_status')
+        self.store = WeatherStore(os.path.join(self.weather_directory, r'weather.sqlite'))
+        # Trends are fit to the last half hour of checks, and warned about if they cross a limit within two checks
+        self.trend_window = 30 * 60
+        self.warning_horizon = 2 * self.config_dict.weather_freq * 60
+        # Time (seconds since the epoch) at which the weather is expected to become too poor, while weather_warning
+        self.warning_time = None
+        # On the simulator, the weather may come from its fake weather server instead
+        simulator = backend.get_simulator()
+        if simulator is not None and simulator.weather is not None:
+            simulator.weather.point(self)
 
     def run(self):
         """
         Description
         -----------
-        Calls self.weather_check and self.rain_check once every 15 minutes.  If conditions are clear, does nothing.
+        Calls self.check_conditions once every weather_freq minutes.  If conditions are clear, does nothing.
         If conditions are bad, stops observation_run and shuts down the observatory.
 
         Returns
@@ -82,17 +131,12 @@ class Conditions(threading.Thread):
         """
         last_rain = None
         connection_failures = 0
+        run_start = self.clock.time()
         if not self.check_internet():
             logging.error("Your internet connection requires attention.")
             return
         while not self.stop.isSet():
-            (humidity, wind, rain, temperature) = self.weather_check()
-            self.temperature = temperature
-            radar = self.rain_check()
-            sun_elevation = conversion_utils.get_sun_elevation(datetime.datetime.now(datetime.timezone.utc),
-                                                               self.config_dict.site_latitude,
-                                                               self.config_dict.site_longitude)
-            cloud_cover = self.cloud_check()
+            (reasons, rain) = self.check_conditions(last_rain)
             if self.connection_alert.isSet():
                 connection_failures += 1
                 if connection_failures >= 2:
@@ -100,35 +144,219 @@ class Conditions(threading.Thread):
                     logging.critical("A connection error was encountered and the weather can no longer be monitored. "
                                      "Shutting down for safety.")
                     connection_failures = 0
-                    self.stop.wait(timeout=self.config_dict.weather_freq * 60)
+                    self.clock.wait(self.stop, self.config_dict.weather_freq * 60)
                     self.connection_alert.clear()
                     continue
-            if humidity is None or wind is None:
-                logging.warning('Could not retrieve humidity or wind values...it may be unsafe to continue observing.')
-            if (humidity is None or humidity >= self.config_dict.humidity_limit) or \
-                    (wind is None or wind >= self.config_dict.wind_limit) or \
-                    (rain not in (None, 0) and last_rain is not None and last_rain != rain) or \
-                    (radar is True) or (sun_elevation >= (-5)) or (cloud_cover is True):
-                self.weather_alert.set()
-                # -12 degrees: nautical twilight, adjust slightly to allow observations to start earlier
-                self.sun = (sun_elevation >= (-5))
-                message = ""
-                message += "| Humidity |" if (humidity is None or humidity >= self.config_dict.humidity_limit) else ""
-                message += "| Wind |" if (wind is None or wind >= self.config_dict.wind_limit) else ""
-                message += "| Rain |" if (rain not in (None, 0) and last_rain is not None and last_rain != rain) else ""
-                message += "| Nearby Rain |" if radar else ""
-                message += "| Sun Elevation |" if self.sun else ""
-                message += "| Clouds |" if cloud_cover else ""
-                logging.critical("Weather conditions have become too poor for continued observing. "
-                                 "Reason(s) for weather alert: {}".format(message))
-            else:
+            if not reasons:
                 logging.debug("Condition checker is alive: Last check false")
                 self.weather_alert.clear()
             last_rain = rain
-            self.stop.wait(timeout=self.config_dict.weather_freq*60)
+            self.clock.wait(self.stop, self.config_dict.weather_freq*60)
+        self.fetch_pool.shutdown(wait=False)
+        self.tile_pool.shutdown(wait=False)
+        summary = self.store.summary(run_start, self.clock.time())
+        if summary['checks']:
+            logging.info('Weather over this run: {} checks, {} with a weather alert.  Humidity {}%, wind {} mph, '
+                         'clouds {}% (min/mean/max)'.format(summary['checks'], summary['alerts'],
+                                                            *(self._min_mean_max(summary[column]) for column in
+                                                              ('humidity', 'wind', 'cloud_percent'))))
+        self.store.close()
 
     @staticmethod
-    def check_internet():
+    def _min_mean_max(aggregate):
+        if aggregate['mean'] is None:
+            return '-'
+        return '{min:.0f}/{mean:.0f}/{max:.0f}'.format(**aggregate)
+
+    def check_conditions(self, last_rain=None, now=None):
+        """
+        Description
+        -----------
+        Runs one weather check.  The weather, radar and cloud checks run at the same time, each with its own deadline
+        (self.deadlines), while the sun elevation is calculated here.  As soon as the sources that have reported show
+        that it is unsafe to observe, weather_alert is set, without waiting for the rest.  A source that misses its
+        deadline, or is still running from the last check, counts as unavailable.
+
+        Parameters
+        ----------
+        last_rain : FLOAT, optional
+            Rain total from the previous check.  The default is None.
+        now : datetime.datetime, optional
+            Time (timezone aware) to find the sun elevation for.  The default is None, which uses the current time.
+
+        Returns
+        -------
+        reasons : LIST
+            Reasons why it is unsafe to observe, like "Humidity" or "Clouds".  Empty if it is safe.
+        rain : FLOAT
+            Current rain total, or None if it is not known.
+
+        """
+        now = now or self.clock.now(datetime.timezone.utc)
+        checks = {'weather': self.weather_check, 'radar': self.rain_check, 'clouds': self.cloud_check}
+        unavailable = {'weather': (None, None, None, None), 'radar': None, 'clouds': None}
+        start = time.monotonic()
+        deadlines = {}
+        readings = {}
+        for (name, check) in checks.items():
+            previous = self.fetches.get(name)
+            if previous is not None and not previous.done():
+                logging.warning('The {} check from the last cycle is still running.  Skipping it.'.format(name))
+                readings[name] = unavailable[name]
+                continue
+            deadline = start + self.deadlines[name]
+            self.fetches[name] = self.fetch_pool.submit(check, deadline)
+            deadlines[self.fetches[name]] = (name, deadline)
+        readings['sun'] = conversion_utils.get_sun_elevation(now, self.config_dict.site_latitude,
+                                                             self.config_dict.site_longitude)
+        pending = set(deadlines)
+        reasons = self._unsafe_reasons(readings, last_rain)
+        while pending and not reasons:
+            timeout = min(deadline for (_, deadline) in (deadlines[future] for future in pending)) - time.monotonic()
+            (done, pending) = wait(pending, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = deadlines[future][0]
+                if future.exception() is not None:
+                    logging.error('The {} check failed'.format(name), exc_info=future.exception())
+                    self.connection_alert.set()
+                    readings[name] = unavailable[name]
+                else:
+                    readings[name] = future.result()
+            for future in [future for future in pending if deadlines[future][1] <= time.monotonic()]:
+                name = deadlines[future][0]
+                logging.warning('The {} check did not report within {} seconds'.format(name, self.deadlines[name]))
+                self.connection_alert.set()
+                readings[name] = unavailable[name]
+                pending.discard(future)
+            reasons = self._unsafe_reasons(readings, last_rain)
+        logging.debug('Weather check took {:.2f} s'.format(time.monotonic() - start))
+
+        rain = None
+        if 'weather' in readings:
+            (humidity, wind, rain, temperature) = readings['weather']
+            self.temperature = temperature
+            if humidity is None or wind is None:
+                logging.warning('Could not retrieve humidity or wind values...it may be unsafe to continue observing.')
+        timestamp = now.timestamp()
+        self._record(timestamp, readings, bool(reasons))
+        if reasons:
+            self.weather_warning.clear()
+            self.warning_time = None
+            self.weather_alert.set()
+            # -12 degrees: nautical twilight, adjust slightly to allow observations to start earlier
+            self.sun = 'Sun Elevation' in reasons
+            if pending:
+                logging.debug('Weather alert raised before the {} check(s) reported'.format(
+                    ', '.join(deadlines[future][0] for future in pending)))
+            logging.critical("Weather conditions have become too poor for continued observing. "
+                             "Reason(s) for weather alert: {}".format(''.join('| {} |'.format(reason)
+                                                                             for reason in reasons)))
+        else:
+            self._forecast(timestamp)
+        return reasons, rain
+
+    def _record(self, timestamp, readings, alert):
+        """
+        Description
+        -----------
+        Adds one check's readings to the weather store.  Sources that did not report are stored as missing.
+
+        Parameters
+        ----------
+        timestamp : FLOAT
+            Time of the check, in seconds since the epoch.
+        readings : DICT
+            Results of the checks that reported, as in check_conditions.
+        alert : BOOL
+            Whether this check raised the weather alert.
+
+        Returns
+        -------
+        None.
+
+        """
+        (humidity, wind, rain, temperature) = readings.get('weather') or (None, None, None, None)
+        rain_percent = float(np.max(self.rain_coverage)) if readings.get('radar') is not None and \
+            self.rain_coverage is not None else None
+        cloud_percent = self.cloud_coverage if readings.get('clouds') is not None else None
+        self.store.append(timestamp, alert=alert, humidity=humidity, wind=wind, temperature=temperature, rain=rain,
+                          rain_percent=rain_percent, cloud_percent=cloud_percent,
+                          sun_elevation=float(readings['sun']))
+
+    def _forecast(self, timestamp):
+        """
+        Description
+        -----------
+        Fits the trend of each reading over the last self.trend_window seconds, and sets weather_warning if any of
+        them is expected to reach its limit within self.warning_horizon seconds (or clears it if none are).
+
+        Parameters
+        ----------
+        timestamp : FLOAT
+            Time of the latest check, in seconds since the epoch.
+
+        Returns
+        -------
+        None.
+
+        """
+        limits = {'Humidity': ('humidity', self.config_dict.humidity_limit),
+                  'Wind': ('wind', self.config_dict.wind_limit),
+                  'Nearby Rain': ('rain_percent', self.config_dict.rain_percent_limit),
+                  'Sun Elevation': ('sun_elevation', -5),
+                  'Clouds': ('cloud_percent', self.config_dict.cloud_cover_limit)}
+        history = self.store.query(timestamp - self.trend_window, timestamp,
+                                   columns=[column for (column, _) in limits.values()])
+        crossings = {}
+        for (reason, (column, limit)) in limits.items():
+            crossing = weather_utils.forecast_crossing(history['time'], history[column], limit)
+            if crossing is not None and crossing - timestamp <= self.warning_horizon:
+                crossings[reason] = crossing
+        if crossings:
+            self.warning_time = min(crossings.values())
+            self.weather_warning.set()
+            logging.warning('Weather conditions are expected to become too poor for observing in {:.0f} minutes. '
+                            'Reason(s) for weather warning: {}'.format(
+                                max(self.warning_time - timestamp, 0) / 60,
+                                ''.join('| {} |'.format(reason) for reason in crossings)))
+        elif self.weather_warning.isSet():
+            logging.info('Weather warning cleared')
+            self.weather_warning.clear()
+            self.warning_time = None
+
+    def _unsafe_reasons(self, readings, last_rain):
+        """
+        Parameters
+        ----------
+        readings : DICT
+            Results of the checks that have reported so far, keyed by "weather", "radar", "clouds" and "sun".
+        last_rain : FLOAT
+            Rain total from the previous check.
+
+        Returns
+        -------
+        reasons : LIST
+            Reasons why it is unsafe to observe, judging only by the checks that have reported.
+
+        """
+        reasons = []
+        if 'weather' in readings:
+            (humidity, wind, rain, _) = readings['weather']
+            if humidity is None or humidity >= self.config_dict.humidity_limit:
+                reasons.append('Humidity')
+            if wind is None or wind >= self.config_dict.wind_limit:
+                reasons.append('Wind')
+            if rain not in (None, 0) and last_rain is not None and last_rain != rain:
+                reasons.append('Rain')
+        if readings.get('radar') is True:
+            reasons.append('Nearby Rain')
+        if readings['sun'] >= (-5):
+            reasons.append('Sun Elevation')
+        if readings.get('clouds') is True:
+            reasons.append('Clouds')
+        return reasons
+
+    def check_internet(self):
         """
 
         Returns
@@ -138,13 +366,40 @@ class Conditions(threading.Thread):
 
         """
         try:
-            urllib.request.urlopen('http://google.com')
+            urllib.request.urlopen(self.internet_url, timeout=30)
             return True
         except (urllib.error.URLError, urllib.error.HTTPError):
             return False
 
-    def weather_check(self):
+    def _get(self, url, deadline, ttl=0, key=None):
         """
+        Parameters
+        ----------
+        url : STR
+            Address to download.
+        deadline : FLOAT
+            time.monotonic() time by which the download should be finished.
+        ttl : FLOAT, optional
+            Seconds for which the response may be reused without asking the server again.  The default is 0.
+        key : HASHABLE, optional
+            What to cache the response under, if not the url.  The default is None.
+
+        Returns
+        -------
+        requests.Response
+            The response, possibly cached, from the shared web cache.  The time left before the deadline is used as
+            the connect and read timeout.
+
+        """
+        return self.web.get(url, timeout=max(deadline - time.monotonic(), 0.1), ttl=ttl, key=key)
+
+    def weather_check(self, deadline=None):
+        """
+        Parameters
+        ----------
+        deadline : FLOAT, optional
+            time.monotonic() time by which to give up, including retries.  The default is None, which gives it
+            self.deadlines['weather'] seconds from now.
 
         Returns
         -------
@@ -161,7 +416,8 @@ class Conditions(threading.Thread):
         For rain, weather.com radar is used as a backup.
 
         """
-        s = requests.Session()
+        if deadline is None:
+            deadline = time.monotonic() + self.deadlines['weather']
         humidity = wind = rain = temperature = None
             
         ## GMU COS Weather Station Website is no longer functional. 
@@ -189,10 +445,8 @@ class Conditions(threading.Thread):
         target_path = os.path.abspath(os.path.join(self.weather_directory, r'weather.txt'))
         if not backup:
             try:
-                self.weather = s.get(self.weather_url)
-            except (urllib3.exceptions.MaxRetryError, urllib3.exceptions.HTTPError, urllib3.exceptions.TimeoutError,
-                    urllib3.exceptions.InvalidHeader, requests.exceptions.ConnectionError, requests.exceptions.Timeout,
-                    requests.exceptions.HTTPError):
+                self.weather = self._get(self.weather_url, deadline)
+            except _connection_errors:
                 self.connection_alert.set()
                 return None, None, None, None
             conditions = re.findall(r'<font color="#3366FF">(.+?)</font>', self.weather.text)
@@ -208,17 +462,19 @@ class Conditions(threading.Thread):
         if backup or (None in (humidity, wind, rain)):
             success = False
             encountered_error = False
+            tries = 0
             
             for i in range(1, 9):
                 if i != 1:
-                    time.sleep(6 * i)
+                    # Back off between tries, unless the next try would start after the deadline
+                    if time.monotonic() + 6 * i >= deadline or self.stop.wait(timeout=6 * i):
+                        break
 
+                tries = i
                 try:
-                    self.weather = s.get(self.backup_weather_url, headers={'User-Agent': self.config_dict.user_agent})
+                    self.weather = self._get(self.backup_weather_url, deadline)
                     
-                except (urllib3.exceptions.MaxRetryError, urllib3.exceptions.HTTPError, urllib3.exceptions.TimeoutError,
-                        urllib3.exceptions.InvalidHeader, requests.exceptions.ConnectionError, requests.exceptions.Timeout,
-                        requests.exceptions.HTTPError, json.decoder.JSONDecodeError, KeyError) as e:
+                except _connection_errors + (json.decoder.JSONDecodeError, KeyError) as e:
                     logging.warning(f"Could not connect to weatherapi.com API: try {i}")
                     logging.exception(e)
                     encountered_error = True
@@ -240,12 +496,12 @@ class Conditions(threading.Thread):
                     encountered_error = True
                                 
             if not success:
-                logging.warning(f"Could not read weatherapi.com  after {i} tries. Setting connection alert.")
+                logging.warning(f"Could not read weatherapi.com  after {tries} tries. Setting connection alert.")
                 self.connection_alert.set()
                 return None, None, None, None
             
             if success and encountered_error:
-                logging.info(f"Successfully read weatherapi.com after {i} tries.")
+                logging.info(f"Successfully read weatherapi.com after {tries} tries.")
                 
         # weather.gov
         # if backup or (None in (humidity, wind, rain)):
@@ -324,8 +580,13 @@ class Conditions(threading.Thread):
         logging.debug(f"Humidity: {humidity}, Wind: {wind}, Temperature: {temperature}")
         return humidity, wind, rain, temperature
 
-    def rain_check(self):
+    def rain_check(self, deadline=None):
         """
+        Parameters
+        ----------
+        deadline : FLOAT, optional
+            time.monotonic() time by which to give up.  The default is None, which gives it self.deadlines['radar']
+            seconds from now.
 
         Returns
         -------
@@ -333,14 +594,15 @@ class Conditions(threading.Thread):
             True if there is rain nearby, False otherwise.
 
         """
-        s = requests.Session()
+        if deadline is None:
+            deadline = time.monotonic() + self.deadlines['radar']
         try:
-            self.radar = s.get(self.rain_url, headers={'User-Agent': self.config_dict.user_agent})
-        except (urllib3.exceptions.MaxRetryError, urllib3.exceptions.HTTPError, urllib3.exceptions.TimeoutError,
-                urllib3.exceptions.InvalidHeader, requests.exceptions.ConnectionError, requests.exceptions.Timeout,
-                requests.exceptions.HTTPError):
+            page = self._get(self.rain_url, deadline, ttl=self.api_key_ttl)
+        except _connection_errors:
             self.connection_alert.set()
             return None
+        page_is_new = page is not self.radar
+        self.radar = page
         # api_key = re.search(r'"SUN_V3_API_KEY":"(.+?)",', self.radar.text).group(1)
         # API key needed to access radar images from the weather.com website
         api_key = re.search(r'{}'.format(self.config_dict.weather_api_key), self.radar.text)
@@ -349,16 +611,18 @@ class Conditions(threading.Thread):
             logging.debug('API Key for weather.com was successful!')
         else:
             logging.warning('Could not retrieve weather.com API key.  Continuing without radar checks.')
+            self.web.forget(self.rain_url)
             self.connection_alert.set()
             return None
 
-        target_path = os.path.abspath(os.path.join(self.weather_directory, r'radar.txt'))
-        try:
-            with open(target_path, 'w') as file:
-                # Writes weather.com html to a text file
-                file.write(str(self.radar.content))
-        except (UnicodeError, UnicodeEncodeError, UnicodeDecodeError):
-            logging.warning('Could not save weather.com html due to a unicode error.')
+        if page_is_new:
+            target_path = os.path.abspath(os.path.join(self.weather_directory, r'radar.txt'))
+            try:
+                with open(target_path, 'w') as file:
+                    # Writes weather.com html to a text file
+                    file.write(str(self.radar.content))
+            except (UnicodeError, UnicodeEncodeError, UnicodeDecodeError):
+                logging.warning('Could not save weather.com html due to a unicode error.')
 
         epoch_sec = time_utils.datetime_to_epoch_milli_converter(datetime.datetime.utcnow()) / 1000
         esec_round = int(time_utils.rounddown_300(epoch_sec) - 300)
@@ -366,55 +630,59 @@ class Conditions(threading.Thread):
 
         coords = {0: '291:391:10', 1: '291:392:10', 2: '292:391:10', 3: '292:392:10'}
         # Radar map coordinates found by looking through html
-        rain = []
+        urls = {key: self.tile_url.format(ts=esec_round, xyz=coords[key], key=api_key) for key in coords}
+        # Constructs url of 4 nearest radar images, and downloads them all at once
+        tiles = {key: self.tile_pool.submit(self._get, urls[key], deadline, self.image_ttl,
+                                            ('radar tile', esec_round, coords[key])) for key in coords}
+        (_, late) = wait(tiles.values(), timeout=max(deadline - time.monotonic(), 0))
+        if late:
+            logging.warning('{} of the weather.com radar images did not download in time'.format(len(late)))
+            self.connection_alert.set()
+            return None
+        responses = []
         for key in coords:
-            url = ('https://api.weather.com/v3/TileServer/tile?product=twcRadarMosaic'
-                   + '&ts={}'.format(str(esec_round))
-                   + '&xyz={}'.format(coords[key]) + '&apiKey={}'.format(api_key))
-            # Constructs url of 4 nearest radar images
-            path_to_images: str = os.path.abspath(os.path.join(
-                self.weather_directory, r'radar-img{0:04}.png'.format(key + 1)))
             try:
-                req = s.get(url, headers={'User-Agent': self.config_dict.user_agent})
-            except (urllib3.exceptions.MaxRetryError, urllib3.exceptions.HTTPError, urllib3.exceptions.TimeoutError,
-                    urllib3.exceptions.InvalidHeader, requests.exceptions.ConnectionError, requests.exceptions.Timeout,
-                    requests.exceptions.HTTPError):
+                req = tiles[key].result()
+            except _connection_errors:
                 self.connection_alert.set()
                 return None
-            with open(path_to_images, 'wb') as file:
-                file.write(req.content)
-                # Writes 4 images to local png files
-            logging.debug('Weather.com radar image url: {}'.format(url))
-            img = Image.open(path_to_images).convert("RGBA")
-            px = img.size[0] * img.size[1]
-            colors = np.array(img.getcolors())
-            if len(colors) > 1:  # Checks for any colors (green to red for rain) in the images
-                colsum = [np.nansum(colors[:, 1][i]) for i in range(len(colors))]
-                uncolored_i = np.where(np.isclose(colsum, 0))[0]
-                if uncolored_i.size > 0:
-                    percent_colored = (1 - colors[uncolored_i][0][0] / px) * 100
-                    logging.debug('Rain percentage: {:.5f}'.format(percent_colored))
-                    img.close()
-                    if percent_colored >= self.config_dict.rain_percent_limit:
-                        return True
-                    else:
-                        rain.append(1)
-                else:
-                    return True
-            else:
-                img.close()
-                continue
-        if sum(rain) >= 4:
-            return True
-        else:
-            return False
+            if req.status_code in (401, 403):
+                # The API key has changed, so get the new one from the radar page next time
+                logging.warning('Weather.com refused the radar API key.  It will be looked up again next check.')
+                self.web.forget(self.rain_url)
+                self.connection_alert.set()
+                return None
+            logging.debug('Weather.com radar image url: {}'.format(urls[key]))
+            responses.append(req)
+        if self.config_dict.save_weather_images:
+            for (key, req) in zip(coords, responses):
+                with open(os.path.join(self.weather_directory, r'radar-img{0:04}.png'.format(key + 1)), 'wb') as file:
+                    file.write(req.content)
+        try:
+            coverage = weather_utils.radar_coverage([req.content for req in responses],
+                                                    colors=self.config_dict.rain_colors,
+                                                    tolerance=self.config_dict.rain_color_tolerance) * 100
+        except (OSError, ValueError):
+            logging.warning('Could not read the weather.com radar images.')
+            self.connection_alert.set()
+            return None
+        self.rain_coverage = coverage
+        logging.debug('Rain percentage: {}'.format(', '.join('{:.5f}'.format(percent) for percent in coverage)))
+        # Rain too close in any one tile, or some rain in every tile
+        return bool(np.any(coverage >= self.config_dict.rain_percent_limit) or np.all(coverage > 0))
 
-    def cloud_check(self):
+    def cloud_check(self, deadline=None):
         """
         Description
         -----------
         Checks the current cloud cover around Fairfax.
 
+        Parameters
+        ----------
+        deadline : FLOAT, optional
+            time.monotonic() time by which to give up.  The default is None, which gives it self.deadlines['clouds']
+            seconds from now.
+
         Returns
         -------
         bool
@@ -429,8 +697,9 @@ class Conditions(threading.Thread):
         _time = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=5)
         year = _time.year
         time_round = time_utils.rounddown_300(_time.hour * 60 * 60 + _time.minute * 60 + _time.second)
+        if deadline is None:
+            deadline = time.monotonic() + self.deadlines['clouds']
         req = None
-        s = requests.Session()
         for i in range(6):
             hour = int(time_round / (60 * 60))
             minute = int((time_round - hour * 60 * 60) / 60) - i
@@ -447,54 +716,33 @@ class Conditions(threading.Thread):
             if (minute - 1) % 5 != 0:
                 continue
             daystr = str(day).zfill(3)
-            url = 'https://www.ssec.wisc.edu/data/geo/images/goes-16/animation_images/' + \
-                '{}_{}{}_{}_{}_conus.gif'.format(satellite, year, daystr, _time, conus_band)
+            url = self.cloud_url.format(satellite=satellite, year=year, day=daystr, time=_time, band=conus_band)
             try:
-                req = s.get(url, headers={'User-Agent': self.config_dict.user_agent})
+                req = self._get(url, deadline, ttl=self.image_ttl)
                 break
-            except (urllib3.exceptions.MaxRetryError, urllib3.exceptions.HTTPError, urllib3.exceptions.TimeoutError,
-                    urllib3.exceptions.InvalidHeader, requests.exceptions.ConnectionError, requests.exceptions.Timeout,
-                    requests.exceptions.HTTPError):
+            except _connection_errors:
                 self.connection_alert.set()
                 return None
-        target_path = os.path.abspath(os.path.join(self.weather_directory, r'cloud-img.gif'))
-        with open(target_path, 'wb') as file:
-            file.write(req.content)
+        if self.config_dict.save_weather_images:
+            with open(os.path.join(self.weather_directory, r'cloud-img.gif'), 'wb') as file:
+                file.write(req.content)
 
-        if os.stat(target_path).st_size <= 2000:
+        if len(req.content) <= 2000:
             logging.error('Cloud coverage image cannot be retrieved')
             return False
 
-        img = Image.open(target_path)
-        img_array = np.array(img)
-        img_array = img_array.astype('float64')
-        # fairfax coordinates ~300, 1350
-        img_internal = img_array[295:335, 1340:1380]
-        img_small = Image.fromarray(img_internal)
-        px = img_small.size[0] * img_small.size[1]
-        colors = img_small.getcolors()
-        percent_cover = sum([(0, colorn)[colorp - self.config_dict.cloud_saturation_limit >= 0] for (colorn, colorp) in colors]) / px * 100
+        try:
+            (coverage, img_internal) = weather_utils.cloud_coverage(req.content,
+                                                                    self.config_dict.cloud_saturation_limit)
+        except (OSError, ValueError):
+            logging.error('Cloud coverage image cannot be read')
+            return False
+        percent_cover = coverage * 100
+        self.cloud_coverage = percent_cover
         logging.debug('Cloud coverage (%): {:.5f}'.format(percent_cover))
-        if not isinstance(self.plot_lock, type(None)):
-            self.plot_lock.acquire()
-        else:
-            logging.warning('No thread lock is being utilized for plot drawing: plots may draw incorrectly!')
-        colornorm = mplc.Normalize(vmin=0, vmax=256)
-        fig, ax = plt.subplots()
-        plot = ax.imshow(img_internal, cmap=plt.get_cmap('PuOr'), norm=colornorm)
-        pos = ax.get_position()
-        cbar_ax = fig.add_axes([0.83, pos.y0, 0.025, pos.height])
-        cbar = fig.colorbar(plot, cax=cbar_ax)
-        ax.set_title('Percent Cover: {:.2f}%'.format(percent_cover))
-        plt.savefig(os.path.abspath(os.path.join(self.weather_directory, r'cloud-img-small.png')))
-        # Be really careful about closing up everything so as not to cause any memory leaks
-        plt.clf()
-        plt.cla()
-        plt.close('all')
-        if not isinstance(self.plot_lock, type(None)):
-            self.plot_lock.release()
-        img.close()
-        img_small.close()
+        plot_utils.submit_plot(self.plotter, 'cloud-img-small', _plot_cloud_cover,
+                               os.path.abspath(os.path.join(self.weather_directory, r'cloud-img-small.png')),
+                               img_internal, percent_cover)
         if percent_cover >= self.config_dict.cloud_cover_limit:
             return True
         else:
@@ -5,11 +5,14 @@ import numpy as np
 
 from ..controller.hardware import Hardware
 from ..common.IO import config_reader
-from ..common.util import filereader_utils
+from ..common.util import filereader_utils, frame_bus
 
 
 class Guider(Hardware):
-    
+
+    # Phase correlation matches weaker than this (see filereader_utils.phase_shift) are not trusted
+    phase_min_strength = 0.3
+
     def __init__(self, camera_obj, telescope_obj):
         """
         Description
@@ -49,7 +52,7 @@ class Guider(Hardware):
         """
         return True
                 
-    def find_guide_star(self, path, subframe=None):
+    def find_guide_star(self, image, subframe=None):
         """
         Description
         -----------
@@ -58,102 +61,85 @@ class Guider(Hardware):
 
         Parameters
         ----------
-        path : STR
-            Path to image file used to find guide star.
+        image : STR or filereader_utils.ImageContext
+            Path to image file used to find guide star, or an opened ImageContext of that file.
         subframe : TUPLE, optional
-            x and y coordinate of star to set a subframe around. The default is None, which will scan the
-            entire image.
+            x and y coordinate of star to set a subframe around.  Only the subframe is read and searched.  The
+            default is None, which will scan the entire image.
 
         Returns
         -------
         guider_star : TUPLE
-            Tuple with x-coordinate and y-coordinate of the star in the image.
+            Tuple with x-coordinate and y-coordinate of the star in the image, or in the subframe if there is one.
 
         """
-        stars, peaks = filereader_utils.findstars(path, self.config_dict.saturation, subframe=subframe)
+        stars = filereader_utils.findstars(image, self.config_dict.saturation, subframe=subframe)
         guider_star = None
         if not subframe:
-            i = 1
-            j = 0
-            while i < len(stars) - 1 - j:
-                dist_next = np.sqrt((stars[i][0] - stars[i + 1][0]) ** 2 + (stars[i][1] - stars[i + 1][1]) ** 2)
-                dist_prev = np.sqrt((stars[i][0] - stars[i - 1][0]) ** 2 + (stars[i][1] - stars[i - 1][1]) ** 2)
-                if peaks[i] >= self.config_dict.saturation or dist_next < 100 or dist_prev < 100:
-                    peaks.pop(i)
-                    stars.pop(i)
-                    j += 1
-                else:
-                    i += 1
-            if len(peaks) >= 3:
-                maxindex = peaks.index(max(peaks[1:len(peaks)-1]))
-                guider_star = stars[maxindex]
-            else:
-                guider_star = None
-        else:
-            minsep = 1000
-            minstar = None
+            # Unsaturated stars with no other star within 100 pixels
+            candidates = stars[(stars['peak'] < self.config_dict.saturation) & (stars['isolation'] >= 100)]
+            if len(candidates) > 0:
+                brightest = candidates[np.argmax(candidates['peak'])]
+                guider_star = (brightest['x'], brightest['y'])
+        elif len(stars) > 0:
             r = self.config_dict.guider_max_move / self.config_dict.plate_scale * 1.5
-            for star in stars:
-                distance = np.sqrt((star[0]-r)**2 + (star[1]-r)**2)
-                if distance < minsep:
-                    minsep = distance
-                    minstar = star
-            guider_star = minstar
+            distance = np.hypot(stars['x'] - r, stars['y'] - r)
+            closest = stars[np.argmin(distance)]
+            guider_star = (closest['x'], closest['y'])
         return guider_star
 
-    @staticmethod
-    def find_newest_image(image_path):
+    def guiding_procedure(self, image_path):
         """
         Description
         -----------
-        Finds the newest created file in a folder
+        The guiding procedure.  Finds the guide star after each new image and pulse guides the telescope
+        if the star has moved too far.
 
         Parameters
         ----------
         image_path : STR
-            Path to the folder of files.
+            Path to the folder where images are saved.
 
         Returns
         -------
-        newest_image : STR
-            Path to the newest created file in that folder.
+        None.
 
         """
-        images = os.listdir(image_path)
-        paths = [os.path.join(image_path, fname) for fname in images if ('.fits' in fname) or ('.fit' in fname)]
-        if len(paths) > 0:
-            newest_image = max(paths, key=os.path.getctime)
-            return newest_image
-        else:
-            return None
-    
-    def guiding_procedure(self, image_path):
+        self.guiding.set()
+        # Only science frames saved directly in image_path are used (not focus images or calibration frames)
+        frames = frame_bus.get_frame_bus().subscribe(
+            self.label, accept=lambda frame: os.path.dirname(os.path.abspath(frame.path)) == os.path.abspath(image_path))
+        try:
+            if self.config_dict.guider_mode == 'phase':
+                self._phase_guide(frames)
+            else:
+                self._guide(frames)
+        finally:
+            frames.close()
+
+    def _guide(self, frames):
         """
         Description
         -----------
-        The guiding procedure.  Finds the guide star after each new image and pulse guides the telescope
-        if the star has moved too far.
+        Guiding loop for guiding_procedure.
 
         Parameters
         ----------
-        image_path : STR
-            Path to the folder where images are saved.
+        frames : frame_bus.Subscription
+            New images to guide on.
 
         Returns
         -------
         None.
 
         """
-        self.guiding.set()
         x_initial = 0
         y_initial = 0
         while self.guiding.isSet():
-            self.camera.image_done.wait()
-            newest_image = self.find_newest_image(image_path)
-            if not newest_image:
-                logging.warning('Guider could not find a new FITS image to read.  Waiting for next exposure.')
+            frame = frames.latest(timeout=60)
+            if not frame:
                 continue
-            star = self.find_guide_star(newest_image)
+            star = self.find_guide_star(frame.image)
             if not star:
                 logging.warning('Guider could not find a suitable guide star...waiting for next image to try again.')
             else:
@@ -161,22 +147,16 @@ class Guider(Hardware):
                 y_initial = star[1]
                 break
         failures = 0
-        prev_image = ''
         while self.guiding.isSet():
-            imgcheck = self.camera.image_done.wait(timeout=30*60)
-            if not imgcheck:
+            frame = frames.latest(timeout=30*60)
+            if not frame:
                 logging.error('Guider has not received a new image in the last 30 minutes!  Stopping guiding procedures.')
                 break
             self.loop_done.clear()
-            newest_image = self.find_newest_image(image_path)
-            if newest_image == prev_image:
-                logging.error('Guider has read in the same image twice in a row.  Stopping guiding procedures.')
-                break
-            if not newest_image:
-                logging.warning('Guider could not find a new FITS image to read.  Waiting for next exposure.')
-                continue
             subframe = None if failures >= 3 else (x_initial, y_initial)
-            star = self.find_guide_star(newest_image, subframe=subframe)
+            # With a subframe, only the rows of the guide box are read from the file; the frame's cached image would
+            # decode the whole sensor first
+            star = self.find_guide_star(frame.path if subframe else frame.image, subframe=subframe)
             if not star:
                 logging.warning('Guider could not find a suitable guide star...waiting for next image to try again.')
                 failures += 1
@@ -197,38 +177,12 @@ class Guider(Hardware):
             logging.debug('Guide star absolute coordinates: x={}, y={}'.format(x_initial, y_initial))
             separation = np.sqrt((x - x_0)**2 + (y - y_0)**2)
             if separation >= self.config_dict.guiding_threshold:
-                # Position vector
-                position = np.array([x - x_0, y - y_0])
-                if self.config_dict.guider_flip_y:
-                    position[1] *= -1
-                # Guider angle: between the +x camera axis and the +RA axis
-                gamma = self.config_dict.guider_angle
-                # Rotation matrix to rotate through gamma
-                rot = np.array([[np.cos(gamma), -np.sin(gamma)], [np.sin(gamma), np.cos(gamma)]])
-                # New position
-                rot_x, rot_y = np.matmul(rot, position)
-                # Assumes guider angle (angle b/w RA/Dec axes and Image X/Y axes) is constant
-                if rot_x < 0:
-                    # The pixel distance is positive in this case (for gamma = 180), but the RA distance is negative because RA increases
-                    # to the left.  So in order to move the star back to the left, we move the telescope right/west.
-                    xdirection = 'west'
-                else:
-                    xdirection = 'east'
-                if rot_y > 0:
-                    # The pixel distance is negative (for gamma = 180), but the declination distance is positive.
-                    # So to move the star back down, we move the telescope up/north.
-                    ydirection = 'north'
-                else:
-                    ydirection = 'south'
-                xjog_distance = abs(rot_x) * self.config_dict.plate_scale * self.config_dict.guider_ra_dampening
-                yjog_distance = abs(rot_y) * self.config_dict.plate_scale * self.config_dict.guider_dec_dampening
-                jog_separation = np.sqrt(xjog_distance**2 + yjog_distance**2)
-                if jog_separation >= self.config_dict.guider_max_move:
+                if not self.correct_drift(x - x_0, y - y_0):
                     logging.warning('Guide star has moved substantially between images...If the telescope did not move '
                                     'suddenly, the guide star most likely has become saturated and the guider has '
                                     'picked a new star.')
                     # Changes initial absolute coordinates to match the "new" guide star
-                    new_star = self.find_guide_star(newest_image)
+                    new_star = self.find_guide_star(frame.image)
                     if new_star:
                         x_initial = new_star[0]
                         y_initial = new_star[1]
@@ -236,21 +190,110 @@ class Guider(Hardware):
                         logging.warning(
                             'Guider could not find a suitable guide star...waiting for next image to try again.')
                         failures += 1
-                elif jog_separation < self.config_dict.guider_max_move:
-                    logging.debug('Guider is making an adjustment')
-                    logging.debug('xdistance: {}\"; ydistance: {}\"'.format(xjog_distance, yjog_distance))
-                    logging.debug('Separation: {} px'.format(separation))
-                    logging.debug('Move Direction: {} {}'.format(xdirection, ydirection))
-                    logging.debug('Plate Scale: {}\"/px'.format(self.config_dict.plate_scale))
-                    logging.debug('RA Dampening: {}x'.format(self.config_dict.guider_ra_dampening))
-                    logging.debug('Dec Dampening: {}x\n'.format(self.config_dict.guider_dec_dampening))
-                    self.telescope.onThread(self.telescope.jog, xdirection, xjog_distance)
-                    self.telescope.slew_done.wait()
-                    self.telescope.onThread(self.telescope.jog, ydirection, yjog_distance)
-                    self.telescope.slew_done.wait()
-            prev_image = newest_image
             self.loop_done.set()
 
+    def _phase_guide(self, frames):
+        """
+        Description
+        -----------
+        Guiding loop for guiding_procedure when guider_mode is "phase".  The first image is kept as a reference, and
+        every following image is registered against it with FFT phase correlation to measure the drift.
+
+        Parameters
+        ----------
+        frames : frame_bus.Subscription
+            New images to guide on.
+
+        Returns
+        -------
+        None.
+
+        """
+        fft_size = self.config_dict.guider_fft_size
+        reference = None
+        while self.guiding.isSet():
+            frame = frames.latest(timeout=30*60)
+            if not frame:
+                logging.error('Guider has not received a new image in the last 30 minutes!  Stopping guiding procedures.')
+                break
+            self.loop_done.clear()
+            if reference is None:
+                reference = filereader_utils.phase_reference(frame.image, fft_size)
+                logging.info('Guider has selected a new reference image.  Continuing to guide.')
+                self.loop_done.set()
+                continue
+            dx, dy, strength = filereader_utils.phase_shift(reference, frame.image, fft_size)
+            logging.debug('Guider image drift: x={:.2f} px, y={:.2f} px (match strength {:.2f})'.format(
+                dx, dy, strength))
+            if strength < self.phase_min_strength:
+                logging.warning('Guider could not match the image against the reference image...waiting for next '
+                                'image to try again.')
+            elif np.sqrt(dx**2 + dy**2) >= self.config_dict.guiding_threshold:
+                if not self.correct_drift(dx, dy):
+                    logging.warning('The field has moved substantially between images...If the telescope did not '
+                                    'move suddenly, the guider has lost track.  Taking a new reference image.')
+                    reference = None
+            self.loop_done.set()
+
+    def correct_drift(self, dx, dy):
+        """
+        Description
+        -----------
+        Jogs the telescope to move the field back by a measured drift on the camera.
+
+        Parameters
+        ----------
+        dx : FLOAT
+            Drift along the camera's x axis, in pixels.
+        dy : FLOAT
+            Drift along the camera's y axis, in pixels.
+
+        Returns
+        -------
+        BOOL
+            True if the telescope was jogged, or False if the correction would be larger than guider_max_move, in
+            which case the telescope is not moved.
+
+        """
+        # Position vector
+        position = np.array([dx, dy], dtype=np.float64)
+        if self.config_dict.guider_flip_y:
+            position[1] *= -1
+        # Guider angle: between the +x camera axis and the +RA axis
+        gamma = self.config_dict.guider_angle
+        # Rotation matrix to rotate through gamma
+        rot = np.array([[np.cos(gamma), -np.sin(gamma)], [np.sin(gamma), np.cos(gamma)]])
+        # New position
+        rot_x, rot_y = np.matmul(rot, position)
+        # Assumes guider angle (angle b/w RA/Dec axes and Image X/Y axes) is constant
+        if rot_x < 0:
+            # The pixel distance is positive in this case (for gamma = 180), but the RA distance is negative because RA increases
+            # to the left.  So in order to move the star back to the left, we move the telescope right/west.
+            xdirection = 'west'
+        else:
+            xdirection = 'east'
+        if rot_y > 0:
+            # The pixel distance is negative (for gamma = 180), but the declination distance is positive.
+            # So to move the star back down, we move the telescope up/north.
+            ydirection = 'north'
+        else:
+            ydirection = 'south'
+        xjog_distance = abs(rot_x) * self.config_dict.plate_scale * self.config_dict.guider_ra_dampening
+        yjog_distance = abs(rot_y) * self.config_dict.plate_scale * self.config_dict.guider_dec_dampening
+        jog_separation = np.sqrt(xjog_distance**2 + yjog_distance**2)
+        if jog_separation >= self.config_dict.guider_max_move:
+            return False
+        logging.debug('Guider is making an adjustment')
+        logging.debug('xdistance: {}\"; ydistance: {}\"'.format(xjog_distance, yjog_distance))
+        logging.debug('Separation: {} px'.format(np.sqrt(dx**2 + dy**2)))
+        logging.debug('Move Direction: {} {}'.format(xdirection, ydirection))
+        logging.debug('Plate Scale: {}\"/px'.format(self.config_dict.plate_scale))
+        logging.debug('RA Dampening: {}x'.format(self.config_dict.guider_ra_dampening))
+        logging.debug('Dec Dampening: {}x\n'.format(self.config_dict.guider_dec_dampening))
+        self.telescope.onThread(self.telescope.jog, xdirection, xjog_distance).get()
+        self.telescope.onThread(self.telescope.jog, ydirection, yjog_distance).get()
+        return True
+
     def stop_guiding(self):
         """
         Description
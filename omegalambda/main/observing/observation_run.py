@@ -1,17 +1,17 @@
 import datetime
-import pytz
-from astropy.time import Time
-import time
 import os
 import re
 import copy
 import logging
-import subprocess
 import threading
+import concurrent.futures
 
-from ..common.util import time_utils, conversion_utils
-from ..common.IO import config_reader
+from ..common.util import time_utils, conversion_utils, ephemeris
+from ..common.util.clock import get_clock
+from ..common.util.plot_utils import PlotRenderer
+from ..common.IO import config_reader, run_journal
 from ..common.datatype import filter_wheel
+from ..controller import backend
 from ..controller.camera import Camera
 from ..controller.telescope import Telescope
 from ..controller.dome import Dome
@@ -20,10 +20,12 @@ from ..controller.focuser_procedures import FocusProcedures
 from ..controller.flatfield_lamp import FlatLamp
 
 from ..controller.thread_monitor import Monitor
+from ..controller.process_watcher import ProcessWatcher
 from ..controller.focuser_gui import Gui
 from .calibration import Calibration
 from .guider import Guider
 from .condition_checker import Conditions
+from .scheduler import Scheduler
 
 
 class ObservationRun:
@@ -60,20 +62,34 @@ class ObservationRun:
         self.continuous_focus_toggle = True
         self.tz = observation_request_list[0].start_time.tzinfo
         self.time_start = None
-        self.plot_lock = threading.Lock()
+        self.plotter = PlotRenderer()
         self.shutdown_event = threading.Event()
+        self.dome_opened = None
+        # Every sleep and wait for observing time goes through the clock, so that a simulated night can skip them
+        self.clock = get_clock()
+        # Positions of every target over its observing window, for the scheduler, headers and telescope limits
+        ephemerides = ephemeris.build_ticket_ephemerides(self.observation_request_list)
+        self.ephemerides = {ticket.name: target for (ticket, target) in ephemerides.items()}
+        self.scheduler = Scheduler(self.observation_request_list, ephemerides=ephemerides)
+        # Images already in the run journal from an earlier start of this run do not need observing time again
+        for ticket in self.observation_request_list:
+            self.scheduler.record(ticket, self.journal_completed(ticket))
+        self.replanned = threading.Event()
 
         # Initializes all relevant hardware
         self.camera = Camera()
         self.telescope = Telescope()
+        self.telescope.ephemerides = list(self.ephemerides.values())
         self.dome = Dome()
         self.focuser = Focuser()
-        self.conditions = Conditions(plot_lock=self.plot_lock)
+        self.conditions = Conditions(plotter=self.plotter)
         self.flatlamp = FlatLamp()
+        self.process_watcher = ProcessWatcher(['MaxIm_DL.exe', 'TheSkyX.exe', 'ASCOMDome.exe'],
+                                              on_not_responding=self.restart_program)
 
 
         # Initializes higher level structures - focuser, guider, and calibration
-        self.focus_procedures = FocusProcedures(self.focuser, self.camera, self.conditions, self.shutdown_event, plot_lock=self.plot_lock)
+        self.focus_procedures = FocusProcedures(self.focuser, self.camera, self.conditions, self.shutdown_event, plotter=self.plotter)
         self.calibration = Calibration(self.camera, self.flatlamp, self.image_directories)
         self.guider = Guider(self.camera, self.telescope)
         self.gui = Gui(self.focuser, self.focus_procedures, focus_toggle)
@@ -82,7 +98,12 @@ class ObservationRun:
         self.filterwheel_dict = filter_wheel.get_filter().filter_position_dict()
         self.config_dict = config_reader.get_config()
 
+        # Looks up each target's astrometry for BJD_TDB in the background, so no image has to wait on SIMBAD
+        for ticket in self.observation_request_list:
+            time_utils.get_astrometry_cache().get(ticket.name, ticket.ra * 15, ticket.dec, timeout=0)
+
         # Starts the threads
+        self.plotter.start()
         self.gui.start()
         self.focuser.start()        # Must be started first so that it may check all available COM ports for robofocus
         self.conditions.start()
@@ -99,17 +120,26 @@ class ObservationRun:
         self.th_dict = {'camera': self.camera, 'telescope': self.telescope,
                         'dome': self.dome, 'focuser': self.focuser, 'flatlamp': self.flatlamp,
                         'conditions': self.conditions, 'guider': self.guider,
-                        'focus_procedures': self.focus_procedures, 'gui': self.gui
+                        'focus_procedures': self.focus_procedures, 'gui': self.gui,
+                        'plotter': self.plotter
                         }
         self.monitor = Monitor(self.th_dict)
         self.monitor.start()
+        # The programs are started by the hardware threads' first connection, so they are only watched once that
+        # has happened; otherwise one still starting up would be found not responding and killed
+        for device in (self.camera, self.telescope, self.dome):
+            device.live_connection.wait(timeout=60)
+        self.process_watcher.start()
 
     def everything_ok(self):
         """
         Description
         -----------
         Checks hardware connections and all outside conditions (humidity, wind, rain,
-                                                                sun elevation, and cloud coverage)
+                                                                sun elevation, and cloud coverage).
+        The connections, crashed threads and telescope limits are read from the thread monitor's health snapshot,
+        if it is recent, and only checked directly without one; only devices that the snapshot saw disconnected (or
+        all of them, with no recent snapshot) are waited on to reconnect.  The weather alert is always read live.
 
         Returns
         -------
@@ -125,29 +155,35 @@ class ObservationRun:
             'Dome': self.dome,
             'FlatLamp': self.flatlamp
         }
+        snapshot = self.monitor.health()
+        connected = snapshot.connected if snapshot else {}
         message = ''
         for key, value in connections.items():
+            if connected.get(key.lower()):
+                continue
             if not value.live_connection.wait(timeout=10):
                 message += key + ' '
                 check = False
         if message:
             logging.error('Hardware connection timeout: {}'.format(message))
-        if not self.focuser.live_connection.wait(timeout=10):
+        if not connected.get('focuser') and not self.focuser.live_connection.wait(timeout=10):
             self.continuous_focus_toggle = False
             self.focus_toggle = False
             logging.warning('Hardware connection timeout: Focuser.  Will continue observing without focusing.')
 
-        self.threadcheck()
+        self.threadcheck(snapshot)
 
+        # Read live rather than from the snapshot, which can be seconds old, so that this agrees with
+        # hold_for_weather about whether exposures can go on
         if self.conditions.weather_alert.isSet():
             calibration = (self.config_dict.calibration_time == "end") and (self.calibration_toggle is True)
             self.guider.stop_guiding()
-            self.guider.loop_done.wait(timeout=10)
-            time.sleep(5)
+            self.clock.wait(self.guider.loop_done, 10)
+            self.clock.sleep(5)
             cooler = self.conditions.sun
-            calib_start = time.monotonic()
+            calib_start = self.clock.monotonic()
             self._shutdown_procedure(calibration=calibration, cooler=cooler)
-            calib_end = time.monotonic()
+            calib_end = self.clock.monotonic()
             if calibration:
                 sleep_time = (self.config_dict.min_reopen_time + 3) * 60 - (calib_end - calib_start)
                 if sleep_time <= 0:
@@ -156,7 +192,7 @@ class ObservationRun:
                 sleep_time = self.config_dict.min_reopen_time * 60
                 
             self.monitor.skip_telescope_check = True
-            time.sleep(5)
+            self.clock.sleep(5)
             logging.info("Disconnecting telescope.")
             self.telescope.onThread(self.telescope.disconnect)
             logging.info("Stopping telescope.")
@@ -166,53 +202,59 @@ class ObservationRun:
             logging.info("Sleeping for {} minutes, then weather checks will resume to attempt "
                          "a possible re-open.".format(sleep_time // 60))
             
-            time.sleep(sleep_time)
+            self.clock.sleep(sleep_time)
 
             while self.conditions.weather_alert.isSet():
                 if self.conditions.sun:
                     cooler = True
                     self.camera.onThread(self.camera.cooler_set, False)
                     self.focus_procedures.stop_constant_focusing()                    
-                    sunset_time = conversion_utils.get_sunset(datetime.datetime.now(self.tz),
+                    sunset_time = conversion_utils.get_sunset(self.clock.now(self.tz),
                                                               self.config_dict.site_latitude,
                                                               self.config_dict.site_longitude)
                     logging.info('The Sun has risen above the horizon...observing will stop until the Sun sets again '
                                  'at {}.'.format(sunset_time.strftime('%Y-%m-%d %H:%M:%S%z')))
-                    current_time = datetime.datetime.now(self.tz)
+                    current_time = self.clock.now(self.tz)
                     while current_time < (sunset_time - datetime.timedelta(minutes=5)):
                         self.threadcheck()
-                        current_time = datetime.datetime.now(self.tz)
+                        current_time = self.clock.now(self.tz)
                         if current_time > self.observation_request_list[-1].end_time:
                             return False
-                        time.sleep((self.config_dict.weather_freq + 1) * 60)
+                        self.clock.sleep((self.config_dict.weather_freq + 1) * 60)
                     logging.info('The Sun should now be setting again...observing will resume shortly.')
 
                 else:
                     self.threadcheck()
                     logging.info("Still waiting for good conditions to reopen.")
-                    current_time = datetime.datetime.now(self.tz)
+                    current_time = self.clock.now(self.tz)
                     if current_time > self.observation_request_list[-1].end_time:
                         return False
-                    time.sleep(self.config_dict.weather_freq * 60)
+                    self.clock.sleep(self.config_dict.weather_freq * 60)
 
             if not self.conditions.weather_alert.isSet():
-                current_time = datetime.datetime.now(self.tz)
+                current_time = self.clock.now(self.tz)
                 if current_time + datetime.timedelta(minutes=15) > self.observation_request_list[-1].end_time:
                     return False
                 check = True
                 
                 logging.info("Reconnecting telescope.")
                 self.restart('telescope')
-                time.sleep(30)
+                self.clock.sleep(30)
                 logging.info("Restarting dome thread.")
                 self.restart('dome')
-                time.sleep(15)
+                self.clock.sleep(15)
                 self.monitor.skip_telescope_check = False
-                time.sleep(10)
+                self.clock.sleep(10)
                     
                 self._startup_procedure(cooler=cooler)
 
-                if self.current_ticket.end_time > datetime.datetime.now(self.tz):
+                # The closure may have made another target the better one to observe now
+                blocks = self.scheduler.plan(position=self.current_ticket)
+                if not blocks or blocks[0].ticket != self.current_ticket:
+                    logging.info('Observing plan changed during the weather closure, moving on from {}.'.format(
+                        self.current_ticket.name))
+                    self.replanned.set()
+                elif self.current_ticket.end_time > self.clock.now(self.tz):
                     if not self._ticket_slew(self.current_ticket):
                         return False
                     ###  Probably don't need to redo coarse focus after reopening from weather
@@ -225,6 +267,39 @@ class ObservationRun:
                 self.everything_ok()
         return check
 
+    def hold_for_weather(self, duration):
+        """
+        Description
+        -----------
+        While the condition checker's weather warning is set, holds off starting anything that would not be finished
+        by the time the weather is expected to turn, so that the observatory is never shut down in the middle of an
+        exposure.  Waits until either the warning clears or the weather alert is raised.
+
+        Parameters
+        ----------
+        duration : INT or FLOAT
+            How long, in seconds, the next exposure will take, including readout.
+
+        Returns
+        -------
+        bool
+            True if the exposure can be started, False if the weather alert was raised.
+
+        """
+        holding = False
+        while self.conditions.weather_warning.isSet() and not self.conditions.weather_alert.isSet():
+            warning_time = self.conditions.warning_time
+            if warning_time is None or self.clock.time() + duration < warning_time:
+                break
+            if not holding:
+                logging.info('The weather is expected to become too poor before another exposure could finish.  '
+                             'Waiting for the weather warning to clear.')
+                holding = True
+            self.clock.wait(self.conditions.weather_alert, 10)
+        if holding and not self.conditions.weather_alert.isSet():
+            logging.info('Weather warning cleared, resuming exposures.')
+        return not self.conditions.weather_alert.isSet()
+
     def _startup_procedure(self, cooler=True):
         """
         Parameters
@@ -241,17 +316,16 @@ class ObservationRun:
 
         """
         # Give initial time lag to allow first weather check to complete
-        time.sleep(15)
+        self.clock.sleep(15)
         self.shutdown_event.clear()
         initial_check = self.everything_ok()
         if cooler:
             self.camera.onThread(self.camera.cooler_set, True)
-        self.dome.onThread(self.dome.shutter_position)
-        time.sleep(2)
-        initial_shutter = self.dome.shutter
+        initial_shutter = self.dome.onThread(self.dome.shutter_position).get(timeout=60)
         if initial_shutter in (1, 3, 4) and initial_check is True:
             self.dome.onThread(self.dome.move_shutter, 'open')
-            self.dome.onThread(self.dome.home)
+            # Resolves once the shutter has opened and the dome has homed, since both run in order on the dome thread
+            self.dome_opened = self.dome.onThread(self.dome.home)
         elif not initial_check:
             if not self.conditions.weather_alert.isSet():
                 self.shutdown()
@@ -276,41 +350,27 @@ class ObservationRun:
 
         """
         logging.info('Slewing the telescope to the target\'s ra=' + str(ticket.ra) + ' and dec=' + str(ticket.dec))
-        self.telescope.onThread(self.telescope.slew, ticket.ra, ticket.dec)
-        time.sleep(2)
-        self.telescope.slew_done.wait()
-        slew = self.telescope.last_slew_status
+        slew = self.telescope.onThread(self.telescope.slew, ticket.ra, ticket.dec).get()
         if not slew:
             logging.warning('Telescope cannot slew to target.  Waiting until slew conditions are acceptable.')
             while not slew:
                 self._park_procedure()
-                time.sleep(self.config_dict.weather_freq*60)
+                self.clock.sleep(self.config_dict.weather_freq*60)
                 if not self.everything_ok():
                     return False
-                self.telescope.onThread(self.telescope.unpark)
-                time.sleep(2)
+                self.telescope.onThread(self.telescope.unpark).get()
                 logging.info('Slewing the telescope to the target\'s ra=' + str(ticket.ra) + ' and dec=' + str(ticket.dec))
-                self.telescope.onThread(self.telescope.slew, ticket.ra, ticket.dec)
-                time.sleep(2)
-                self.telescope.slew_done.wait()
-                slew = self.telescope.last_slew_status
+                slew = self.telescope.onThread(self.telescope.slew, ticket.ra, ticket.dec).get()
         if slew == -100:
 
             # Try to park, but that may also fail.  Delay coordinate checks by 1 second.
-            self.telescope.onThread(self.telescope.park, 1000)
-            time.sleep(2)
-            self.telescope.slew_done.wait()
+            park = self.telescope.onThread(self.telescope.park, 1000).get()
             # If it does fail, don't try to park again
-            park = self.telescope.last_slew_status
             if park is True:
                 # If the park was successful, try the slew one more time
-                self.telescope.onThread(self.telescope.unpark)
-                time.sleep(2)
+                self.telescope.onThread(self.telescope.unpark).get()
                 logging.warning('Attempting to slew to the target one more time: ra=' + str(ticket.ra) + ' and dec=' + str(ticket.dec))
-                self.telescope.onThread(self.telescope.slew, ticket.ra, ticket.dec)
-                time.sleep(2)
-                self.telescope.slew_done.wait()
-                slew = self.telescope.last_slew_status
+                slew = self.telescope.onThread(self.telescope.slew, ticket.ra, ticket.dec).get()
                 if slew != -100:
                     # If the second slew was successful, yay!  Observations can continue
                     return True
@@ -323,10 +383,7 @@ class ObservationRun:
         return True
 
     def _park_procedure(self):
-        self.telescope.onThread(self.telescope.park)
-        time.sleep(5)
-        self.telescope.slew_done.wait()
-        park = self.telescope.last_slew_status
+        park = self.telescope.onThread(self.telescope.park).get()
         if park == -100:
             self._critical_shutdown_procedure()
             self.stop_threads()
@@ -334,13 +391,19 @@ class ObservationRun:
                                'code until the problem can be diagnosed by a human.')
         return park
 
-    def check_start_time(self, ticket):
+    def check_start_time(self, ticket, start_time=None, first=False):
         """
         Checks the start time of the given ticket and waits if it has not been reached yet.
 
         Parameters
         ----------
         ticket : ObservationTicket object
+        start_time : datetime.datetime, optional
+            When to start, like the start of the ticket's block in the observing plan.  The default is None, which
+            is the ticket's start time.
+        first : BOOL, optional
+            Whether this is the first target of the night, in which case the observatory is not shut down while
+            waiting.  The default is False.
 
         Returns
         -------
@@ -349,12 +412,12 @@ class ObservationRun:
         """
         shutdown = False
         cooler = False
-        current_time = datetime.datetime.now(self.tz)
-        if ticket.start_time > current_time:
+        start_time = start_time or ticket.start_time
+        current_time = self.clock.now(self.tz)
+        if start_time > current_time:
             logging.info("It is not the start time {} of {} observation, "
-                         "waiting till start time.".format(ticket.start_time.isoformat(), ticket.name))
-            if ticket != self.observation_request_list[0] and \
-                    ((ticket.start_time - current_time) > datetime.timedelta(hours=8)):
+                         "waiting till start time.".format(start_time.isoformat(), ticket.name))
+            if not first and ((start_time - current_time) > datetime.timedelta(hours=8)):
                 logging.info("Start time of the next ticket is at least 8 hours in advance.  Shutting down "
                              "observatory in the meantime.")
                 cooler = True
@@ -364,8 +427,7 @@ class ObservationRun:
                 self.focus_procedures.stop_constant_focusing()
                 self.guider.stop_guiding()
                 shutdown = True
-            elif ticket != self.observation_request_list[0] and \
-                    ((ticket.start_time - current_time) > datetime.timedelta(minutes=5)):
+            elif not first and ((start_time - current_time) > datetime.timedelta(minutes=5)):
                 logging.info("Start time of the next ticket is not immediate.  Shutting down "
                              "observatory in the meantime.")
                 cooler = False
@@ -374,12 +436,12 @@ class ObservationRun:
                 self.focus_procedures.stop_constant_focusing()
                 self.guider.stop_guiding()
                 shutdown = True
-            current_time = datetime.datetime.now(self.tz)
+            current_time = self.clock.now(self.tz)
             current_epoch_milli = time_utils.datetime_to_epoch_milli_converter(current_time)
-            start_time_epoch_milli = time_utils.datetime_to_epoch_milli_converter(ticket.start_time)
+            start_time_epoch_milli = time_utils.datetime_to_epoch_milli_converter(start_time)
             dt = (start_time_epoch_milli - current_epoch_milli) / 1000
             if dt > 0:
-                time.sleep(dt)
+                self.clock.sleep(dt)
         return shutdown, cooler
 
     def observe(self):
@@ -387,8 +449,9 @@ class ObservationRun:
         Description
         ----------
         Makes sure the dome, shutter, camera are ready to begin observation,
-        and the start time has passed before beginning observation.  Then it loops
-        through all tickets and starts the necessary procedures.
+        and the start time has passed before beginning observation.  Then it follows
+        the scheduler's plan, observing each ticket for its planned blocks, and replans
+        from the current time after every block.
 
         Returns
         -------
@@ -397,52 +460,52 @@ class ObservationRun:
         if (self.config_dict.calibration_time == "start") and (self.calibration_toggle is True):
             cooler = False
             self.camera.onThread(self.camera.cooler_set, True)
-            self.camera.onThread(self.camera.cooler_ready)
-            time.sleep(2)
-            self.camera.cooler_settle.wait()
+            self.camera.onThread(self.camera.cooler_ready).get()
             logging.info('Beginning flat and dark collection...')
             self.take_calibration_images(beginning=True)
         else:
             cooler = True
-        self.check_start_time(self.observation_request_list[0])
+        blocks = self.scheduler.plan()
+        if not blocks:
+            logging.warning('None of the targets can be observed within the telescope limits during their '
+                            'observation windows.')
+            self.shutdown()
+            return
+        self.check_start_time(blocks[0].ticket, blocks[0].start, first=True)
         initial_shutter = self._startup_procedure(cooler=cooler)
 
 
         if initial_shutter == -1:
             return
 
-        for ticket in self.observation_request_list:
+        previous = None
+        while blocks:
+            block = blocks[0]
+            ticket = block.ticket
             self.current_ticket = ticket
             if not self.everything_ok():
                 self.shutdown()
                 return
-            self.crash_check('TheSkyX.exe')
-            self.crash_check('ASCOMDome.exe')
 
             self.tz = ticket.start_time.tzinfo
-            shutdown, cooler = self.check_start_time(ticket)
-            if ticket.end_time < datetime.datetime.now(self.tz):
-                logging.info("the end time {} of {} observation has already passed. "
-                             "Skipping to next target.".format(ticket.end_time.isoformat(), ticket.name))
-                continue
+            shutdown, cooler = self.check_start_time(ticket, block.start)
             if not self.everything_ok():
                 self.shutdown()
                 return
             if shutdown:
                 initial_shutter = self._startup_procedure(cooler=cooler)
 
-            if not self._ticket_slew(ticket):
-                self.shutdown()
-                return
-            if initial_shutter in (1, 3, 4):
-                time.sleep(10)
-                self.dome.has_homed.wait()
-                self.dome.shutter_done.wait()
-                time.sleep(10)
-                self.dome.move_done.wait()
-            self.camera.cooler_settle.wait()
-            if self.focus_toggle:
-                self.focus_target(ticket)
+            # Already on target if the plan just extends the last block
+            if shutdown or ticket is not previous or self.replanned.is_set():
+                if not self._ticket_slew(ticket):
+                    self.shutdown()
+                    return
+                if initial_shutter in (1, 3, 4) and self.dome_opened is not None:
+                    self.dome_opened.get()
+                    self.dome.move_done.wait()
+                self.camera.cooler_settle.wait()
+                if self.focus_toggle:
+                    self.focus_target(ticket)
 
             if not self.everything_ok():
                 self.shutdown()
@@ -452,10 +515,22 @@ class ObservationRun:
             #     input("The program is ready to start taking images of {}.  Please take this time to "
             #           "check the focus and pointing of the target.  When you are ready, press Enter: ".format(
             #         ticket.name))
-            self.time_start = time_utils.convert_to_jd_utc()
-            (taken, total) = self.run_ticket(ticket)
+            self.time_start = time_utils.convert_to_jd_utc(self.clock.now(datetime.timezone.utc))
+            self.replanned.clear()
+            (taken, total) = self.run_ticket(ticket, block.end)
             logging.info("{} out of {} exposures were taken for {}.  Moving on to next target.".format(taken, total,
                                                                                                        ticket.name))
+            self.scheduler.record(ticket, taken)
+            if not taken and self.conditions.weather_alert.isSet():
+                # The block was cut short by the weather, so wait it out before planning from when observing resumes
+                if not self.everything_ok():
+                    self.shutdown()
+                    return
+            if self.journal_completed(ticket) >= Scheduler.images(ticket):
+                # Nothing left to take, so the planner must not pick this ticket again
+                self.scheduler.exclude(ticket)
+            previous = ticket
+            blocks = self.scheduler.plan(position=ticket)
         calibration = (self.config_dict.calibration_time == "end") and (self.calibration_toggle is True)
         self.shutdown(calibration)
 
@@ -490,28 +565,50 @@ class ObservationRun:
             focus_exposure = 30
         self.focus_procedures.stop_initial_focusing()
         self.focus_procedures.stop_constant_focusing()
-        time.sleep(1)
-        self.focus_procedures.onThread(self.focus_procedures.startup_focus_procedure, focus_exposure,
-                                       self.filterwheel_dict[focus_filter], self.image_directories[ticket])
-        time.sleep(1)
+        focus = self.focus_procedures.onThread(self.focus_procedures.startup_focus_procedure, focus_exposure,
+                                               self.filterwheel_dict[focus_filter], self.image_directories[ticket])
         i = 0
-        while not self.focus_procedures.focused.isSet():
+        while not focus.done():
             check = self.everything_ok()
             if not check:
                 self.focus_procedures.stop_initial_focusing()
                 break
-            time.sleep(10)
+            concurrent.futures.wait((focus,), timeout=10)
             i += 1
             if i % 30 == 0:
                 logging.debug(f'Still waiting for coarse focus to finish...; t = {(i*10)//60} mins')
 
-    def run_ticket(self, ticket):
+    def journal_completed(self, ticket):
+        """
+        Parameters
+        ----------
+        ticket : ObservationTicket Object
+            Created from json_reader and object_reader.
+
+        Returns
+        -------
+        INT
+            Number of images of the ticket that the run journal records as done, counting at most num
+            images in each filter for tickets that do not cycle filters.
+
+        """
+        journal = run_journal.get_run_journal(self.image_directories[ticket])
+        if ticket.cycle_filter:
+            return min(len(journal.completed(ticket.name, 'light')), ticket.num)
+        filters = ticket.filter if type(ticket.filter) is list else [ticket.filter]
+        return sum(min(len(journal.completed(ticket.name, 'light', _filter)), ticket.num) for _filter in filters)
+
+    def run_ticket(self, ticket, end_time=None):
         """
         Parameters
         ----------
         ticket : ObservationTicket Object
             The observation ticket object with information useful to
             the observing run.
+        end_time : datetime.datetime, optional
+            When to stop, like the end of the ticket's block in the observing plan, if before the ticket's own end
+            time.  The default is None.  Images already in the run journal count towards the ticket's num, so a
+            ticket observed over several blocks takes num images in all.
 
         Returns
         -------
@@ -529,15 +626,18 @@ class ObservationRun:
         if ticket.self_guide:
             self.guider.onThread(self.guider.guiding_procedure, self.image_directories[ticket])
         header_info = self.get_general_header_info(ticket)
+        end_time = min(end_time, ticket.end_time) if end_time else ticket.end_time
+        journal = run_journal.get_run_journal(self.image_directories[ticket])
         if ticket.cycle_filter:
-            img_count = self.take_images(ticket.name, ticket.num, ticket.exp_time,
-                                         ticket.filter, ticket.end_time, self.image_directories[ticket],
-                                         True, header_info)
+            num = ticket.num - len(journal.completed(ticket.name, 'light'))
+            img_count = self.take_images(ticket.name, num, ticket.exp_time,
+                                         ticket.filter, end_time, self.image_directories[ticket],
+                                         True, header_info) if num > 0 else 0
             if self.continuous_focus_toggle:
                 self.focus_procedures.stop_constant_focusing()
             if ticket.self_guide:
                 self.guider.stop_guiding()
-                self.guider.loop_done.wait(timeout=10)
+                self.clock.wait(self.guider.loop_done, 10)
             return img_count, ticket.num
 
         else:
@@ -545,19 +645,30 @@ class ObservationRun:
             if len(ticket.exp_time) <= 1:
                 ticket.exp_time *= len(ticket.filter)
             for i in range(len(ticket.filter)):
-                img_count_filter = self.take_images(ticket.name, ticket.num, [ticket.exp_time[i]],
-                                                    [ticket.filter[i]], ticket.end_time, self.image_directories[ticket],
+                num = ticket.num - len(journal.completed(ticket.name, 'light', ticket.filter[i]))
+                if num <= 0:
+                    continue
+                img_count_filter = self.take_images(ticket.name, num, [ticket.exp_time[i]],
+                                                    [ticket.filter[i]], end_time, self.image_directories[ticket],
                                                     False, header_info)
                 img_count += img_count_filter
             if self.continuous_focus_toggle:
                 self.focus_procedures.stop_constant_focusing()
             if ticket.self_guide:
                 self.guider.stop_guiding()
-                self.guider.loop_done.wait(timeout=10)
+                self.clock.wait(self.guider.loop_done, 10)
             return img_count, ticket.num * len(ticket.filter)
 
     def take_images(self, name, num, exp_time, _filter, end_time, path, cycle_filter, header_info):
         """
+        Description
+        -----------
+        Takes the images for a ticket.  While each image is being exposed and read out, the next image's name and
+        header are prepared and the hardware and weather checks are run, so the camera is kept busy.  The dead time
+        between images is logged.  No image is started while a weather warning says the weather will turn before it
+        would be finished (see hold_for_weather).  Each image is recorded in the run journal of the save path as it
+        is planned, started and saved, and numbering continues from the images already saved there.
+
         Parameters
         ----------
         name : STR
@@ -576,6 +687,8 @@ class ObservationRun:
         cycle_filter : BOOL
             If True, camera will cycle filter after each exposre,
             if False, camera will cycle filter after num value has been reached.
+        header_info : DICT
+            General header info for the ticket, from get_general_header_info.
 
         Returns
         -------
@@ -585,60 +698,108 @@ class ObservationRun:
         num_filters = len(_filter)
         num_exptimes = len(exp_time)
         # num_filters and num_exptimes should always be equal, not sure if we need both
-        image_num = 1
-        names_list = []
+        # Numbering picks up after the last image saved for this target, if it was already observed (like before a
+        # crash).  Images from before the run journal was kept are found by listing the directory, and are added
+        # to the journal so that only happens once.
+        journal = run_journal.get_run_journal(path)
         image_base = {}
-        i = 0
-        while i < num:
-            logging.debug('In take_images loop')
-            if end_time <= datetime.datetime.now(self.tz):
-                logging.info("The observations end time of {} has passed.  "
-                             "Stopping observation of {}.".format(end_time, name))
-                break
-            if not self.everything_ok():
-                break
+        for f, exp in zip(_filter, exp_time):
+            image_base[f] = journal.next_index(name, 'light', f, exp)
+            if image_base[f] == 1 and os.path.exists(os.path.join(path, self._image_name(name, exp, f, 1))):
+                for fname in os.listdir(path):
+                    if n := re.search('{0:s}_{1:.3f}s_{2:s}-(.+?).fits'.format(name, exp, str(f).upper()), fname):
+                        journal.plan(name, 'light', f, exp, int(n.group(1)), os.path.join(path, fname),
+                                     status='done')
+                image_base[f] = journal.next_index(name, 'light', f, exp)
+
+        def prepare(i, jd_start):
+            # Name and header of image i, if it starts being exposed at jd_start
             current_filter = _filter[i % num_filters]
             current_exp = exp_time[i % num_exptimes]
-            image_name = "{0:s}_{1:.3f}s_{2:s}-{3:04d}.fits".format(name, current_exp, str(current_filter).upper(),
-                                                                    image_num)
-
-            if i == 0 and os.path.exists(os.path.join(path, image_name)):
-                # Checks if images already exist (in the event of a crash)
-                for f, exp in zip(_filter, exp_time):
-                    names_list = [0]
-                    for fname in os.listdir(path):
-                        if n := re.search('{0:s}_{1:.3f}s_{2:s}-(.+?).fits'.format(name, exp, str(f).upper()),
-                                          fname):
-                            names_list.append(int(n.group(1)))
-                    image_base[f] = max(names_list) + 1
-
-                image_name = "{0:s}_{1:.3f}s_{2:s}-{3:04d}.fits".format(name, current_exp, str(current_filter).upper(),
-                                                                        image_base[current_filter])
-            header_info_i = self.add_timed_header_info(header_info, name, current_exp)
-            self.camera.onThread(self.camera.expose,
-                                 current_exp, self.filterwheel_dict[current_filter],
-                                 os.path.join(path, image_name), "light", **header_info_i)
-            self.camera.image_done.wait(timeout=int(current_exp)*2 + 60)
-
-            if self.crash_check('MaxIm_DL.exe'):
-                continue
-
             if cycle_filter:
-                if names_list:
-                    image_num = int(image_base[_filter[(i + 1) % num_filters]] + ((i + 1) / num_filters))
-                else:
-                    image_num = int(1 + ((i + 1)/num_filters))
-            elif not cycle_filter:
-                if names_list:
-                    image_num = image_base[_filter[(i + 1) % num_filters]] + (i + 1)
-                else:
-                    image_num += 1
-            i += 1
+                image_num = int(image_base.get(current_filter, 1) + i / num_filters)
+            else:
+                image_num = image_base.get(current_filter, 1) + i
+            header_info_i = self.add_timed_header_info(header_info, name, current_exp,
+                                                       jd_utc=jd_start + (current_exp/2) / (24*60*60))
+            image_name = self._image_name(name, current_exp, current_filter, image_num)
+            journal.plan(name, 'light', current_filter, current_exp, image_num, os.path.join(path, image_name))
+            return current_exp, current_filter, image_name, header_info_i
+
+        # The next image's name, header and the health checks are all done while the camera is busy, so that the next
+        # exposure can start as soon as the last one is saved
+        sequencer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='Sequencer-Th')
+        dead_times = []
+        readout = 0
+        frame = None
+        last_end = None
+        i = 0
+        try:
+            while i < num:
+                logging.debug('In take_images loop')
+                if not self.hold_for_weather(max(exp_time) + readout):
+                    break
+                if self.replanned.is_set():
+                    break
+                if end_time <= self.clock.now(self.tz):
+                    logging.info("The observations end time of {} has passed.  "
+                                 "Stopping observation of {}.".format(end_time, name))
+                    break
+                if frame is None:
+                    if not self.everything_ok():
+                        break
+                    frame = prepare(i, time_utils.convert_to_jd_utc(self.clock.now(datetime.timezone.utc)))
+                current_exp, current_filter, image_name, header_info_i = frame
+                jd_start = time_utils.convert_to_jd_utc(self.clock.now(datetime.timezone.utc))
+                start = self.clock.monotonic()
+                header_info_i = self.shift_header_time(header_info_i, jd_start + (current_exp/2) / (24*60*60))
+                journal.start(os.path.join(path, image_name))
+                camera = self.camera
+                exposure = camera.onThread(camera.expose,
+                                           current_exp, self.filterwheel_dict[current_filter],
+                                           os.path.join(path, image_name), "light", **header_info_i)
+                if last_end is not None:
+                    dead_times.append(start - last_end)
+                    logging.debug('Dead time before {}: {:.2f} s'.format(image_name, dead_times[-1]))
+
+                health = sequencer.submit(self.everything_ok)
+                upcoming = sequencer.submit(prepare, i + 1, jd_start + (current_exp + readout) / (24*60*60)) \
+                    if i + 1 < num else None
+                taken = bool(exposure.get(timeout=int(current_exp)*2 + 60))
+                if not taken and not self.process_watcher.responsive['MaxIm_DL.exe'].isSet():
+                    # MaxIm stopped responding during the exposure, and is being restarted by the process watcher
+                    self.clock.wait(self.process_watcher.responsive['MaxIm_DL.exe'], 120)
+                journal.finish(os.path.join(path, image_name), taken)
+                # Dead time is how long the camera sits idle between saving one image and starting the next
+                last_end = self.clock.monotonic()
+                # Readout and saving, used to predict when the next image will start
+                readout = max(last_end - start - current_exp, 0)
+
+                ok = health.result()
+                if self.camera is not camera:
+                    # MaxIm was restarted by the process watcher during the exposure, so the same image is retaken
+                    # with the restarted camera
+                    frame = None
+                    continue
+                i += 1
+                if not ok:
+                    break
+                frame = upcoming.result() if upcoming else None
+        finally:
+            sequencer.shutdown(wait=False)
+        if dead_times:
+            logging.info('Took {} images of {}.  Dead time between exposures: mean {:.2f} s, max {:.2f} s'.format(
+                i, name, sum(dead_times) / len(dead_times), max(dead_times)))
         return i
 
+    @staticmethod
+    def _image_name(name, exp_time, _filter, image_num):
+        return "{0:s}_{1:.3f}s_{2:s}-{3:04d}.fits".format(name, exp_time, str(_filter).upper(), image_num)
+
     def get_general_header_info(self, ticket):
         ra2k, dec2k = ticket.ra, ticket.dec
-        ra_ap, dec_ap = conversion_utils.convert_j2000_to_apparent(ra2k, dec2k)
+        point = self._ephemeris(ticket.name, ra2k, dec2k).at(self.clock.now(datetime.timezone.utc))
+        ra_ap, dec_ap = point.ra, point.dec
         header_info = {
             'OBJECT': ticket.name,
             'OBSERVER': 'Omegalambda automation code',
@@ -653,81 +814,108 @@ class ObservationRun:
         }
         return header_info
 
-    def add_timed_header_info(self, header_info_orig, name, exp_time):
+    def add_timed_header_info(self, header_info_orig, name, exp_time, jd_utc=None):
         header_info = copy.deepcopy(header_info_orig)
         # Define for mid-exposure time
-        header_info['JD_UTC'] = time_utils.convert_to_jd_utc() + (exp_time/2) / (24*60*60)
-        epoch_datetime = Time(header_info['JD_UTC'], format='jd', scale='utc').datetime
-        epoch_datetime = pytz.utc.localize(epoch_datetime)
+        header_info['JD_UTC'] = jd_utc or time_utils.convert_to_jd_utc(self.clock.now(datetime.timezone.utc)) + \
+            (exp_time/2) / (24*60*60)
         bjd_tdb = time_utils.convert_to_bjd_tdb(header_info['JD_UTC'], name, self.config_dict.site_latitude,
                                                 self.config_dict.site_longitude,
                                                 self.config_dict.site_altitude,
-                                                header_info['RAOBJ2K'], header_info['DECOBJ2K'])
+                                                header_info['RAOBJ2K'], header_info['DECOBJ2K'], timeout=0)
         if bjd_tdb:
             header_info['BJD_TDB'] = bjd_tdb
-        header_info['AZ_OBJ'], header_info['ALT_OBJ'] = conversion_utils.convert_radec_to_altaz(header_info['RAOBJ2K'], header_info['DECOBJ2K'],
-                                                          self.config_dict.site_latitude,
-                                                          self.config_dict.site_longitude, time=epoch_datetime)
+        point = self._ephemeris(name, header_info['RAOBJ2K'], header_info['DECOBJ2K']).at(header_info['JD_UTC'])
+        header_info['AZ_OBJ'], header_info['ALT_OBJ'] = point.az, point.alt
         header_info['ZD_OBJ'] = 90 - header_info['ALT_OBJ']
-        header_info['AIRMASS'] = conversion_utils.airmass(header_info['ALT_OBJ'])
+        header_info['AIRMASS'] = point.airmass
+        header_info['HA_OBJ'] = point.ha
+        header_info['MOONSEP'] = point.moon_separation
+        return header_info
 
-        lmst = time_utils.get_local_sidereal_time(self.config_dict.site_longitude, date=epoch_datetime)
-        ha = (lmst - header_info['RAOBJ2K']) % 24
+    def _ephemeris(self, name, ra, dec):
+        # Targets that are not on a ticket get an ephemeris for the next day, the first time they are needed
+        if name not in self.ephemerides:
+            jd = time_utils.convert_to_jd_utc(self.clock.now(datetime.timezone.utc))
+            self.ephemerides[name] = ephemeris.build_ephemerides([(ra, dec)], jd, jd + 1)[0]
+        return self.ephemerides[name]
+
+    @staticmethod
+    def shift_header_time(header_info_orig, jd_utc):
+        """
+        Description
+        -----------
+        Moves a header made by add_timed_header_info to a slightly different mid-exposure time, for when an image
+        starts a little earlier or later than predicted.  The BJD_TDB and hour angle are shifted along with the JD;
+        the altitude and azimuth change too slowly to matter over a few seconds.
+
+        Parameters
+        ----------
+        header_info_orig : DICT
+            Header from add_timed_header_info.
+        jd_utc : FLOAT
+            Actual mid-exposure time as a Julian date (UTC).
+
+        Returns
+        -------
+        header_info : DICT
+            A copy of the header at the new time.
+
+        """
+        header_info = dict(header_info_orig)
+        shift = jd_utc - header_info['JD_UTC']
+        header_info['JD_UTC'] = jd_utc
+        if 'BJD_TDB' in header_info:
+            header_info['BJD_TDB'] += shift
+        # Sidereal hours per solar day
+        ha = (header_info['HA_OBJ'] + shift * 24 * 1.0027379093) % 24
         if ha > 12:
             ha -= 24
         header_info['HA_OBJ'] = ha
         return header_info
 
-    def crash_check(self, program):
+    def restart_program(self, program):
         """
         Description
         -----------
-        Checks to see if any important programs are not responding, and if so,
-        restarts them.
+        Kills and restarts a program that has stopped responding, along with the hardware thread that talks to it.
+        Called by the process watcher, on its own thread, as soon as it sees the program stop responding, so
+        nothing has to check for it.  An exposure that was cut short by a MaxIm restart is taken again by
+        take_images.
 
         Parameters
         ----------
         program : STR
-            Name of the program to check for.
+            Name of the program to restart.
 
         Returns
         -------
         bool
-            True if the program is not responding and needs to be restarted, otherwise
-            False.
+            True if the program was restarted, False if it is not one that can be.
 
         """
-        prog_dict = {'MaxIm_DL.exe': [self.camera, Camera], 'TheSkyX.exe': [self.telescope, Telescope],
-                     'ASCOMDome.exe': [self.dome, Dome]}
+        prog_dict = {'MaxIm_DL.exe': 'camera', 'TheSkyX.exe': 'telescope', 'ASCOMDome.exe': 'dome'}
         if program not in prog_dict.keys():
-            logging.error('Unrecognized program name to perform a crash check for.')
-            return False
-        cmd = 'tasklist /FI "IMAGENAME eq %s" /FI "STATUS eq running"' % program
-        status = subprocess.Popen(cmd, stdout=subprocess.PIPE).stdout.read()
-        responding = program in str(status)
-
-        if not responding:
-            prog_dict[program][0].crashed.set()
-            logging.error('{} is not responding.  Restarting...'.format(program))
-            time.sleep(5)
-            prog_dict[program][0].crashed.clear()
-            subprocess.call('taskkill /f /im {}'.format(program))
-            time.sleep(5)
-            prog_dict[program][0] = prog_dict[program][1]()
-            prog_dict[program][0].start()
-            time.sleep(5)
-            if program in ('MaxIm_DL.exe', 'TheSkyX.exe') and self.current_ticket.self_guide is True:
-                self.guider.stop_guiding()
-                self.guider.onThread(self.guider.stop)
-                time.sleep(5)
-                self.guider = Guider(self.camera, self.telescope)
-                self.guider.start()
-                time.sleep(5)
-                self.guider.onThread(self.guider.guiding_procedure,
-                                     self.image_directories[self.current_ticket])
-            return True
-        else:
+            logging.error('Unrecognized program name to restart.')
             return False
+        device = getattr(self, prog_dict[program])
+        device.crashed.set()
+        logging.error('{} is not responding.  Restarting...'.format(program))
+        self.clock.sleep(5)
+        device.crashed.clear()
+        backend.kill_program(program)
+        self.clock.sleep(5)
+        self.restart(prog_dict[program])
+        self.process_watcher.restarted(program)
+        self.clock.sleep(5)
+        if program in ('MaxIm_DL.exe', 'TheSkyX.exe') and self.current_ticket is not None \
+                and self.current_ticket.self_guide is True:
+            self.guider.stop_guiding()
+            self.guider.onThread(self.guider.stop)
+            self.clock.sleep(5)
+            # Also starts guiding the current ticket again
+            self.restart('guider')
+        return True
 
     def take_calibration_images(self, beginning=False):
         """
@@ -746,24 +934,18 @@ class ObservationRun:
         """
         if not self.camera.cooler_status:
             self.camera.onThread(self.camera.cooler_set, True)
-            self.camera.onThread(self.camera.cooler_ready)
-            time.sleep(2)
-            self.camera.cooler_settle.wait()
+            self.camera.onThread(self.camera.cooler_ready).get()
         for i in range(len(self.observation_request_list)):
             logging.debug('In calibration loop: taking calibration images for index {}, {}'.format(i, self.observation_request_list[i].name))
             if self.calibrated_tickets[i]:
                 logging.debug('The target\'s calibration images have already been collected...skipping to next.')
                 continue
-            if (self.observation_request_list[i].start_time >= datetime.datetime.now(self.tz)) and (beginning is False):
+            if (self.observation_request_list[i].start_time >= self.clock.now(self.tz)) and (beginning is False):
                 logging.debug('The start time of the ticket has not passed yet, ending calibration loop.')
                 break
             logging.debug('Calibration ticket start time is {}'.format(self.observation_request_list[i].start_time.strftime('%Y-%m-%dT%H:%M:%S%z')))
-            self.calibration.onThread(self.calibration.take_flats, self.observation_request_list[i])
-            time.sleep(2)
-            self.calibration.flats_done.wait()
-            self.calibration.onThread(self.calibration.take_darks, self.observation_request_list[i])
-            time.sleep(2)
-            self.calibration.darks_done.wait()
+            self.calibration.onThread(self.calibration.take_flats, self.observation_request_list[i]).get()
+            self.calibration.onThread(self.calibration.take_darks, self.observation_request_list[i]).get()
             self.calibrated_tickets[i] = 1
             logging.debug('Calibration progress:\n Calibrated tickets: {}'.format(self.calibrated_tickets))
             # Doesn't work?
@@ -788,7 +970,7 @@ class ObservationRun:
         """
         if self.shutdown_toggle or self.conditions.weather_alert.isSet():
             self._shutdown_procedure(calibration=calibration)
-            time.sleep(1)
+            self.clock.sleep(1)
             self.stop_threads()
         else:
             return
@@ -811,6 +993,7 @@ class ObservationRun:
         self.flatlamp.onThread(self.flatlamp.disconnect)
 
         self.monitor.run_th_monitor.clear()                 #Have to stop this first otherwise it will restart everything
+        self.process_watcher.stop()
         self.conditions.stop.set()
         self.focus_procedures.stop_constant_focusing()      # Should already be stopped, but just in case
         self.guider.stop_guiding()                          # Should already be stopped, but just in case
@@ -823,8 +1006,9 @@ class ObservationRun:
         self.flatlamp.onThread(self.flatlamp.stop)
         self.calibration.onThread(self.calibration.stop)
         self.gui.close_window.set()
+        self.plotter.stop()
         logging.debug(' Shutting down thread monitor. Number of thread restarts: {}'.format(self.monitor.n_restarts))
-        time.sleep(5)
+        self.clock.sleep(5)
 
     def _shutdown_procedure(self, calibration, cooler=True):
         """
@@ -845,13 +1029,12 @@ class ObservationRun:
         """
         logging.info("Shutting down observatory.")
         self.shutdown_event.set()
-        time.sleep(5)
+        self.clock.sleep(5)
         self.dome.onThread(self.dome.slave_dome_to_scope, False)
         self.dome.onThread(self.dome.park)
-        self.dome.onThread(self.dome.move_shutter, 'close')
+        shutter = self.dome.onThread(self.dome.move_shutter, 'close')
         self._park_procedure()
-        self.dome.move_done.wait()
-        self.dome.shutter_done.wait()
+        shutter.get()
         self._park_procedure()      # Backup in case a pulse guide interrupted the last park
         if calibration:
             logging.info('Beginning flat and dark collection...')
@@ -871,38 +1054,47 @@ class ObservationRun:
         None.
         """
         self.shutdown_event.set()
-        time.sleep(5)
+        self.clock.sleep(5)
         self.dome.onThread(self.dome.slave_dome_to_scope, False)
         self.dome.onThread(self.dome.park)
-        self.dome.onThread(self.dome.move_shutter, 'close')
-        time.sleep(2)
-        self.dome.shutter_done.wait()
-        self.dome.move_done.wait()
-        time.sleep(2)
+        self.dome.onThread(self.dome.move_shutter, 'close').get()
         self.camera.onThread(self.camera.cooler_set, False)
 
-    def threadcheck(self):
+    def threadcheck(self, snapshot=None):
         '''
         Description
         ----------
         Checks to see if self.monitor has raised a crashed thread,
         Restarts the crashed threads if there are any
-        
+
+        Parameters
+        ----------
+        snapshot : HealthSnapshot, optional
+            Health snapshot to read the crashed threads and telescope limits from.  The default is None, which uses
+            the monitor's latest one if it is recent, or else asks the monitor directly.
+
         Returns
         -------
         None
         '''
-        threadlist = self.monitor.crashed
+        snapshot = snapshot or self.monitor.health()
+        threadlist = list(snapshot.crashed if snapshot else self.monitor.crashed)
         if threadlist and len(threadlist) != 0:
             for thname in threadlist:
+                # The snapshot can be up to a few seconds old, so a thread may already have been restarted since
+                if thname in self.monitor.threadlist and self.monitor.threadlist[thname].is_alive():
+                    if thname in self.monitor.crashed:
+                        self.monitor.crashed.remove(thname)
+                    continue
                 self.restart(thname)
         else:
             logging.debug('All threads OK')
-        if not self.monitor.telescope_coords_check:
+        coords_check = snapshot.telescope_coords_check if snapshot else self.monitor.telescope_coords_check
+        if not coords_check:
             logging.critical('Telescope coordinates are outside of physical limits, most likely due to passive '
                              'tracking.  Performing critical shutdown.')
             self._shutdown_procedure(calibration=False)
-            time.sleep(1)
+            self.clock.sleep(1)
             self.stop_threads()
             raise RuntimeError('Critical shutdown due to telescope tracking outside of physical limits.')
 
@@ -923,11 +1115,17 @@ class ObservationRun:
             self.camera.start()
             self.monitor.n_restarts['camera'] += 1
             self.monitor.threadlist['camera'] = self.camera
+            # The higher level structures must take their images with the new camera
+            self.focus_procedures.camera = self.camera
+            self.calibration.camera = self.camera
+            self.guider.camera = self.camera
         elif thname == 'telescope':
             self.telescope = Telescope()
+            self.telescope.ephemerides = list(self.ephemerides.values())
             self.telescope.start()
             self.monitor.n_restarts['telescope'] += 1
             self.monitor.threadlist['telescope'] = self.telescope
+            self.guider.telescope = self.telescope
             self.telescope.live_connection.wait(timeout=15)
         elif thname == 'dome':
             self.dome = Dome()
@@ -940,7 +1138,7 @@ class ObservationRun:
             self.monitor.n_restarts['flatlamp'] += 1
             self.monitor.threadlist['flatlamp'] = self.flatlamp
         elif thname == 'conditions':
-            self.conditions = Conditions(self.plot_lock)
+            self.conditions = Conditions(self.plotter)
             self.conditions.start()
             self.monitor.n_restarts['conditions'] += 1
             self.monitor.threadlist['conditions'] = self.conditions
@@ -953,7 +1151,7 @@ class ObservationRun:
                 if self.current_ticket.self_guide:
                     self.guider.onThread(self.guider.guiding_procedure, self.image_directories[self.current_ticket])
         elif thname == 'focus_procedures':
-            self.focus_procedures = FocusProcedures(self.focuser, self.camera, self.conditions, self.shutdown_event, self.plot_lock)
+            self.focus_procedures = FocusProcedures(self.focuser, self.camera, self.conditions, self.shutdown_event, self.plotter)
             self.focus_procedures.start()
             self.monitor.n_restarts['focus_procedures'] += 1
             self.monitor.threadlist['focus_procedures'] = self.focus_procedures
@@ -967,6 +1165,13 @@ class ObservationRun:
             self.gui.start()
             self.monitor.n_restarts['gui'] += 1
             self.monitor.threadlist['gui'] = self.gui
+        elif thname == 'plotter':
+            self.plotter = PlotRenderer()
+            self.plotter.start()
+            self.monitor.n_restarts['plotter'] += 1
+            self.monitor.threadlist['plotter'] = self.plotter
+            self.conditions.plotter = self.plotter
+            self.focus_procedures.plotter = self.plotter
         
         if thname in self.monitor.crashed:
             self.monitor.crashed.remove(thname)
@@ -0,0 +1,377 @@
+# Plans the night: which ticket to observe when, around the telescope limits, slews and priorities
+import time
+import random
+import datetime
+import logging
+import numpy as np
+from typing import List, NamedTuple
+
+from ..common.IO import config_reader
+from ..common.util import conversion_utils, ephemeris
+from ..common.util.clock import get_clock
+from ..common.datatype.observation_ticket import ObservationTicket
+
+
+class Block(NamedTuple):
+    ticket: ObservationTicket
+    start: datetime.datetime
+    end: datetime.datetime
+    overhead: float
+
+
+def _epoch(date):
+    return date.timestamp()
+
+
+def _datetime(epoch, tz):
+    return datetime.datetime.fromtimestamp(epoch, tz)
+
+
+class Scheduler:
+
+    def __init__(self, tickets, slot=300, readout=10, slew_rate=4.0, settle=10, acquisition=120, ephemerides=None):
+        """
+        Description
+        -----------
+        Splits the night into time slots and plans which ticket to observe in each.  The altitude and hour angle of
+        every ticket are looked up once, at every slot boundary, in the tickets' ephemerides; a ticket can only be
+        observed in a slot inside its start and end times where it stays within the telescope limits at both ends
+        (altitude above 15 degrees, hour angle within 8h 45m, as in Telescope.__check_coordinate_limit).  Planning
+        then only walks those arrays, so replanning after a weather closure or a failed target is quick.
+
+        In each slot the ticket with the highest priority is observed, the one with the least spare time left to
+        finish in among equals, then the one at the lowest airmass.  Every change of target costs a slew plus the
+        acquisition (centering, focusing) before any more images are taken, so the ticket being observed is kept
+        until it is done, a higher priority ticket can be observed, or another one of the same priority gains
+        enough to make up for the change (see worth_leaving).
+
+        Parameters
+        ----------
+        tickets : LIST
+            ObservationTicket objects to plan.
+        slot : INT or FLOAT, optional
+            Length of the time slots in seconds.  The default is 300.
+        readout : INT or FLOAT, optional
+            Readout and saving time of each image in seconds.  The default is 10.
+        slew_rate : FLOAT, optional
+            Slew speed of the telescope on each axis, in degrees per second.  The default is 4.
+        settle : INT or FLOAT, optional
+            Settle time after each slew in seconds.  The default is 10.
+        acquisition : INT or FLOAT, optional
+            Time between arriving at a new target and starting its images, in seconds.  The default is 120.
+        ephemerides : DICT, optional
+            Ephemeris of each ticket, keyed by ticket, from ephemeris.build_ticket_ephemerides.  The default is None,
+            which builds them.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.tickets = list(tickets)
+        self.slot = slot
+        self.readout = readout
+        self.slew_rate = slew_rate
+        self.settle = settle
+        self.acquisition = acquisition
+        self.tz = self.tickets[0].start_time.tzinfo if self.tickets else datetime.timezone.utc
+        self.clock = get_clock()
+
+        self.starts = np.array([_epoch(ticket.start_time) for ticket in self.tickets])
+        self.ends = np.array([_epoch(ticket.end_time) for ticket in self.tickets])
+        self.priorities = np.array([ticket.priority for ticket in self.tickets], dtype=float)
+        self.image_times = np.array([self._image_time(ticket) for ticket in self.tickets])
+        self.required = np.array([self.images(ticket) for ticket in self.tickets]) * self.image_times
+        self.remaining = self.required.copy()
+        self.excluded = np.zeros(len(self.tickets), dtype=bool)
+        self.blocks = []
+
+        first = self.starts.min() if self.tickets else self.clock.time()
+        last = self.ends.max() if self.tickets else first
+        self.times = np.arange(first, last + slot, slot)
+        self.dec = np.array([ticket.dec for ticket in self.tickets], dtype=float)
+        if ephemerides is None:
+            ephemerides = ephemeris.build_ticket_ephemerides(self.tickets, margin=slot / 60 + 1)
+        samples = [ephemerides[ticket].sample(2440587.5 + self.times / 86400) for ticket in self.tickets]
+        (self.ha, alt, self.airmass) = (np.array([sample[column] for sample in samples]).reshape(-1, len(self.times))
+                                        for column in ('ha', 'alt', 'airmass'))
+        limits = (alt > 15) & (np.abs(self.ha) < 8.75)
+        # Slot s runs from times[s] to times[s + 1]
+        self.observable = limits[:, :-1] & limits[:, 1:] & (self.starts[:, None] < self.times[1:]) & \
+            (self.ends[:, None] > self.times[:-1])
+        # Seconds in which each ticket can still be observed, from each slot to the end of the night
+        self.available = np.cumsum((self.observable * slot)[:, ::-1], axis=1)[:, ::-1]
+
+    def _image_time(self, ticket):
+        exp_times = ticket.exp_time if type(ticket.exp_time) is list else [ticket.exp_time]
+        return float(np.mean(exp_times)) + self.readout
+
+    @staticmethod
+    def images(ticket):
+        # Non-cycling tickets take num images in each filter, see ObservationRun.run_ticket
+        filters = ticket.filter if type(ticket.filter) is list else [ticket.filter]
+        return ticket.num if ticket.cycle_filter else ticket.num * len(filters)
+
+    def _index(self, ticket):
+        return self.tickets.index(ticket)
+
+    def slew_time(self, i, j, s):
+        """
+        Parameters
+        ----------
+        i : INT or None
+            Index of the ticket the telescope is pointed at, or None if unknown (like when parked).
+        j : INT or NUMPY ARRAY
+            Index, or indices, of the tickets to slew to.
+        s : INT
+            Slot in which the slew happens.
+
+        Returns
+        -------
+        FLOAT or NUMPY ARRAY
+            Seconds from leaving ticket i to starting images of ticket j: the slew, with both axes moving at once,
+            plus settling and acquisition.
+
+        """
+        if i is None:
+            return self.settle + self.acquisition + 0 * np.asarray(j, dtype=float)
+        distance = np.maximum(np.abs(self.ha[i, s] - self.ha[j, s]) * 15, np.abs(self.dec[i] - self.dec[j]))
+        return distance / self.slew_rate + self.settle + self.acquisition
+
+    def worth_leaving(self, i, j, overhead, s, remaining):
+        """
+        Description
+        -----------
+        Whether to leave the ticket being observed for another one of the same priority.  Worth it if the other
+        one can only still be finished if it is started in this slot, and has less spare time than the current one
+        by more than the overhead; or if its lower airmass, over the next few slots, makes up for the time lost to
+        the overhead (as images per airmass), unless leaving would cost the current ticket the time it needs to
+        finish.  The gain is only counted over a few slots, since every switch costs science time that the lower
+        airmass only pays back for as long as it lasts.
+
+        Parameters
+        ----------
+        i : INT
+            Index of the ticket being observed.
+        j : NUMPY ARRAY
+            Indices of the other tickets.
+        overhead : NUMPY ARRAY
+            Seconds of slewing and acquisition before images of each other ticket could start.
+        s : INT
+            Slot to leave in.
+        remaining : NUMPY ARRAY
+            Seconds of images each ticket still needs, in this plan.
+
+        Returns
+        -------
+        NUMPY ARRAY
+            True for each other ticket that is worth leaving for.
+
+        """
+        slack_i = self.available[i, s] - remaining[i]
+        slack_j = self.available[j, s] - remaining[j]
+        urgent = (slack_j >= 0) & (slack_j < self.slot) & (slack_j + overhead < slack_i)
+        observed = np.minimum(np.minimum(remaining[j], self.available[j, s]), 3 * self.slot)
+        better = (observed > overhead) & (self.airmass[i, s] * (observed - overhead) > self.airmass[j, s] * observed)
+        if slack_i >= 0:
+            # Coming back costs another slew, on top of the time spent on the other ticket
+            better &= slack_i >= observed + 2 * overhead
+        return urgent | better
+
+    def plan(self, now=None, position=None) -> List[Block]:
+        """
+        Description
+        -----------
+        Plans the rest of the night, from now, for the time each ticket still needs.
+
+        Parameters
+        ----------
+        now : datetime.datetime, optional
+            Time to plan from.  The default is None, which is the current time.
+        position : ObservationTicket, optional
+            Ticket the telescope is pointed at, so that staying on it costs no slew.  The default is None.
+
+        Returns
+        -------
+        blocks : LIST
+            Blocks (ticket, start, end, overhead) in time order.  Each starts with overhead seconds of slewing and
+            acquisition, then images until the end.
+
+        """
+        t = _epoch(now) if now is not None else self.clock.time()
+        current = self._index(position) if position is not None and position in self.tickets else None
+        remaining = self.remaining.copy()
+        blocks = []
+        first = max(int(np.searchsorted(self.times, t, side='right')) - 1, 0)
+        for s in range(first, len(self.times) - 1):
+            if self.times[s + 1] <= t:
+                continue
+            candidates = np.flatnonzero(self.observable[:, s] & (remaining > 0) & ~self.excluded)
+            starts = np.maximum(max(t, self.times[s]), self.starts[candidates])
+            overheads = np.where(candidates == current, 0, self.slew_time(current, candidates, s))
+            # Only targets that can be reached in time to take images in this slot
+            sciences = np.minimum(self.times[s + 1], self.ends[candidates]) - starts - overheads
+            useful = sciences > 0
+            (candidates, starts, overheads, sciences) = (candidates[useful], starts[useful], overheads[useful],
+                                                         sciences[useful])
+            if not candidates.size:
+                continue
+            best = np.flatnonzero(self.priorities[candidates] == self.priorities[candidates].max())
+            slack = self.available[candidates[best], s] - remaining[candidates[best]]
+            best = best[np.lexsort((self.airmass[candidates[best], s], slack))]
+            k = best[0]
+            staying = np.flatnonzero(candidates == current)
+            if staying.size and staying[0] in best:
+                others = best[best != staying[0]]
+                leave = self.worth_leaving(current, candidates[others], overheads[others], s, remaining)
+                k = others[np.argmax(leave)] if leave.any() else staying[0]
+            (choice, start, overhead) = (candidates[k], starts[k], overheads[k])
+            current = choice
+            science = min(sciences[k], remaining[choice])
+            remaining[choice] -= science
+            t = start + overhead + science
+            if blocks and blocks[-1][0] == choice and blocks[-1][2] == start:
+                blocks[-1][2] = t
+            else:
+                blocks.append([choice, start, t, overhead])
+        self.blocks = [Block(self.tickets[i], _datetime(start, self.tz), _datetime(end, self.tz), overhead)
+                       for (i, start, end, overhead) in blocks]
+        return self.blocks
+
+    def record(self, ticket, images):
+        """
+        Description
+        -----------
+        Takes the time of images that were taken off what a ticket still needs.
+
+        Parameters
+        ----------
+        ticket : ObservationTicket
+            The ticket that was observed.
+        images : INT
+            Number of images taken.
+
+        Returns
+        -------
+        None.
+
+        """
+        i = self._index(ticket)
+        self.remaining[i] = max(self.remaining[i] - images * self.image_times[i], 0)
+
+    def exclude(self, ticket):
+        """
+        Description
+        -----------
+        Leaves a ticket out of any later plans, like after it could not be slewed to.
+
+        Parameters
+        ----------
+        ticket : ObservationTicket
+            The ticket to drop.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.excluded[self._index(ticket)] = True
+
+    def science_time(self, blocks=None):
+        """
+        Returns
+        -------
+        FLOAT
+            Seconds of images in a plan (the default is the last one), not counting slews and acquisition.
+
+        """
+        blocks = self.blocks if blocks is None else blocks
+        return sum((block.end - block.start).total_seconds() - block.overhead for block in blocks)
+
+
+def _in_order_science_time(scheduler):
+    # Images that walking the tickets in start time order would get, each until it is done or its end time, counting
+    # only the time inside the telescope limits
+    t = scheduler.times[0]
+    current = None
+    science = 0
+    for i in np.argsort(scheduler.starts, kind='stable'):
+        t = max(t, scheduler.starts[i])
+        if t >= scheduler.ends[i]:
+            continue
+        s = min(int(np.searchsorted(scheduler.times, t, side='right')) - 1, len(scheduler.times) - 2)
+        t += scheduler.slew_time(current, i, s)
+        current = i
+        end = min(scheduler.ends[i], t + scheduler.required[i])
+        inside = (scheduler.times[1:] > t) & (scheduler.times[:-1] < end) & scheduler.observable[i]
+        science += np.sum(np.minimum(scheduler.times[1:][inside], end) - np.maximum(scheduler.times[:-1][inside], t))
+        t = max(t, end)
+    return science
+
+
+def benchmark_scheduler(num_tickets=300, cycles=5, seed=0):
+    """
+    Description
+    -----------
+    Plans a night of random tickets, spread over the whole sky with random windows (within 11 hours of sunset),
+    exposure times and priorities, at the configured site, and times the first plan and replanning from part way through the night after a
+    weather closure and a failed target.  Also compares the science time planned with what walking the tickets in
+    start time order would get.
+
+    Parameters
+    ----------
+    num_tickets : INT, optional
+        Number of tickets.  The default is 300.
+    cycles : INT, optional
+        Number of replans to time.  The default is 5.
+    seed : INT, optional
+        Seed for the random tickets.  The default is 0.
+
+    Returns
+    -------
+    results : DICT
+        "setup", "plan" and "replan" (slowest) times in seconds, and the hours of images planned ("science") and
+        that walking the tickets in order would get ("in_order").
+
+    """
+    config = config_reader.get_config()
+    rng = random.Random(seed)
+    sunset = conversion_utils.get_sunset(datetime.datetime.now(datetime.timezone.utc), config.site_latitude,
+                                         config.site_longitude)
+    tickets = []
+    for n in range(num_tickets):
+        start = sunset + datetime.timedelta(minutes=rng.uniform(0, 540))
+        end = min(start + datetime.timedelta(minutes=rng.uniform(30, 360)), sunset + datetime.timedelta(hours=11))
+        ticket = ObservationTicket(name='Bench{:04d}'.format(n), ra=rng.uniform(0, 24),
+                                   dec=rng.uniform(-20, 89), start_time=start.strftime('%Y-%m-%d %H:%M:%S%z'),
+                                   end_time=end.strftime('%Y-%m-%d %H:%M:%S%z'), _filter='r',
+                                   num=rng.randint(10, 200), exp_time=rng.choice([5, 10, 30, 60, 120]),
+                                   self_guide=True, guide=False, cycle_filter=True, priority=rng.randint(1, 3))
+        tickets.append(ticket)
+    t = time.perf_counter()
+    scheduler = Scheduler(tickets)
+    results = {'setup': time.perf_counter() - t}
+    t = time.perf_counter()
+    blocks = scheduler.plan(now=sunset)
+    results['plan'] = time.perf_counter() - t
+    results['science'] = scheduler.science_time() / 3600
+    results['in_order'] = _in_order_science_time(scheduler) / 3600
+    results['replan'] = 0
+    for k in range(cycles):
+        # Observed the first blocks, then closed for weather for an hour and lost the next target
+        done = blocks[:len(blocks) // (cycles + 1) + 1]
+        for block in done[:-1]:
+            images = scheduler.science_time([block]) // scheduler._image_time(block.ticket)
+            scheduler.record(block.ticket, int(images))
+        scheduler.exclude(done[-1].ticket)
+        t = time.perf_counter()
+        blocks = scheduler.plan(now=done[-1].end + datetime.timedelta(hours=1), position=done[-2].ticket
+                                if len(done) > 1 else None)
+        results['replan'] = max(results['replan'], time.perf_counter() - t)
+        if not blocks:
+            break
+    logging.info('Scheduled {} tickets: setup {:.3f} s, plan {:.3f} s, slowest replan {:.3f} s.  {:.1f} h of images '
+                 'planned, against {:.1f} h in start time order.'.format(num_tickets, results['setup'],
+                                                                        results['plan'], results['replan'],
+                                                                        results['science'], results['in_order']))
+    return results
@@ -0,0 +1,523 @@
+# Simulated COM objects for the camera (MaxIm DL), telescope (TheSkyX ASCOM driver) and dome (ASCOM Dome)
+import datetime
+import logging
+import threading
+import numpy as np
+from astropy.io import fits
+
+from ..common.IO import config_reader
+from ..common.util import conversion_utils, time_utils
+from ..controller import backend
+from . import sky
+
+
+def _com_error(message):
+    # Same arguments as pywintypes.com_error: (hresult, strerror, excepinfo, argerror)
+    return backend.com_error(-2147352567, 'Exception occurred.', (0, 'Simulator', message, None, 0, 0), None)
+
+
+class ComObject:
+
+    def __init__(self, simulator):
+        """
+        Description
+        -----------
+        Base class for the simulated COM objects.  Like COM dispatch objects, attribute names are case-insensitive,
+        and missing attributes raise AttributeError.
+
+        Parameters
+        ----------
+        simulator : Simulator
+            The simulator that the object belongs to.
+
+        Returns
+        -------
+        None.
+
+        """
+        object.__setattr__(self, 'simulator', simulator)
+        object.__setattr__(self, 'lock', threading.RLock())
+        object.__setattr__(self, 'config_dict', config_reader.get_config())
+
+    def _canonical(self, name):
+        lower = name.lower()
+        for attr in dir(self):
+            if attr.lower() == lower and not attr.startswith('_'):
+                return attr
+        return None
+
+    def __getattr__(self, name):
+        # Only called if the exact name was not found
+        canonical = self._canonical(name)
+        if canonical is None or canonical == name:
+            raise AttributeError('{} has no attribute {}'.format(type(self).__name__, name))
+        return getattr(self, canonical)
+
+    def __setattr__(self, name, value):
+        if not name.startswith('_'):
+            name = self._canonical(name) or name
+        object.__setattr__(self, name, value)
+
+
+class SimulatedTelescope(ComObject):
+
+    slew_rate = 4.0
+    guide_rate = 0.5 * 15.0410686 / 3600
+
+    def __init__(self, simulator, drift=(0.02, -0.01)):
+        """
+        Description
+        -----------
+        Stands in for "ASCOM.SoftwareBisque.Telescope".  Slews move at slew_rate degrees per second on both axes,
+        pulse guides at half the sidereal rate, and while tracking the pointing slowly drifts so that there is
+        something for the guider to correct.  While not tracking, the telescope stays fixed in hour angle.
+
+        Parameters
+        ----------
+        simulator : Simulator
+            The simulator that the telescope belongs to.
+        drift : TUPLE, optional
+            Tracking error in arcseconds per second (east, north).  The default is (0.02, -0.01).
+
+        Returns
+        -------
+        None.
+
+        """
+        super(SimulatedTelescope, self).__init__(simulator)
+        self.Connected = False
+        self.SlewSettleTime = 0
+        self.AtPark = True
+        self._drift = drift
+        self._tracking = False
+        self._slew = None
+        self._busy_until = 0
+        ra, dec = conversion_utils.convert_altaz_to_radec(self.config_dict.telescope_park_az,
+                                                          self.config_dict.telescope_park_alt,
+                                                          self.config_dict.site_latitude,
+                                                          self.config_dict.site_longitude, self.simulator.now())
+        self._set_position(ra, dec, self.simulator.time())
+
+    def _lst(self):
+        return time_utils.get_local_sidereal_time(self.config_dict.site_longitude, self.simulator.now())
+
+    def _set_position(self, ra, dec, t):
+        self._ra = ra % 24
+        self._dec = dec
+        self._t0 = t
+        self._ha = self._lst() - self._ra
+
+    def _position(self):
+        t = self.simulator.time()
+        if self._slew is not None:
+            ra0, dec0, ra1, dec1, t_start, t_end = self._slew
+            if t < t_end:
+                f = (t - t_start) / (t_end - t_start) if t_end > t_start else 1
+                dra = ((ra1 - ra0 + 12) % 24) - 12
+                return (ra0 + f * dra) % 24, dec0 + f * (dec1 - dec0)
+            self._slew = None
+            self._set_position(ra1, dec1, t_end)
+        if self._tracking:
+            dt = t - self._t0
+            ra = self._ra + self._drift[0] * dt / (15 * 3600 * max(np.cos(np.radians(self._dec)), 1e-3))
+            return ra % 24, self._dec + self._drift[1] * dt / 3600
+        return (self._lst() - self._ha) % 24, self._dec
+
+    def altaz(self):
+        """
+        Returns
+        -------
+        az, alt : FLOAT, FLOAT
+            Current azimuth and altitude of the telescope in degrees.
+
+        """
+        with self.lock:
+            ra, dec = self._position()
+        return conversion_utils.convert_radec_to_altaz(ra, dec, self.config_dict.site_latitude,
+                                                       self.config_dict.site_longitude, self.simulator.now())
+
+    @property
+    def RightAscension(self):
+        with self.lock:
+            return self._position()[0]
+
+    @property
+    def Declination(self):
+        with self.lock:
+            return self._position()[1]
+
+    @property
+    def Slewing(self):
+        with self.lock:
+            self._position()
+            return self._slew is not None or self.simulator.time() < self._busy_until
+
+    @property
+    def Tracking(self):
+        return self._tracking
+
+    @Tracking.setter
+    def Tracking(self, tracking):
+        with self.lock:
+            ra, dec = self._position()
+            self._tracking = bool(tracking)
+            if self._slew is None:
+                self._set_position(ra, dec, self.simulator.time())
+
+    @property
+    def GuideRateRightAscension(self):
+        return self.guide_rate
+
+    @property
+    def GuideRateDeclination(self):
+        return self.guide_rate
+
+    def SlewToCoordinatesAsync(self, ra, dec):
+        with self.lock:
+            if self.AtPark:
+                raise _com_error('Telescope is parked')
+            t = self.simulator.time()
+            ra0, dec0 = self._position()
+            distance = max(abs(((ra - ra0 + 12) % 24) - 12) * 15, abs(dec - dec0))
+            self._slew = (ra0, dec0, ra % 24, dec, t, t + distance / self.slew_rate + self.SlewSettleTime)
+
+    def AbortSlew(self):
+        with self.lock:
+            ra, dec = self._position()
+            self._slew = None
+            self._set_position(ra, dec, self.simulator.time())
+
+    def PulseGuide(self, direction, duration):
+        with self.lock:
+            if self.AtPark:
+                raise _com_error('Telescope is parked')
+            ra, dec = self._position()
+            distance = self.guide_rate * duration / 1000
+            if direction == 0:
+                dec += distance
+            elif direction == 1:
+                dec -= distance
+            elif direction == 2:
+                ra += distance / (15 * max(np.cos(np.radians(dec)), 1e-3))
+            elif direction == 3:
+                ra -= distance / (15 * max(np.cos(np.radians(dec)), 1e-3))
+            else:
+                raise _com_error('Invalid guide direction')
+            t = self.simulator.time()
+            self._set_position(ra, dec, t)
+            self._busy_until = t + duration / 1000
+
+    def Park(self):
+        with self.lock:
+            self._tracking = False
+            self.AtPark = True
+            ra, dec = self._position()
+            self._set_position(ra, dec, self.simulator.time())
+        logging.debug('Simulator: telescope parked')
+
+    def Unpark(self):
+        with self.lock:
+            self.AtPark = False
+
+
+class SimulatedDome(ComObject):
+
+    rotation_rate = 5.0
+    shutter_time = 60.0
+    home_azimuth = 0.0
+
+    def __init__(self, simulator):
+        """
+        Description
+        -----------
+        Stands in for "ASCOMDome.Dome".  The dome rotates at rotation_rate degrees per second, the shutter takes
+        shutter_time seconds to open or close, and while slaved the dome follows the simulated telescope.
+
+        Parameters
+        ----------
+        simulator : Simulator
+            The simulator that the dome belongs to.
+
+        Returns
+        -------
+        None.
+
+        """
+        super(SimulatedDome, self).__init__(simulator)
+        self.Connected = False
+        self.Slaved = False
+        self.AtPark = True
+        self._azimuth = self.config_dict.dome_park_az
+        self._move = None
+        self._parking = False
+        self._shutter = 1
+        self._shutter_done = 0
+
+    def _update(self):
+        t = self.simulator.time()
+        if self._shutter in (2, 3) and t >= self._shutter_done:
+            self._shutter = 0 if self._shutter == 2 else 1
+        if self._move is not None:
+            az0, daz, t_start, t_end = self._move
+            if t < t_end:
+                return (az0 + daz * (t - t_start) / (t_end - t_start)) % 360
+            self._move = None
+            self._azimuth = (az0 + daz) % 360
+            if self._parking:
+                self.AtPark = True
+                self._parking = False
+        if self.Slaved:
+            az, _ = self.simulator.telescope.altaz()
+            if abs(((az - self._azimuth + 180) % 360) - 180) > 2:
+                self._start_move(az)
+        return self._azimuth
+
+    def _start_move(self, azimuth):
+        t = self.simulator.time()
+        az0 = self._update() if self._move is not None else self._azimuth
+        daz = ((azimuth - az0 + 180) % 360) - 180
+        self.AtPark = False
+        self._move = (az0, daz, t, t + abs(daz) / self.rotation_rate)
+
+    @property
+    def Azimuth(self):
+        with self.lock:
+            return self._update()
+
+    @property
+    def Slewing(self):
+        with self.lock:
+            self._update()
+            return self._move is not None
+
+    @property
+    def AtHome(self):
+        with self.lock:
+            az = self._update()
+            return self._move is None and abs(((az - self.home_azimuth + 180) % 360) - 180) <= 1
+
+    @property
+    def ShutterStatus(self):
+        with self.lock:
+            self._update()
+            return self._shutter
+
+    def FindHome(self):
+        with self.lock:
+            self._start_move(self.home_azimuth)
+
+    def Park(self):
+        with self.lock:
+            self.Slaved = False
+            self._start_move(self.config_dict.dome_park_az)
+            self._parking = True
+
+    def SlewtoAzimuth(self, azimuth):
+        with self.lock:
+            self._start_move(azimuth)
+
+    def AbortSlew(self):
+        with self.lock:
+            self._azimuth = self._update()
+            self._move = None
+            self._parking = False
+
+    def OpenShutter(self):
+        with self.lock:
+            if self.ShutterStatus != 0:
+                self._shutter = 2
+                self._shutter_done = self.simulator.time() + self.shutter_time
+
+    def CloseShutter(self):
+        with self.lock:
+            if self.ShutterStatus != 1:
+                self._shutter = 3
+                self._shutter_done = self.simulator.time() + self.shutter_time
+
+
+class SimulatedCamera(ComObject):
+
+    readout_time = 2.0
+    cooling_time = 120.0
+    max_cooling = 40.0
+
+    def __init__(self, simulator, shape=(2048, 2048), seeing=2.5, sky_rate=20.0, flat_rate=5000.0):
+        """
+        Description
+        -----------
+        Stands in for "MaxIm.CCDCamera".  Synthesizes frames of the star field the simulated telescope is pointing
+        at, with the pointing drift, the seeing, and a FWHM that grows as the simulated focuser moves away from best
+        focus.  The dome shutter must be open to see stars, and the flat lamp lights up light frames when it is on.
+        The CCD cools towards the setpoint, but no more than max_cooling degrees below ambient.
+
+        Parameters
+        ----------
+        simulator : Simulator
+            The simulator that the camera belongs to.
+        shape : TUPLE, optional
+            (rows, columns) of the detector.  The default is (2048, 2048).
+        seeing : FLOAT, optional
+            Seeing FWHM in arcseconds.  The default is 2.5.
+        sky_rate : FLOAT, optional
+            Sky background in ADU/s/pixel.  The default is 20.
+        flat_rate : FLOAT, optional
+            Flat lamp illumination in ADU/s/pixel.  The default is 5000.
+
+        Returns
+        -------
+        None.
+
+        """
+        super(SimulatedCamera, self).__init__(simulator)
+        self.LinkEnabled = False
+        self.DisableAutoShutdown = False
+        self.AutoDownload = False
+        self.FWHM = None
+        self._shape = shape
+        self._seeing = seeing
+        self._sky_rate = sky_rate
+        self._flat_rate = flat_rate
+        self._cooler_on = False
+        self._setpoint = simulator.ambient_temperature
+        self._temperature = simulator.ambient_temperature
+        self._t_temperature = simulator.time()
+        self._exposure = None
+        self._fits_keys = {}
+        self._field = None
+
+    def _update_temperature(self):
+        t = self.simulator.time()
+        ambient = self.simulator.ambient_temperature
+        target = max(self._setpoint, ambient - self.max_cooling) if self._cooler_on else ambient
+        self._temperature = target + (self._temperature - target) * np.exp(-(t - self._t_temperature) /
+                                                                            self.cooling_time)
+        self._t_temperature = t
+        return self._temperature
+
+    @property
+    def CoolerOn(self):
+        return self._cooler_on
+
+    @CoolerOn.setter
+    def CoolerOn(self, on):
+        with self.lock:
+            self._update_temperature()
+            self._cooler_on = bool(on)
+
+    @property
+    def TemperatureSetpoint(self):
+        return self._setpoint
+
+    @TemperatureSetpoint.setter
+    def TemperatureSetpoint(self, setpoint):
+        with self.lock:
+            self._update_temperature()
+            self._setpoint = float(setpoint)
+
+    @property
+    def Temperature(self):
+        with self.lock:
+            return round(self._update_temperature(), 2)
+
+    @property
+    def CoolerPower(self):
+        if not self._cooler_on:
+            return 0
+        cooling = self.simulator.ambient_temperature - max(self._setpoint, self.simulator.ambient_temperature -
+                                                           self.max_cooling)
+        return round(100 * min(max(cooling / self.max_cooling, 0), 1))
+
+    @property
+    def ImageReady(self):
+        with self.lock:
+            if self._exposure is None:
+                return False
+            start, duration, _, _ = self._exposure
+            return self.simulator.time() >= start + duration + self.readout_time
+
+    def SetFullFrame(self):
+        pass
+
+    def Expose(self, duration, light, filter):
+        with self.lock:
+            if not self.LinkEnabled:
+                raise _com_error('Camera is not connected')
+            self._exposure = (self.simulator.time(), float(duration), int(light), filter)
+            self._fits_keys = {}
+
+    def SetFITSKey(self, key, value):
+        self._fits_keys[key] = value
+
+    def SaveImage(self, path):
+        with self.lock:
+            if not self.ImageReady:
+                raise _com_error('No image to save')
+            start, duration, light, filter = self._exposure
+            data, image_type = self._render(duration, light)
+            header = fits.Header()
+            header['EXPTIME'] = duration
+            header['EXPOSURE'] = duration
+            header['DATE-OBS'] = datetime.datetime.fromtimestamp(start, datetime.timezone.utc).strftime(
+                '%Y-%m-%dT%H:%M:%S.%f')
+            header['IMAGETYP'] = image_type
+            header['FILTER'] = str(filter)
+            header['CCD-TEMP'] = self.Temperature
+            header['SET-TEMP'] = self._setpoint
+            header['XBINNING'] = 1
+            header['YBINNING'] = 1
+            header['SWCREATE'] = 'OmegaLambda simulator'
+            for key, value in self._fits_keys.items():
+                header[key] = value
+        fits.PrimaryHDU(data, header=header).writeto(path, overwrite=True)
+        logging.debug('Simulator: saved {} to {}'.format(image_type, path))
+
+    def _render(self, duration, light):
+        simulator = self.simulator
+        rng = simulator.rng
+        if not light:
+            return sky.render_frame(self._shape, duration, rng), 'Dark Frame'
+        if simulator.flat_lamp.on:
+            return sky.render_frame(self._shape, duration, rng, flat_rate=self._flat_rate), 'Flat Frame'
+        if simulator.dome.ShutterStatus != 0 or simulator.telescope.Slewing:
+            return sky.render_frame(self._shape, duration, rng), 'Light Frame'
+        plate_scale = self.config_dict.plate_scale
+        ra, dec = simulator.telescope.RightAscension, simulator.telescope.Declination
+        half_diagonal = np.hypot(*self._shape) / 2 * plate_scale
+        if self._field is None or not self._field.contains(ra, dec, half_diagonal):
+            # Field centers are on a 0.05 degree grid, so that returning to a target shows the same stars
+            self._field = sky.StarField(round(ra * 15 / 0.05) * 0.05 / 15, round(dec / 0.05) * 0.05,
+                                        half_diagonal + 180 + 600)
+        field = self._field
+        east, north = field.offset(ra, dec)
+        x, y = sky.sky_to_pixel(field.east - east, field.north - north, plate_scale, self.config_dict.guider_angle,
+                                self.config_dict.guider_flip_y, self._shape)
+        seeing = self._seeing * max(rng.normal(1, 0.05), 0.5) / plate_scale
+        defocus = simulator.defocus_fwhm * (simulator.focuser.position - simulator.best_focus)
+        self.FWHM = float(np.hypot(seeing, defocus))
+        return sky.render_frame(self._shape, duration, rng, x, y, field.flux, self.FWHM,
+                                sky_rate=self._sky_rate), 'Light Frame'
+
+    def Quit(self):
+        self.LinkEnabled = False
+
+
+class SimulatedApplication(ComObject):
+
+    def __init__(self, simulator):
+        """
+        Description
+        -----------
+        Stands in for "MaxIm.Application".
+
+        Parameters
+        ----------
+        simulator : Simulator
+            The simulator that the application belongs to.
+
+        Returns
+        -------
+        None.
+
+        """
+        super(SimulatedApplication, self).__init__(simulator)
+        self.LockApp = False
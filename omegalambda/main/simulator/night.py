@@ -0,0 +1,121 @@
+# Whole observing nights on the simulator, in simulated time that skips over the waits
+import os
+import time
+import shutil
+import logging
+import datetime
+import tempfile
+
+from ..controller import backend
+from ..common.IO import config_reader, run_journal
+from ..common.IO.weather_store import WeatherStore
+from ..common.util import clock as clocks, conversion_utils, time_utils
+from ..common.IO.json_reader import Reader
+from ..common.datatype.object_reader import ObjectReader
+from ..common.datatype.observation_ticket import ObservationTicket
+from .simulator import Simulator
+from .weather_server import FakeWeatherServer
+
+
+def benchmark_night(hours=10, closures=((2, 45), (6, 90)), exp_time=120, seed=0, start=None,
+                    image_shape=(256, 256)):
+    """
+    Description
+    -----------
+    Observes a whole night (ObservationRun.observe) on the simulated observatory, with the weather from a fake
+    weather server, on a SimulatedClock, so that the night passes in seconds instead of hours.  Two targets share
+    the night, one of them highest in each half.  For each weather closure the humidity goes over its limit until the
+    closure is over, so the observatory shuts down and then reopens as it would for real.
+
+    Parameters
+    ----------
+    hours : FLOAT, optional
+        Length of the night, from the start of the tickets to their end, in hours.  The default is 10.
+    closures : LIST, optional
+        (hours after the start, minutes long) of each weather closure.  The default is ((2, 45), (6, 90)).
+    exp_time : FLOAT, optional
+        Exposure time of the images, in seconds.  The default is 120.
+    seed : INT, optional
+        Seed for the simulator and fake weather.  The default is 0.
+    start : datetime.datetime, optional
+        When the tickets start (timezone aware).  The default is None, which is an hour after tonight's sunset.
+    image_shape : TUPLE, optional
+        Size of the simulated images.  The default is (256, 256), small, so that the time goes to the observing code
+        rather than to making and saving the images.
+
+    Returns
+    -------
+    results : DICT
+        "real" : seconds that observing the night took, "simulated" : hours of simulated time that passed,
+        "images" : number of images taken of each target, keyed by name, "checks" and "alerts" : number of weather
+        checks and how many of them raised the weather alert, and "jumps" : number of times the clock skipped ahead.
+
+    """
+    config = config_reader.get_config()
+    # The simulated observatory uses the default filter wheel, read the same way driver.run does
+    ObjectReader(Reader(os.path.abspath(os.path.join(os.path.dirname(__file__), r'..', r'..', r'config',
+                                                     r'fw_config.json'))))
+    if start is None:
+        start = conversion_utils.get_sunset(datetime.datetime.now(datetime.timezone.utc), config.site_latitude,
+                                            config.site_longitude) + datetime.timedelta(hours=1)
+    end = start + datetime.timedelta(hours=hours)
+    directory = tempfile.mkdtemp(prefix='night_')
+
+    # Everything must use the simulated clock and observatory from the moment it is created, but the clock is only
+    # started (and can skip ahead) once the observing run has been set up and connected
+    clock = clocks.SimulatedClock(start=start - datetime.timedelta(minutes=5))
+    clocks.set_clock(clock)
+    server = FakeWeatherServer(seed=seed)
+    simulator = Simulator(seed=seed, clock=clock, weather=server, image_shape=image_shape)
+    server.start()
+    simulator.start()
+    backend.set_simulator(simulator)
+    changes = []
+    for (after, minutes) in closures:
+        closed = start + datetime.timedelta(hours=after)
+        changes.append((closed.timestamp(), {'humidity': config.humidity_limit + 10}))
+        changes.append(((closed + datetime.timedelta(minutes=minutes)).timestamp(), {'humidity': server.humidity}))
+    server.replay(changes, clock)
+
+    from ..observing.observation_run import ObservationRun
+    lst = time_utils.get_local_sidereal_time(config.site_longitude, start)
+    tickets = []
+    for (i, transit) in enumerate((hours / 4, 3 * hours / 4)):
+        tickets.append(ObservationTicket('NightTarget{}'.format(i + 1), (lst + transit) % 24, config.site_latitude,
+                                         start.strftime('%Y-%m-%d %H:%M:%S%z'), end.strftime('%Y-%m-%d %H:%M:%S%z'),
+                                         'r', int(hours * 60 * 60 / exp_time), exp_time, False, False, False))
+    folders = [os.path.join(directory, ticket.name) for ticket in tickets]
+    for folder in folders:
+        os.makedirs(folder)
+    try:
+        run = ObservationRun(tickets, folders, True, False, False)
+        # The focuser is found by trying each serial port in real time, which the clock cannot see
+        for device in (run.camera, run.telescope, run.dome, run.focuser, run.flatlamp):
+            device.live_connection.wait(timeout=30)
+        # The clock can only jump as far as the next thread to wake up, so a thread check every simulated second
+        # would turn the night into tens of thousands of one second jumps
+        run.monitor.interval = 10
+        clock.start()
+        t = time.monotonic()
+        simulated = clock.time()
+        run.observe()
+        results = {'real': time.monotonic() - t, 'simulated': (clock.time() - simulated) / (60 * 60)}
+        run.conditions.join(timeout=10)
+        results['images'] = {ticket.name: len(run_journal.get_run_journal(folder).completed(ticket.name, 'light'))
+                             for (ticket, folder) in zip(tickets, folders)}
+        store = WeatherStore(os.path.join(server.directory, r'weather.sqlite'))
+        summary = store.summary(start.timestamp(), clock.time())
+        store.close()
+        results.update(checks=summary['checks'], alerts=summary['alerts'], jumps=clock.jumps)
+    finally:
+        simulator.stop()
+        server.stop()
+        backend.set_simulator(None)
+        clocks.set_clock(None)
+        clock.stop()
+        shutil.rmtree(directory, ignore_errors=True)
+    logging.info('Observed a {:.1f} hour night with {} weather closure(s) in {:.1f} s: {} images, {} of {} weather '
+                 'checks raised the alert'.format(results['simulated'], len(closures), results['real'],
+                                                  sum(results['images'].values()), results['alerts'],
+                                                  results['checks']))
+    return results
@@ -0,0 +1,273 @@
+# Simulated serial devices (RoboFocus focuser, Arduino flat lamp), each talking its protocol over a pseudo-terminal
+import os
+import tty
+import select
+import threading
+import logging
+from serial.tools.list_ports_common import ListPortInfo
+
+
+class PtyDevice(threading.Thread):
+
+    def __init__(self, simulator, name, description, manufacturer=None):
+        """
+        Description
+        -----------
+        Subclassed from threading.Thread.  Opens a pseudo-terminal and answers on its master side, so that the
+        hardware classes open, write to and read from the slave side with pyserial exactly as they would a real
+        serial port.  Only available on Linux and macOS.
+
+        Parameters
+        ----------
+        simulator : Simulator
+            The simulator that the device belongs to.
+        name : STR
+            Name of the device, for logging.
+        description : STR
+            Port description reported by Simulator.comports.
+        manufacturer : STR, optional
+            Port manufacturer reported by Simulator.comports.  The default is None.
+
+        Returns
+        -------
+        None.
+
+        """
+        super(PtyDevice, self).__init__(name='Sim{}-Th'.format(name), daemon=True)
+        self.simulator = simulator
+        self.label = name
+        self.master, self.slave = os.openpty()
+        # The slave side stays open here too, so reads on the master block rather than fail while no client is
+        # connected.  Raw mode, so that nothing is echoed back before pyserial opens the port.
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        self.device = os.ttyname(self.slave)
+        self.port_info = ListPortInfo(self.device)
+        self.port_info.description = description
+        self.port_info.manufacturer = manufacturer
+        self.port_info.hwid = 'SIM'
+        self.stopping = threading.Event()
+
+    def write(self, data):
+        """
+        Description
+        -----------
+        Sends bytes to the client.  Bytes that do not fit in the terminal buffer (because nobody is reading) are
+        dropped, like on a real serial line.
+
+        Parameters
+        ----------
+        data : BYTES
+            The bytes to send.
+
+        Returns
+        -------
+        None.
+
+        """
+        try:
+            os.write(self.master, data)
+        except (BlockingIOError, OSError):
+            logging.debug('Simulator: {} dropped {} bytes'.format(self.label, len(data)))
+
+    def receive(self, data):
+        """
+        Description
+        -----------
+        Called with every chunk of bytes received from the client.  To be overridden.
+
+        Parameters
+        ----------
+        data : BYTES
+            The received bytes.
+
+        Returns
+        -------
+        None.
+
+        """
+        raise NotImplementedError
+
+    def poll(self):
+        """
+        Description
+        -----------
+        Called about every 20 ms of real time, to let the device finish moves and send unprompted messages.  Does
+        nothing unless overridden.
+
+        Returns
+        -------
+        None.
+
+        """
+        pass
+
+    def run(self):
+        while not self.stopping.isSet():
+            readable, _, _ = select.select([self.master], [], [], 0.02)
+            if readable:
+                try:
+                    data = os.read(self.master, 1024)
+                except (BlockingIOError, OSError):
+                    data = b''
+                if data:
+                    self.receive(data)
+            self.poll()
+
+    def stop(self):
+        self.stopping.set()
+        self.join(timeout=1)
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class SimulatedRoboFocus(PtyDevice):
+
+    firmware = b'003.20'
+
+    def __init__(self, simulator, position=5000, steps_per_second=500, max_position=64000):
+        """
+        Description
+        -----------
+        A RoboFocus focuser.  Commands are 8 characters, like "FG005000", and replies are 8 characters followed by
+        a checksum byte (the sum of the 8 characters, modulo 256).  The motor moves at steps_per_second, and replies
+        to a move once it has finished.  Any command received during a move stops it.
+
+        Parameters
+        ----------
+        simulator : Simulator
+            The simulator that the focuser belongs to.
+        position : INT, optional
+            Starting position in steps.  The default is 5000.
+        steps_per_second : INT or FLOAT, optional
+            Motor speed.  The default is 500.
+        max_position : INT, optional
+            Largest allowed position.  The default is 64000.
+
+        Returns
+        -------
+        None.
+
+        """
+        super(SimulatedRoboFocus, self).__init__(simulator, 'RoboFocus', 'RoboFocus (COM3, simulated)')
+        self.steps_per_second = steps_per_second
+        self.max_position = max_position
+        self.buffer = b''
+        self._position = position
+        self._move = None
+        self.lock = threading.RLock()
+
+    @property
+    def position(self):
+        """
+        Returns
+        -------
+        FLOAT
+            Current position of the focuser in steps, including part way through a move.
+
+        """
+        with self.lock:
+            if self._move is None:
+                return self._position
+            start, target, t_start, t_end = self._move
+            t = self.simulator.time()
+            if t >= t_end:
+                return target
+            return start + (target - start) * (t - t_start) / (t_end - t_start)
+
+    def reply(self, command, value):
+        message = command + value
+        self.write(message + bytes([sum(message) % 256]))
+
+    def receive(self, data):
+        self.buffer += data
+        while len(self.buffer) >= 8:
+            command, self.buffer = self.buffer[:8], self.buffer[8:]
+            self.command(command)
+
+    def command(self, command):
+        if self._move is not None:
+            # Any command stops a move in progress
+            with self.lock:
+                self._position = int(round(self.position))
+                self._move = None
+            logging.debug('Simulator: RoboFocus move stopped at {}'.format(self._position))
+        code, value = command[:2], command[2:]
+        try:
+            value = int(value)
+        except ValueError:
+            value = 0
+        if code == b'FV':
+            self.reply(b'FV', self.firmware)
+        elif code == b'FT':
+            # Half-kelvin units
+            self.reply(b'FT', b'%06d' % int(round((self.simulator.ambient_temperature + 273) * 2)))
+        elif code in (b'FI', b'FO', b'FG'):
+            if value == 0:
+                # Zero is a query for the current position
+                self.reply(b'FD', b'%06d' % self._position)
+                return
+            target = self._position - value if code == b'FI' else self._position + value if code == b'FO' else value
+            target = min(max(target, 0), self.max_position)
+            t = self.simulator.time()
+            with self.lock:
+                self._move = (self._position, target, t, t + abs(target - self._position) / self.steps_per_second)
+        else:
+            logging.debug('Simulator: RoboFocus ignored unknown command {}'.format(command))
+
+    def poll(self):
+        if self._move is not None and self.simulator.time() >= self._move[3]:
+            with self.lock:
+                self._position = self._move[1]
+                self._move = None
+            self.reply(b'FD', b'%06d' % self._position)
+
+
+class SimulatedFlatLamp(PtyDevice):
+
+    def __init__(self, simulator):
+        """
+        Description
+        -----------
+        The Arduino that switches the flat field lamp.  Messages from the Arduino are wrapped in "<" and ">".  Until it
+        is sent a command, it announces "<Arduino is ready>" once a second, like the real board after each reset.
+        The command "2" asks it to identify itself ("<LAMP>"), and "1" and "0" turn the lamp on and off.
+
+        Parameters
+        ----------
+        simulator : Simulator
+            The simulator that the lamp belongs to.
+
+        Returns
+        -------
+        None.
+
+        """
+        super(SimulatedFlatLamp, self).__init__(simulator, 'FlatLamp', 'Arduino Uno (simulated)',
+                                                manufacturer='Arduino (www.arduino.cc)')
+        self.on = False
+        self.next_ready = 0
+        self.quiet_until = 0
+
+    def receive(self, data):
+        # Wall-clock time here, since it only spaces out messages to the client
+        now = self.simulator.wall_time()
+        self.quiet_until = now + 5
+        for byte in data.decode(errors='ignore'):
+            if byte == '2':
+                self.write(b'<LAMP>')
+            elif byte == '1':
+                self.on = True
+                logging.debug('Simulator: flat lamp on')
+            elif byte == '0':
+                self.on = False
+                logging.debug('Simulator: flat lamp off')
+
+    def poll(self):
+        now = self.simulator.wall_time()
+        if now >= self.next_ready and now >= self.quiet_until:
+            self.write(b'<Arduino is ready>')
+            self.next_ready = now + 1
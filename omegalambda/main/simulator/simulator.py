@@ -0,0 +1,192 @@
+# Simulated observatory for running the automation code without the real hardware
+import time
+import datetime
+import logging
+import numpy as np
+
+from ..controller import backend
+from .com_devices import SimulatedTelescope, SimulatedDome, SimulatedCamera, SimulatedApplication
+from .serial_devices import SimulatedRoboFocus, SimulatedFlatLamp
+
+
+class Simulator:
+
+    def __init__(self, speed=1, seed=None, ambient_temperature=15.0, focus_position=5000, best_focus=5015,
+                 defocus_fwhm=0.25, clock=None, weather=None, image_shape=(2048, 2048)):
+        """
+        Description
+        -----------
+        A simulated observatory: camera, telescope, dome, focuser and flat lamp, sharing one simulated time line so
+        that, for example, the camera sees the stars the telescope is pointing at, blurred by the focuser position.
+        The camera, telescope and dome are handed to the hardware classes in place of their COM objects, and the
+        focuser and flat lamp talk their serial protocols over pseudo-terminals.  Use it by passing it to
+        backend.set_simulator before creating the hardware classes.
+
+        Parameters
+        ----------
+        speed : INT or FLOAT, optional
+            How many times faster than real time the simulated hardware runs: slews, dome and focuser moves,
+            exposures and cooling all finish speed times sooner.  The default is 1.
+        seed : INT, optional
+            Seed for the image noise and seeing.  The default is None.
+        ambient_temperature : FLOAT, optional
+            Ambient temperature in C, seen by the camera cooler and the focuser's temperature sensor.  The default
+            is 15.
+        focus_position : INT, optional
+            Starting focuser position in steps.  The default is 5000.
+        best_focus : INT, optional
+            Focuser position that gives the sharpest stars.  The default is 5015.
+        defocus_fwhm : FLOAT, optional
+            How many pixels the FWHM grows per step away from best focus (added in quadrature to the seeing).  The
+            default is 0.25.
+        clock : Clock, optional
+            Clock to take the simulated time from, like a SimulatedClock shared with the observing code, in which
+            case speed is not used.  The default is None, which starts at the real time and runs speed times faster.
+        weather : FakeWeatherServer, optional
+            Fake weather server for the condition checker to take the weather from.  The default is None, which
+            leaves the weather checks on the real weather services.
+        image_shape : TUPLE, optional
+            Size of the camera's images, (rows, columns).  The default is (2048, 2048); smaller images are quicker to
+            make, when only the timing of a run matters.
+
+        Returns
+        -------
+        None.
+
+        """
+        if speed <= 0:
+            raise ValueError('Simulator speed must be positive')
+        self.speed = speed
+        self.rng = np.random.default_rng(seed)
+        self.ambient_temperature = ambient_temperature
+        self.best_focus = best_focus
+        self.defocus_fwhm = defocus_fwhm
+        self.clock = clock
+        self.weather = weather
+        self._epoch = time.time()
+        self._start = time.monotonic()
+        self.hung_programs = set()
+
+        self.telescope = SimulatedTelescope(self)
+        self.dome = SimulatedDome(self)
+        self.camera = SimulatedCamera(self, shape=image_shape)
+        self.application = SimulatedApplication(self)
+        self.focuser = SimulatedRoboFocus(self, position=focus_position)
+        self.flat_lamp = SimulatedFlatLamp(self)
+        self.com_objects = {
+            'ASCOM.SoftwareBisque.Telescope': self.telescope,
+            'ASCOMDome.Dome': self.dome,
+            'MaxIm.CCDCamera': self.camera,
+            'MaxIm.Application': self.application,
+        }
+
+    def time(self):
+        """
+        Returns
+        -------
+        FLOAT
+            Simulated time in seconds since the epoch.  Starts at the real time, and runs speed times faster, unless
+            it comes from a clock.
+
+        """
+        if self.clock is not None:
+            return self.clock.time()
+        return self._epoch + (time.monotonic() - self._start) * self.speed
+
+    def now(self):
+        """
+        Returns
+        -------
+        datetime.datetime
+            Simulated time, in UTC, for the sky positions.
+
+        """
+        return datetime.datetime.fromtimestamp(self.time(), datetime.timezone.utc)
+
+    def hang_program(self, program):
+        """
+        Description
+        -----------
+        Makes a program (like "MaxIm_DL.exe") stop responding, until the automation code kills it.
+
+        Parameters
+        ----------
+        program : STR
+            Name of the Windows executable.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.hung_programs.add(program)
+        logging.info('Simulator: {} is not responding'.format(program))
+
+    @staticmethod
+    def wall_time():
+        """
+        Returns
+        -------
+        FLOAT
+            Real time in seconds, for pacing serial messages.
+
+        """
+        return time.monotonic()
+
+    def start(self):
+        """
+        Description
+        -----------
+        Starts the serial devices.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.focuser.start()
+        self.flat_lamp.start()
+        logging.info('Simulator started at {}x speed.  Focuser on {}, flat lamp on {}'.format(
+            self.speed, self.focuser.device, self.flat_lamp.device))
+
+    def stop(self):
+        """
+        Description
+        -----------
+        Stops the serial devices and closes their pseudo-terminals.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.focuser.stop()
+        self.flat_lamp.stop()
+        logging.info('Simulator stopped')
+
+    def dispatch(self, prog_id):
+        """
+        Parameters
+        ----------
+        prog_id : STR
+            COM ProgID that a hardware class asked for.
+
+        Returns
+        -------
+        ComObject
+            The simulated device for that ProgID.
+
+        """
+        if prog_id not in self.com_objects:
+            raise backend.com_error(-2147221005, 'Invalid class string', None, None)
+        return self.com_objects[prog_id]
+
+    def comports(self):
+        """
+        Returns
+        -------
+        LIST
+            Port info for the simulated serial devices.
+
+        """
+        return [self.focuser.port_info, self.flat_lamp.port_info]
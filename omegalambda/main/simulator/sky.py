@@ -0,0 +1,174 @@
+# Synthetic star fields and CCD frames for the simulated camera
+import numpy as np
+from typing import Optional, Tuple
+
+
+class StarField:
+
+    def __init__(self, ra: float, dec: float, half_width: float, density: float = 1.0, seed: Optional[int] = None):
+        """
+        Description
+        -----------
+        A fixed set of stars around a field center.  The same field center and seed always give the same stars, so
+        revisiting a target shows the same field.
+
+        Parameters
+        ----------
+        ra : FLOAT
+            Right ascension of the field center in hours.
+        dec : FLOAT
+            Declination of the field center in degrees.
+        half_width : FLOAT
+            Half of the width of the (square) field in arcseconds.
+        density : FLOAT, optional
+            Mean number of stars per square arcminute.  The default is 1.
+        seed : INT, optional
+            Seed for the random star positions and brightnesses.  The default is None, which derives the seed from the
+            field center.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.ra = ra
+        self.dec = dec
+        self.half_width = half_width
+        if seed is None:
+            seed = int(round(ra * 1000)) * 100003 + int(round((dec + 90) * 1000))
+        rng = np.random.default_rng(seed)
+        n = rng.poisson(density * (2 * half_width / 60) ** 2)
+        # Offsets from the field center in arcseconds, +east and +north
+        self.east = rng.uniform(-half_width, half_width, n)
+        self.north = rng.uniform(-half_width, half_width, n)
+        # Power law brightness distribution, in ADU/s
+        self.flux = np.minimum(300 * rng.uniform(0, 1, n) ** (-1 / 0.8), 3e6)
+
+    def offset(self, ra: float, dec: float) -> Tuple[float, float]:
+        """
+        Parameters
+        ----------
+        ra : FLOAT
+            Right ascension of a pointing in hours.
+        dec : FLOAT
+            Declination of a pointing in degrees.
+
+        Returns
+        -------
+        east, north : FLOAT, FLOAT
+            Offset of the pointing from the field center in arcseconds.
+
+        """
+        dra = ((ra - self.ra + 12) % 24) - 12
+        return dra * 15 * 3600 * np.cos(np.radians(self.dec)), (dec - self.dec) * 3600
+
+    def contains(self, ra: float, dec: float, margin: float) -> bool:
+        """
+        Returns
+        -------
+        BOOL
+            True if the pointing is within the field, at least margin arcseconds from its edges.
+
+        """
+        east, north = self.offset(ra, dec)
+        return abs(east) <= self.half_width - margin and abs(north) <= self.half_width - margin
+
+
+def sky_to_pixel(east: np.ndarray, north: np.ndarray, plate_scale: float, angle: float, flip_y: bool,
+                 shape: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Description
+    -----------
+    Projects sky offsets from the center of the frame onto the detector.  The projection is the inverse of the one
+    the guider uses to turn drifts on the detector into telescope jogs, so that the guider corrects the simulated
+    drift in the right direction.
+
+    Parameters
+    ----------
+    east, north : NUMPY ARRAY
+        Offsets from the center of the frame in arcseconds.
+    plate_scale : FLOAT
+        Arcseconds per pixel.
+    angle : FLOAT
+        Angle between the +x camera axis and the +RA axis in radians.
+    flip_y : BOOL
+        Whether the y axis is flipped.
+    shape : TUPLE
+        (rows, columns) of the detector.
+
+    Returns
+    -------
+    x, y : NUMPY ARRAY
+        Pixel positions.
+
+    """
+    x = (np.cos(angle) * east + np.sin(angle) * north) / plate_scale
+    y = (-np.sin(angle) * east + np.cos(angle) * north) / plate_scale
+    if flip_y:
+        y = -y
+    return shape[1] / 2 + x, shape[0] / 2 + y
+
+
+def render_frame(shape: Tuple[int, int], exposure: float, rng: np.random.Generator, x: Optional[np.ndarray] = None,
+                 y: Optional[np.ndarray] = None, flux: Optional[np.ndarray] = None, fwhm: float = 5.0,
+                 sky_rate: float = 0.0, flat_rate: float = 0.0, dark_rate: float = 0.05, bias: float = 1000.0,
+                 read_noise: float = 10.0) -> np.ndarray:
+    """
+    Description
+    -----------
+    Renders a CCD frame with gaussian stars, sky, flat field illumination, dark current, photon noise and read noise.
+
+    Parameters
+    ----------
+    shape : TUPLE
+        (rows, columns) of the frame.
+    exposure : FLOAT
+        Exposure time in seconds.
+    rng : numpy.random.Generator
+        Source of the noise.
+    x, y : NUMPY ARRAY, optional
+        Pixel positions of the stars.  The default is None, for no stars.
+    flux : NUMPY ARRAY, optional
+        Brightness of each star in ADU/s.
+    fwhm : FLOAT, optional
+        FWHM of the stars in pixels.  The default is 5.
+    sky_rate : FLOAT, optional
+        Sky background in ADU/s/pixel.  The default is 0.
+    flat_rate : FLOAT, optional
+        Flat field lamp illumination in ADU/s/pixel at the center of the frame.  The default is 0.
+    dark_rate : FLOAT, optional
+        Dark current in ADU/s/pixel.  The default is 0.05.
+    bias : FLOAT, optional
+        Bias level in ADU.  The default is 1000.
+    read_noise : FLOAT, optional
+        Read noise in ADU.  The default is 10.
+
+    Returns
+    -------
+    NUMPY ARRAY
+        The frame as unsigned 16-bit integers.
+
+    """
+    rows, cols = shape
+    signal = np.full(shape, (sky_rate + dark_rate) * exposure, dtype=np.float64)
+    if flat_rate:
+        # Mild vignetting towards the corners
+        yy, xx = np.ogrid[:rows, :cols]
+        r2 = ((xx - cols / 2) / cols) ** 2 + ((yy - rows / 2) / rows) ** 2
+        signal += flat_rate * exposure * (1 - 0.4 * r2)
+    if x is not None and len(x):
+        sigma = fwhm / (2 * np.sqrt(2 * np.log(2)))
+        r = int(np.ceil(4 * sigma))
+        offsets = np.arange(-r, r + 1)
+        inside = (x > -r) & (x < cols + r) & (y > -r) & (y < rows + r)
+        for xi, yi, fi in zip(x[inside], y[inside], flux[inside]):
+            x0, y0 = int(round(xi)), int(round(yi))
+            gx = np.exp(-0.5 * ((x0 + offsets - xi) / sigma) ** 2)
+            gy = np.exp(-0.5 * ((y0 + offsets - yi) / sigma) ** 2)
+            stamp = np.outer(gy, gx) * (fi * exposure / (2 * np.pi * sigma ** 2))
+            # Clip the stamp to the frame
+            xa, xb = max(x0 - r, 0), min(x0 + r + 1, cols)
+            ya, yb = max(y0 - r, 0), min(y0 + r + 1, rows)
+            signal[ya:yb, xa:xb] += stamp[ya - (y0 - r):yb - (y0 - r), xa - (x0 - r):xb - (x0 - r)]
+    frame = rng.poisson(signal).astype(np.float64) + bias + rng.normal(0, read_noise, shape)
+    return np.clip(frame, 0, 65535).astype(np.uint16)
@@ -0,0 +1,286 @@
+# Local stand-in for the weather services used by Conditions, with adjustable response times
+import io
+import os
+import json
+import hashlib
+import shutil
+import tempfile
+import time
+import datetime
+import logging
+import threading
+import collections
+import urllib.parse
+import numpy as np
+from concurrent.futures import wait
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from PIL import Image
+
+from ..common.IO.weather_store import WeatherStore
+from ..common.util.clock import get_clock
+from ..common.util.web_cache import WebCache
+
+
+class _WeatherHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        path = urllib.parse.urlparse(self.path).path.strip('/')
+        delay = self.server.delays.get(path, 0)
+        if delay:
+            # Wakes up early if the server is stopped, so that shutting down never waits on a "slow" response
+            self.server.stopping.wait(timeout=delay)
+        if path not in self.server.pages:
+            self.send_error(404)
+            return
+        (content_type, body) = self.server.pages[path]()
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        self.server.requests[path] += 1
+        try:
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.server.sent[path] += len(body)
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up waiting
+            pass
+
+    def log_message(self, format, *args):
+        logging.debug('Fake weather server: ' + format % args)
+
+
+class FakeWeatherServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, delays=None, humidity=50.0, wind=5.0, temperature=60.0, cloud_level=60, rain_fraction=0.0,
+                 seed=None, directory=None):
+        """
+        Description
+        -----------
+        A small HTTP server on localhost that answers like weatherapi.com, the weather.com radar page and tile
+        server, and the SSEC GOES satellite images, so that the weather checks can be run and timed offline.
+        Each page can be made to respond slowly, to see how long a weather check takes when a source hangs.  Pages
+        carry an ETag, and the server counts the requests and body bytes it sends for each page (requests, sent).
+
+        Parameters
+        ----------
+        delays : DICT, optional
+            Seconds to wait before answering, keyed by page: "weather", "radar", "tile" or "clouds".  The default
+            is None, which answers everything at once.
+        humidity : FLOAT, optional
+            Reported humidity in %.  The default is 50.
+        wind : FLOAT, optional
+            Reported wind speed in mph.  The default is 5.
+        temperature : FLOAT, optional
+            Reported temperature in F.  The default is 60.
+        cloud_level : INT, optional
+            Brightest pixel value in the satellite image.  The default is 60, which is below the cloud saturation
+            limit, so clear skies.
+        rain_fraction : FLOAT, optional
+            Fraction (0 to 1) of each radar tile showing rain.  The default is 0.
+        seed : INT, optional
+            Seed for the satellite image noise.  The default is None.
+        directory : STR, optional
+            Where condition checkers pointed at this server keep their weather store and saved pages, so that the
+            fake weather never ends up in the real weather history.  The default is None, which uses a temporary
+            directory that is removed when the server is stopped.
+
+        Returns
+        -------
+        None.
+
+        """
+        super(FakeWeatherServer, self).__init__(('127.0.0.1', 0), _WeatherHandler)
+        self.delays = delays or {}
+        self.humidity = humidity
+        self.wind = wind
+        self.temperature = temperature
+        self.api_key = 'fakeradarkey'
+        self.stopping = threading.Event()
+        self.requests = collections.Counter()
+        self.sent = collections.Counter()
+        self.pages = {'weather': self.weather_page, 'radar': self.radar_page, 'tile': self.tile_page,
+                      'clouds': self.cloud_page}
+        # Noise, so that the image compresses to more than the 2 kB that cloud_check takes as a failed download
+        rng = np.random.default_rng(seed)
+        satellite = rng.integers(0, cloud_level + 1, size=(400, 1500), dtype=np.uint8)
+        self.cloud_image = self._encode(Image.fromarray(satellite, mode='L'), 'GIF')
+        tile = np.zeros((256, 256, 4), dtype=np.uint8)
+        tile[:int(round(rain_fraction * 256))] = (0, 200, 0, 255)
+        self.tile_image = self._encode(Image.fromarray(tile, mode='RGBA'), 'PNG')
+        self.thread = threading.Thread(target=self.serve_forever, name='FakeWeather-Th', daemon=True)
+        self.temporary = directory is None
+        self.directory = tempfile.mkdtemp(prefix='fake_weather_') if directory is None else directory
+
+    @staticmethod
+    def _encode(image, image_format):
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format)
+        return buffer.getvalue()
+
+    @property
+    def url(self):
+        """
+        Returns
+        -------
+        STR
+            Base address of the server, like "http://127.0.0.1:54321".
+
+        """
+        return 'http://{}:{}'.format(*self.server_address[:2])
+
+    def weather_page(self):
+        current = {'temp_f': self.temperature, 'humidity': self.humidity, 'wind_mph': self.wind}
+        return 'application/json', json.dumps({'current': current}).encode()
+
+    def radar_page(self):
+        return 'text/html', '<script>{{"SUN_V3_API_KEY_V2":"{}","LOCALE":"en-US"}}</script>'.format(
+            self.api_key).encode()
+
+    def tile_page(self):
+        return 'image/png', self.tile_image
+
+    def cloud_page(self):
+        return 'image/gif', self.cloud_image
+
+    def point(self, conditions):
+        """
+        Description
+        -----------
+        Points a Conditions object's weather sources and internet check at this server, and gives it a weather
+        store of its own in self.directory and a web cache of its own, so that nothing cached from one server (radar
+        tiles are cached by time slot, not url) is served in place of another's responses.
+
+        Parameters
+        ----------
+        conditions : Conditions
+            The condition checker to redirect.
+
+        Returns
+        -------
+        None.
+
+        """
+        conditions.backup_weather_url = self.url + '/weather'
+        conditions.rain_url = self.url + '/radar'
+        conditions.tile_url = self.url + '/tile?ts={ts}&xyz={xyz}&apiKey={key}'
+        conditions.cloud_url = self.url + '/clouds?image={satellite}_{year}{day}_{time}_{band}'
+        conditions.internet_url = self.url + '/radar'
+        conditions.weather_directory = self.directory
+        conditions.store.close()
+        conditions.store = WeatherStore(os.path.join(self.directory, r'weather.sqlite'))
+        conditions.web = WebCache(conditions.config_dict.user_agent)
+
+    def replay(self, changes, clock=None):
+        """
+        Description
+        -----------
+        Plays out a night's weather: changes what the server reports at set times, from a thread of its own.
+
+        Parameters
+        ----------
+        changes : LIST
+            (time, values) pairs in time order, each a time in seconds since the epoch and a dictionary of what to
+            report from then on, like {'humidity': 95}.  Only humidity, wind and temperature can be changed.
+        clock : Clock, optional
+            Clock that the times are on.  The default is None, which uses the observing code's clock.
+
+        Returns
+        -------
+        threading.Thread
+            The thread making the changes.
+
+        """
+        unknown = {name for (_, values) in changes for name in values} - {'humidity', 'wind', 'temperature'}
+        if unknown:
+            raise ValueError('Cannot replay changes to {}'.format(', '.join(sorted(unknown))))
+        clock = clock or get_clock()
+
+        def run():
+            for (when, values) in changes:
+                clock.sleep(when - clock.time())
+                if self.stopping.is_set():
+                    return
+                for (name, value) in values.items():
+                    setattr(self, name, value)
+                logging.info('Fake weather server now reports {}'.format(
+                    ', '.join('{} {}'.format(name, value) for (name, value) in values.items())))
+
+        thread = threading.Thread(target=run, name='FakeWeatherReplay-Th', daemon=True)
+        thread.start()
+        return thread
+
+    def start(self):
+        self.thread.start()
+        logging.info('Fake weather server started on {}'.format(self.url))
+
+    def stop(self):
+        self.stopping.set()
+        self.shutdown()
+        self.server_close()
+        self.thread.join(timeout=1)
+        if self.temporary:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def benchmark_conditions(deadline=2.0, hang=5.0, cycles=3):
+    """
+    Description
+    -----------
+    Times full weather checks (Conditions.check_conditions) against the fake weather server, with every source
+    answering at once, with each source in turn hanging past its deadline, and with every source hanging.  The
+    worst of those is the longest the condition checker can take to decide whether it is safe to observe.  The checks
+    are run as if at local solar midnight, since in daylight the sun alone decides before any source reports.
+
+    Parameters
+    ----------
+    deadline : FLOAT, optional
+        Deadline in seconds for each source.  The default is 2.
+    hang : FLOAT, optional
+        How long a hanging source takes to answer, in seconds.  Should be longer than the deadline.  The default is 5.
+    cycles : INT, optional
+        Number of weather checks to time in each case.  The default is 3.
+
+    Returns
+    -------
+    results : DICT
+        Slowest weather check in seconds for each case, keyed by the hanging sources, like "radar" or "none".
+
+    """
+    from ..observing.condition_checker import Conditions
+    from ..common.IO import config_reader
+    cases = {'none': {}, 'weather': {'weather': hang}, 'radar': {'radar': hang}, 'tile': {'tile': hang},
+             'clouds': {'clouds': hang}, 'all': {'weather': hang, 'radar': hang, 'clouds': hang}}
+    config = config_reader.get_config()
+    midnight = datetime.datetime.now(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) + \
+        datetime.timedelta(hours=(-config.site_longitude / 15) % 24)
+    results = {}
+    for (case, delays) in cases.items():
+        server = FakeWeatherServer(delays=delays, seed=0)
+        server.start()
+        conditions = Conditions()
+        server.point(conditions)
+        conditions.deadlines = {name: deadline for name in conditions.deadlines}
+        worst = 0
+        for _ in range(cycles):
+            t = time.monotonic()
+            conditions.check_conditions(now=midnight)
+            worst = max(worst, time.monotonic() - t)
+            # Lets the late sources from this check give up, so that the next check starts them again
+            wait(list(conditions.fetches.values()))
+        conditions.fetch_pool.shutdown(wait=False)
+        conditions.tile_pool.shutdown(wait=False)
+        server.stop()
+        results[case] = worst
+        logging.info('Weather check with {} hanging: slowest of {} took {:.2f} s (deadline {} s)'.format(
+            case, cycles, worst, deadline))
+    return results